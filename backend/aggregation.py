@@ -0,0 +1,112 @@
+"""
+SQL-side aggregation of a company's financial records.
+Totals and breakdowns are read from the company_financial_summary rollups
+(maintained on upload by summary.py), so the cost of a read does not grow
+with the size of the ledger and no FinancialRecord is ever hydrated.
+"""
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models import CompanyFinancialSummary, FinancialRecord
+from summary import ROLLUP_ALL, UNDATED
+
+
+def _month_expr(db: Session, column=None):
+    """'YYYY-MM' bucket of a date column (default FinancialRecord.date) for the active dialect"""
+    column = FinancialRecord.date if column is None else column
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return func.to_char(func.date_trunc('month', column), 'YYYY-MM')
+    if dialect in ("mysql", "mariadb"):
+        return func.date_format(column, '%Y-%m')
+    return func.strftime('%Y-%m', column)
+
+
+def get_totals_by_type(db: Session, company_id: int) -> dict:
+    """Headline rollups -> {record_type: total}"""
+    rows = db.query(
+        CompanyFinancialSummary.record_type,
+        CompanyFinancialSummary.total_amount,
+    ).filter(
+        CompanyFinancialSummary.company_id == company_id,
+        CompanyFinancialSummary.category == ROLLUP_ALL,
+        CompanyFinancialSummary.period == ROLLUP_ALL,
+    ).all()
+    return {record_type: float(total) for record_type, total in rows}
+
+
+def get_financial_summary(db: Session, company_id: int) -> dict:
+    """
+    Headline totals used by /analyze and /download-report
+
+    Returns:
+        Dict with total_revenue, total_expense, net_income
+    """
+    totals = get_totals_by_type(db, company_id)
+    total_revenue = totals.get('Revenue', 0.0)
+    total_expense = totals.get('Expense', 0.0)
+    return {
+        "total_revenue": total_revenue,
+        "total_expense": total_expense,
+        "net_income": total_revenue - total_expense
+    }
+
+
+def get_financial_summaries(db: Session, company_ids: list) -> dict:
+    """
+    Headline totals for many companies in one grouped query
+
+    Returns:
+        Dict of company_id -> {total_revenue, total_expense, net_income}
+    """
+    rows = db.query(
+        CompanyFinancialSummary.company_id,
+        CompanyFinancialSummary.record_type,
+        CompanyFinancialSummary.total_amount,
+    ).filter(
+        CompanyFinancialSummary.company_id.in_(company_ids),
+        CompanyFinancialSummary.category == ROLLUP_ALL,
+        CompanyFinancialSummary.period == ROLLUP_ALL,
+        CompanyFinancialSummary.record_type.in_(['Revenue', 'Expense']),
+    ).all()
+
+    summaries = {company_id: {"total_revenue": 0.0, "total_expense": 0.0} for company_id in company_ids}
+    for company_id, record_type, total in rows:
+        key = "total_revenue" if record_type == 'Revenue' else "total_expense"
+        summaries[company_id][key] = float(total)
+    for summary in summaries.values():
+        summary["net_income"] = summary["total_revenue"] - summary["total_expense"]
+    return summaries
+
+
+def get_category_breakdown(db: Session, company_id: int) -> list:
+    """Totals per (record_type, category), largest first"""
+    rows = db.query(CompanyFinancialSummary).filter(
+        CompanyFinancialSummary.company_id == company_id,
+        CompanyFinancialSummary.period == ROLLUP_ALL,
+        CompanyFinancialSummary.category != ROLLUP_ALL,
+    ).order_by(CompanyFinancialSummary.total_amount.desc()).all()
+    return [
+        {"type": r.record_type, "category": r.category, "total": r.total_amount, "count": r.record_count}
+        for r in rows
+    ]
+
+
+def get_monthly_breakdown(db: Session, company_id: int) -> list:
+    """Revenue/expense/net per calendar month, oldest first; undated records are skipped"""
+    rows = db.query(CompanyFinancialSummary).filter(
+        CompanyFinancialSummary.company_id == company_id,
+        CompanyFinancialSummary.category == ROLLUP_ALL,
+        CompanyFinancialSummary.period.notin_([ROLLUP_ALL, UNDATED]),
+    ).order_by(CompanyFinancialSummary.period).all()
+
+    months = {}
+    for r in rows:
+        bucket = months.setdefault(r.period, {"month": r.period, "revenue": 0.0, "expense": 0.0})
+        if r.record_type == 'Revenue':
+            bucket["revenue"] += r.total_amount
+        elif r.record_type == 'Expense':
+            bucket["expense"] += r.total_amount
+    for bucket in months.values():
+        bucket["net"] = bucket["revenue"] - bucket["expense"]
+    return list(months.values())
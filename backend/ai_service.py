@@ -1,93 +1,486 @@
+import asyncio
+import json
 import os
+import random
+import re
 import time
-import requests
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import httpx
 from dotenv import load_dotenv
+from instrumentation import add_count, record, span
+from shared_state import get_shared_state
 
 load_dotenv()
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_MODEL = "openai/gpt-oss-20b:free"  # You can change model here
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+
+# Client tuning (all overridable from the environment)
+OPENROUTER_TIMEOUT_SECONDS = float(os.getenv("OPENROUTER_TIMEOUT_SECONDS", "60"))
+OPENROUTER_MAX_CONCURRENCY = int(os.getenv("OPENROUTER_MAX_CONCURRENCY", "4"))
+OPENROUTER_MAX_RETRIES = int(os.getenv("OPENROUTER_MAX_RETRIES", "4"))
+OPENROUTER_RATE_PER_SECOND = float(os.getenv("OPENROUTER_RATE_PER_SECOND", "2"))
+OPENROUTER_BURST = int(os.getenv("OPENROUTER_BURST", "4"))
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+
+# Key spellings models use for each assessment field, in order of preference
+SCORE_KEYS = ('score', 'health_score', 'overall_score', 'financial_health_score')
+RISK_KEYS = ('risk_level', 'risk', 'risk_assessment', 'risk_category')
+NARRATIVE_KEYS = ('narrative', 'assessment', 'summary', 'analysis', 'detailed_assessment')
+RECOMMENDATION_KEYS = ('recommendations', 'tips', 'action_items', 'suggestions')
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket whose refill rate adapts to the provider.
+    A 429 halves the rate and blocks the bucket for Retry-After seconds;
+    every success raises the rate again additively (AIMD) up to the configured maximum.
+    The bucket lives in the shared state store (see shared_state.py), so all worker
+    processes draw from one budget rather than each getting the full rate.
+    """
+
+    def __init__(self, rate: float = OPENROUTER_RATE_PER_SECOND, capacity: int = OPENROUTER_BURST,
+                 min_rate: float = 0.05, key: str = "ratelimit:openrouter", store=None):
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.capacity = capacity
+        self.key = key
+        self._store = store
+
+    @property
+    def store(self):
+        return self._store or get_shared_state()
+
+    def _refilled(self, state, now: float) -> dict:
+        # Wall-clock time: the bucket is shared between processes
+        if state is None:
+            return {"tokens": float(self.capacity), "updated": now, "rate": self.max_rate, "blocked_until": 0.0}
+        state["tokens"] = min(self.capacity, state["tokens"] + max(0.0, now - state["updated"]) * state["rate"])
+        state["updated"] = now
+        return state
+
+    def _take(self, state):
+        """Take a token if there is one: (new state, seconds to wait before trying again)"""
+        now = time.time()
+        state = self._refilled(state, now)
+        if now < state["blocked_until"]:
+            return state, state["blocked_until"] - now
+        if state["tokens"] >= 1:
+            state["tokens"] -= 1
+            return state, 0.0
+        return state, (1 - state["tokens"]) / state["rate"]
+
+    def _slow_down(self, retry_after: float = None):
+        def apply(state):
+            now = time.time()
+            state = self._refilled(state, now)
+            state["rate"] = max(self.min_rate, state["rate"] / 2)
+            state["tokens"] = 0.0
+            state["blocked_until"] = max(state["blocked_until"],
+                                         now + (retry_after if retry_after is not None else 1 / state["rate"]))
+            return state, None
+        return apply
+
+    def _speed_up(self, state):
+        state = self._refilled(state, time.time())
+        state["rate"] = min(self.max_rate, state["rate"] + self.max_rate * 0.1)
+        return state, None
+
+    async def acquire(self) -> None:
+        while True:
+            wait = await asyncio.to_thread(self.store.update, self.key, self._take)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def on_rate_limited(self, retry_after: float = None) -> None:
+        await asyncio.to_thread(self.store.update, self.key, self._slow_down(retry_after))
+
+    async def on_success(self) -> None:
+        await asyncio.to_thread(self.store.update, self.key, self._speed_up)
 
-def query_openrouter(prompt):
-    """Query OpenRouter API with rate limiting"""
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://sme-health-platform.com",  # REQUIRED by OpenRouter
-        "X-Title": "SME Financial Health"  # Custom title (mandatory)
-    }
-    data = {
-        "model": OPENROUTER_MODEL,
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.7,
-        "max_tokens": 1000  # Limit response to stay within budget
-    }
 
+def _parse_retry_after(value: str):
+    """Retry-After header as seconds (delta-seconds or HTTP-date), None if absent/invalid"""
+    if not value:
+        return None
     try:
-        # Add delay before API call to avoid rate limits (reduced for better UX)
-        time.sleep(0.5)  # 0.5 second delay
-        
-        print(f"🔄 Calling OpenRouter with model: {OPENROUTER_MODEL}")
-        response = requests.post(url, headers=headers, json=data)
-        res_json = response.json()
-        print(f"✅ OpenRouter Response Status: {response.status_code}")
-
-        # Handle API errors safely
-        if "choices" in res_json:
-            return res_json["choices"][0]["message"]["content"]
-        elif "error" in res_json:
-            print("🚨 OpenRouter Error:", res_json["error"])
-            return f"[Error: {res_json['error'].get('message', 'Unknown error')}]"
-        else:
-            print("⚠️ Unexpected Response:", res_json)
-            return "[Error: Unexpected API response]"
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+class OpenRouterStreamError(Exception):
+    """A streamed completion failed; str() is the same "[Error: ...]" text complete() would return"""
+
+
+async def _iter_stream_chunks(response: httpx.Response):
+    """("delta", text) and ("usage", dict) items from an OpenRouter Server-Sent Events body"""
+    async for line in response.aiter_lines():
+        # Blank separators and ": OPENROUTER PROCESSING" keep-alive comments carry no data
+        if not line.startswith("data:"):
+            continue
+        payload = line[5:].strip()
+        if payload == "[DONE]":
+            return
+        try:
+            chunk = json.loads(payload)
+        except ValueError:
+            continue
+        if isinstance(chunk.get("error"), dict):
+            raise OpenRouterStreamError(f"[Error: {chunk['error'].get('message', 'Stream interrupted')}]")
+        for choice in chunk.get("choices") or []:
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                yield "delta", content
+        if chunk.get("usage"):
+            yield "usage", chunk["usage"]
+
+
+class OpenRouterClient:
+    """Pooled keep-alive HTTP client with a global concurrency cap, adaptive rate limiting and retries."""
+
+    def __init__(self):
+        self.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(OPENROUTER_TIMEOUT_SECONDS, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=OPENROUTER_MAX_CONCURRENCY,
+                max_keepalive_connections=OPENROUTER_MAX_CONCURRENCY,
+            ),
+            headers={
+                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+                "Content-Type": "application/json",
+                "HTTP-Referer": "https://sme-health-platform.com",  # REQUIRED by OpenRouter
+                "X-Title": "SME Financial Health"  # Custom title (mandatory)
+            },
+        )
+        self.semaphore = asyncio.Semaphore(OPENROUTER_MAX_CONCURRENCY)
+        self.limiter = AdaptiveRateLimiter()
+
+    async def complete(self, prompt: str) -> str:
+        content, _ = await self.complete_with_usage(prompt)
+        return content
+
+    async def complete_with_usage(self, prompt: str) -> tuple:
+        """
+        Returns:
+            (content, usage) where usage is the provider's token counts, or None when not reported
+        """
+        data = {
+            "model": OPENROUTER_MODEL,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.7,
+            "max_tokens": 1000  # Limit response to stay within budget
+        }
+        last_error = "[Error: Unexpected API response]"
+
+        async with self.semaphore:
+            for attempt in range(OPENROUTER_MAX_RETRIES + 1):
+                final = attempt == OPENROUTER_MAX_RETRIES
+                await self.limiter.acquire()
+                try:
+                    print(f"🔄 Calling OpenRouter with model: {OPENROUTER_MODEL} (attempt {attempt + 1})")
+                    response = await self.http.post(OPENROUTER_URL, json=data)
+                except httpx.HTTPError as e:
+                    print("❌ Exception calling OpenRouter:", repr(e))
+                    last_error = f"[Exception: {str(e) or type(e).__name__}]"
+                    if not final:
+                        await asyncio.sleep(_backoff_delay(attempt))
+                    continue
+
+                print(f"✅ OpenRouter Response Status: {response.status_code}")
+                try:
+                    res_json = response.json()
+                except ValueError:
+                    res_json = {}
 
+                error = res_json.get("error") if isinstance(res_json.get("error"), dict) else None
+                if response.status_code == 429 or (error and error.get("code") == 429):
+                    # Rate limited: slow the bucket down and honour Retry-After
+                    await self.limiter.on_rate_limited(_parse_retry_after(response.headers.get("Retry-After")))
+                    last_error = f"[Error: {(error or {}).get('message', 'Rate limited')}]"
+                    continue
+                if response.status_code >= 500:
+                    last_error = f"[Error: {(error or {}).get('message', f'HTTP {response.status_code}')}]"
+                    if not final:
+                        await asyncio.sleep(_backoff_delay(attempt))
+                    continue
+
+                # Handle API errors safely
+                if "choices" in res_json:
+                    await self.limiter.on_success()
+                    return res_json["choices"][0]["message"]["content"], res_json.get("usage")
+                elif error is not None:
+                    print("🚨 OpenRouter Error:", error)
+                    return f"[Error: {error.get('message', 'Unknown error')}]", None
+                else:
+                    print("⚠️ Unexpected Response:", res_json)
+                    return "[Error: Unexpected API response]", None
+
+        return last_error, None
+
+    async def stream_completion(self, prompt: str):
+        """
+        Streamed completion (stream: true). Connection errors, 429s and 5xx responses are
+        retried like complete() until the provider starts answering; a failure after that
+        ends the stream.
+
+        Yields:
+            ("delta", text) per content fragment, and ("usage", dict) when the provider reports it
+
+        Raises:
+            OpenRouterStreamError: when no completion could be streamed
+        """
+        data = {
+            "model": OPENROUTER_MODEL,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.7,
+            "max_tokens": 1000,
+            "stream": True
+        }
+        last_error = "[Error: Unexpected API response]"
+
+        async with self.semaphore:
+            for attempt in range(OPENROUTER_MAX_RETRIES + 1):
+                final = attempt == OPENROUTER_MAX_RETRIES
+                retry_delay = None
+                await self.limiter.acquire()
+                streaming = False
+                try:
+                    print(f"🔄 Streaming from OpenRouter with model: {OPENROUTER_MODEL} (attempt {attempt + 1})")
+                    async with self.http.stream("POST", OPENROUTER_URL, json=data) as response:
+                        print(f"✅ OpenRouter Response Status: {response.status_code}")
+                        if response.status_code == 200:
+                            await self.limiter.on_success()
+                            streaming = True
+                            async for item in _iter_stream_chunks(response):
+                                yield item
+                            return
+
+                        try:
+                            res_json = json.loads(await response.aread())
+                        except ValueError:
+                            res_json = {}
+                        error = res_json.get("error") if isinstance(res_json.get("error"), dict) else {}
+                        if response.status_code == 429:
+                            await self.limiter.on_rate_limited(_parse_retry_after(response.headers.get("Retry-After")))
+                            last_error = f"[Error: {error.get('message', 'Rate limited')}]"
+                        elif response.status_code >= 500:
+                            last_error = f"[Error: {error.get('message', f'HTTP {response.status_code}')}]"
+                            retry_delay = None if final else _backoff_delay(attempt)
+                        else:
+                            print("🚨 OpenRouter Error:", error or res_json)
+                            raise OpenRouterStreamError(f"[Error: {error.get('message', f'HTTP {response.status_code}')}]")
+                except httpx.HTTPError as e:
+                    print("❌ Exception streaming from OpenRouter:", repr(e))
+                    if streaming:
+                        # Part of the answer has already been passed on; it cannot be replayed
+                        raise OpenRouterStreamError(f"[Exception: {str(e) or type(e).__name__}]") from e
+                    last_error = f"[Exception: {str(e) or type(e).__name__}]"
+                    retry_delay = None if final else _backoff_delay(attempt)
+                if retry_delay:
+                    await asyncio.sleep(retry_delay)
+
+        raise OpenRouterStreamError(last_error)
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+
+# One client per event loop: httpx pools and asyncio primitives are loop-bound
+_clients = {}
+
+
+def get_openrouter_client() -> OpenRouterClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        for stale in [l for l in _clients if l.is_closed()]:
+            del _clients[stale]
+        client = _clients[loop] = OpenRouterClient()
+    return client
+
+
+async def close_openrouter_client() -> None:
+    """Close the pooled client of the running loop (call on application shutdown)"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def query_openrouter(prompt):
+    """Query OpenRouter through the pooled, rate-limited async client"""
+    content, _ = await query_openrouter_with_usage(prompt)
+    return content
+
+
+async def query_openrouter_with_usage(prompt):
+    """Like query_openrouter, also returning the token usage reported by the provider (or None)"""
+    try:
+        return await get_openrouter_client().complete_with_usage(prompt)
     except Exception as e:
         print("❌ Exception calling OpenRouter:", e)
-        return f"[Exception: {str(e)}]"
+        return f"[Exception: {str(e)}]", None
+
+
+LANGUAGE_NAMES = {
+    "en": "English",
+    "hi": "Hindi (हिंदी)",
+    "ta": "Tamil (தமிழ்)"
+}
 
 
-def generate_financial_assessment(financial_data: list, language: str = "en") -> dict:
+SUPPORTED_LANGUAGES = tuple(LANGUAGE_NAMES)
+
+
+def build_prompt_inputs(data_summary: str, language: str = "en") -> dict:
     """
-    Sends financial data to OpenRouter to generate an assessment.
+    Collects everything the assessment prompt depends on.
     
     Args:
-        financial_data: List of financial records
+        data_summary: Token-budgeted ledger summary (see prompt_context.build_prompt_context)
         language: Language code ('en', 'hi', 'ta') for response
     """
-    
-    # Language mapping
-    language_names = {
-        "en": "English",
-        "hi": "Hindi (हिंदी)",
-        "ta": "Tamil (தமிழ்)"
+    return {
+        "data_summary": data_summary,
+        "language": language,
+        "model": OPENROUTER_MODEL
     }
+
+
+def build_prompt(prompt_inputs: dict) -> str:
+    """Language-specific prompt for the given inputs"""
+    lang_name = LANGUAGE_NAMES.get(prompt_inputs["language"], "English")
     
-    lang_name = language_names.get(language, "English")
-    
-    # Limit data to avoid context length issues (max 20 records)
-    limited_data = financial_data[:20]
-    
-    # Calculate basic metrics to reduce token usage
-    total_revenue = sum(r['amount'] for r in limited_data if r.get('type') == 'Revenue')
-    total_expense = sum(r['amount'] for r in limited_data if r.get('type') == 'Expense')
-    net_income = total_revenue - total_expense
-    
-    # Create concise data summary
-    data_summary = f"Revenue: {total_revenue}, Expenses: {total_expense}, Net: {net_income}"
-    
-    # Language-specific prompt
-    prompt = f"""Analyze this SME financial data and respond in {lang_name} language.
+    return f"""Analyze this SME financial data and respond in {lang_name} language.
 
-Data: {data_summary}
-Sample records: {str(limited_data[:14])}
+{prompt_inputs["data_summary"]}
 
 IMPORTANT: Respond ONLY in {lang_name}. Provide JSON with these exact keys:
 {{"score": <0-100>, "risk_level": "<Low/Medium/High>", "narrative": "<brief assessment in {lang_name}>", "recommendations": ["<tip1 in {lang_name}>", "<tip2 in {lang_name}>", "<tip3 in {lang_name}>"]}}"""
 
+
+async def generate_financial_assessment(data_summary: str, language: str = "en") -> dict:
+    """
+    Sends a ledger summary to OpenRouter to generate an assessment.
+    
+    Args:
+        data_summary: Token-budgeted ledger summary (see prompt_context.build_prompt_context)
+        language: Language code ('en', 'hi', 'ta') for response
+    """
+    return await generate_assessment_from_inputs(build_prompt_inputs(data_summary, language))
+
+
+async def generate_multilingual_assessment(prompt_inputs: dict, languages=SUPPORTED_LANGUAGES) -> dict:
+    """
+    Generates the assessment in several languages in one pass.
+    Per-language calls run concurrently (bounded by the client's concurrency cap).
+    
+    Returns:
+        Dict of language code -> parsed assessment
+    """
+    results = await asyncio.gather(*(
+        generate_assessment_from_inputs({**prompt_inputs, "language": lang}) for lang in languages
+    ))
+    return dict(zip(languages, results))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for this mostly-numeric text)"""
+    return -(-len(text) // 4)
+
+
+def _log_token_usage(prompt: str, usage: dict, seconds: float) -> None:
+    """Per-request token accounting: estimated prompt size against what the provider billed"""
+    usage = usage or {}
+    prompt_tokens = usage.get('prompt_tokens') or estimate_tokens(prompt)
+    completion_tokens = usage.get('completion_tokens') or 0
+    record("llm_call", seconds, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    add_count("llm_prompt_tokens", prompt_tokens)
+    add_count("llm_completion_tokens", completion_tokens)
+    print(f"🧮 Tokens: prompt ~{estimate_tokens(prompt)} estimated, "
+          f"{usage.get('prompt_tokens', '?')} prompt / {usage.get('completion_tokens', '?')} completion reported "
+          f"({seconds:.2f}s)")
+
+
+def _extract_assessment(response_content: str) -> dict:
+    """Pull the assessment fields out of a model reply, tolerating markdown and wrapped or renamed keys"""
+    # Aggressive JSON extraction
+    try:
+        # 1. Try to find JSON block in markdown
+        cleaned = response_content.strip()
+        json_match = re.search(r'\{.*\}', cleaned, re.DOTALL)
+        
+        if json_match:
+            cleaned = json_match.group(0)
+        
+        parsed = json.loads(cleaned)
+        
+        # 2. Flatten nested response if necessary
+        if isinstance(parsed, dict):
+            # Handle cases where model wraps everything in a top-level key
+            for nested_key in ['assessment', 'financial_assessment', 'result', 'analysis', 'data']:
+                if nested_key in parsed and isinstance(parsed[nested_key], dict):
+                    parsed = parsed[nested_key]
+                    break
+        
+        # 3. Normalize keys with flexible mapping
+        def get_val(keys, default=""):
+            for k in keys:
+                if k in parsed: return parsed[k]
+            return default
+
+        result = {
+            "score": get_val(SCORE_KEYS, "N/A"),
+            "risk_level": get_val(RISK_KEYS, "Unknown"),
+            "narrative": get_val(NARRATIVE_KEYS, ""),
+            "recommendations": get_val(RECOMMENDATION_KEYS, [])
+        }
+        
+        # 4. Final Cleanup: If narrative is empty, use the whole original string (sanitized)
+        if not result['narrative'] or len(str(result['narrative'])) < 10:
+            # If we couldn't find a narrative but found other keys, 
+            # maybe the AI put the narrative in a non-standard key
+            potential_narrative = ""
+            for k, v in parsed.items():
+                if isinstance(v, str) and len(v) > 50 and k not in ['risk_level', 'score']:
+                    potential_narrative = v
+                    break
+            result['narrative'] = potential_narrative or "Assessment generated successfully."
+            
+        return result
+        
+    except (json.JSONDecodeError, Exception) as e:
+        print(f"⚠️ JSON Parse Attempt Failed: {e}")
+        # Mega fallback: Return the raw content in narrative so at least something shows
+        return {
+            "score": "N/A",
+            "risk_level": "Unknown",
+            "narrative": response_content,
+            "recommendations": []
+        }
+
+
+async def generate_assessment_from_inputs(prompt_inputs: dict) -> dict:
+    """Sends prepared prompt inputs (see build_prompt_inputs) to OpenRouter and parses the assessment."""
+    prompt = build_prompt(prompt_inputs)
+
     try:
-        response_content = query_openrouter(prompt)
+        started = time.perf_counter()
+        response_content, usage = await query_openrouter_with_usage(prompt)
+        _log_token_usage(prompt, usage, time.perf_counter() - started)
         
         # Check for error responses
         if response_content.startswith("[Error:") or response_content.startswith("[Exception:"):
@@ -96,64 +489,187 @@ IMPORTANT: Respond ONLY in {lang_name}. Provide JSON with these exact keys:
                 "narrative": "Could not generate assessment due to an API error."
             }
         
-        # Aggressive JSON extraction
-        import json
-        import re
-        
-        try:
-            # 1. Try to find JSON block in markdown
-            cleaned = response_content.strip()
-            json_match = re.search(r'\{.*\}', cleaned, re.DOTALL)
-            
-            if json_match:
-                cleaned = json_match.group(0)
-            
-            parsed = json.loads(cleaned)
-            
-            # 2. Flatten nested response if necessary
-            if isinstance(parsed, dict):
-                # Handle cases where model wraps everything in a top-level key
-                for nested_key in ['assessment', 'financial_assessment', 'result', 'analysis', 'data']:
-                    if nested_key in parsed and isinstance(parsed[nested_key], dict):
-                        parsed = parsed[nested_key]
-                        break
-            
-            # 3. Normalize keys with flexible mapping
-            def get_val(keys, default=""):
-                for k in keys:
-                    if k in parsed: return parsed[k]
-                return default
-
-            result = {
-                "score": get_val(['score', 'health_score', 'overall_score', 'financial_health_score'], "N/A"),
-                "risk_level": get_val(['risk_level', 'risk', 'risk_assessment', 'risk_category'], "Unknown"),
-                "narrative": get_val(['narrative', 'assessment', 'summary', 'analysis', 'detailed_assessment'], ""),
-                "recommendations": get_val(['recommendations', 'tips', 'action_items', 'suggestions'], [])
-            }
-            
-            # 4. Final Cleanup: If narrative is empty, use the whole original string (sanitized)
-            if not result['narrative'] or len(str(result['narrative'])) < 10:
-                # If we couldn't find a narrative but found other keys, 
-                # maybe the AI put the narrative in a non-standard key
-                potential_narrative = ""
-                for k, v in parsed.items():
-                    if isinstance(v, str) and len(v) > 50 and k not in ['risk_level', 'score']:
-                        potential_narrative = v
-                        break
-                result['narrative'] = potential_narrative or "Assessment generated successfully."
-                
-            return result
-            
-        except (json.JSONDecodeError, Exception) as e:
-            print(f"⚠️ JSON Parse Attempt Failed: {e}")
-            # Mega fallback: Return the raw content in narrative so at least something shows
-            return {
-                "score": "N/A",
-                "risk_level": "Unknown",
-                "narrative": response_content,
-                "recommendations": []
-            }
-        
+        with span("json_extract"):
+            return _extract_assessment(response_content)
+
     except Exception as e:
         print(f"AI Generation Error: {e}")
         return {"error": str(e), "narrative": "Could not generate assessment due to an error."}
+
+
+class AssessmentStreamParser:
+    """
+    Incremental scanner for the assessment JSON while the model is still writing it.
+
+    feed() takes raw content fragments and returns the events they complete:
+    ("score", value) and ("risk_level", value) once each value is whole,
+    ("narrative", text) for every newly decoded piece of the narrative string and
+    ("recommendation", text) per finished recommendation. Keys are matched with the
+    same spellings as _extract_assessment, at any nesting depth (models sometimes wrap
+    the object), and anything before the first "{" (prose, markdown fences) is skipped.
+    The raw text is kept in `content` for the authoritative parse at the end.
+    """
+
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+    _FIELDS = {**{k: "score" for k in SCORE_KEYS}, **{k: "risk_level" for k in RISK_KEYS}}
+
+    def __init__(self):
+        self._parts = []
+        self.emitted = set()
+        self._done = False
+        # Open containers as (bracket, key of the parent object they are the value of)
+        self._stack = []
+        self._key = None
+        self._expect_key = False
+        self._in_string = False
+        self._is_key = False
+        self._chars = []
+        self._escape = None
+        self._scalar = []
+        # Position in _chars up to which narrative text has been sent; None outside the narrative
+        self._narrative_sent = None
+
+    @property
+    def content(self) -> str:
+        return "".join(self._parts)
+
+    def feed(self, fragment: str) -> list:
+        self._parts.append(fragment)
+        events = []
+        for ch in fragment:
+            if self._in_string:
+                self._string_char(ch, events)
+            elif not self._done:
+                self._structural_char(ch, events)
+        if self._narrative_sent is not None and len(self._chars) > self._narrative_sent:
+            events.append(("narrative", "".join(self._chars[self._narrative_sent:])))
+            self._narrative_sent = len(self._chars)
+        return events
+
+    def _string_char(self, ch: str, events: list) -> None:
+        if self._escape is not None:
+            self._escape += ch
+            if self._escape[0] != 'u':
+                self._chars.append(self._ESCAPES.get(ch, ch))
+                self._escape = None
+            elif len(self._escape) == 5:
+                try:
+                    self._chars.append(chr(int(self._escape[1:], 16)))
+                except ValueError:
+                    pass
+                self._escape = None
+        elif ch == '\\':
+            self._escape = ''
+        elif ch == '"':
+            self._in_string = False
+            self._end_string(events)
+        else:
+            self._chars.append(ch)
+
+    def _structural_char(self, ch: str, events: list) -> None:
+        if not self._stack:
+            if ch == '{':
+                self._open(ch)
+            return
+        if ch == '"':
+            in_object = self._stack[-1][0] == '{'
+            self._in_string = True
+            self._is_key = in_object and self._expect_key
+            self._chars = []
+            if in_object and not self._is_key and self._key in NARRATIVE_KEYS and "narrative" not in self.emitted:
+                self._narrative_sent = 0
+        elif ch in '{[':
+            self._open(ch)
+        elif ch in '}]':
+            self._end_scalar(events)
+            _, self._key = self._stack.pop()
+            self._expect_key = False
+            self._done = not self._stack
+        elif ch == ':':
+            self._expect_key = False
+        elif ch == ',':
+            self._end_scalar(events)
+            self._expect_key = self._stack[-1][0] == '{'
+        elif ch.isspace():
+            self._end_scalar(events)
+        else:
+            self._scalar.append(ch)
+
+    def _open(self, bracket: str) -> None:
+        parent_key = self._key if self._stack and self._stack[-1][0] == '{' else None
+        self._stack.append((bracket, parent_key))
+        self._key = None
+        self._expect_key = bracket == '{'
+
+    def _end_string(self, events: list) -> None:
+        value = "".join(self._chars)
+        if self._is_key:
+            self._key = value
+        elif self._narrative_sent is not None:
+            if len(value) > self._narrative_sent:
+                events.append(("narrative", value[self._narrative_sent:]))
+            self._narrative_sent = None
+            self.emitted.add("narrative")
+        else:
+            self._value(value, events)
+        self._chars = []
+
+    def _end_scalar(self, events: list) -> None:
+        if not self._scalar:
+            return
+        raw = "".join(self._scalar)
+        self._scalar = []
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = raw
+        self._value(value, events)
+
+    def _value(self, value, events: list) -> None:
+        bracket, parent_key = self._stack[-1]
+        if bracket == '{':
+            field = self._FIELDS.get(self._key)
+            if field is not None and field not in self.emitted:
+                self.emitted.add(field)
+                events.append((field, value))
+        elif parent_key in RECOMMENDATION_KEYS and isinstance(value, str):
+            events.append(("recommendation", value))
+
+
+async def stream_assessment_from_inputs(prompt_inputs: dict):
+    """
+    Streaming counterpart of generate_assessment_from_inputs.
+
+    Yields:
+        (event, data) pairs while the reply streams in: ("score", ...), ("risk_level", ...),
+        ("narrative", text fragment) and ("recommendation", text); then, once, ("assessment", dict)
+        with exactly what generate_assessment_from_inputs would have returned
+    """
+    prompt = build_prompt(prompt_inputs)
+    parser = AssessmentStreamParser()
+    usage = None
+    started = time.perf_counter()
+    first_content = None
+
+    try:
+        async for kind, payload in get_openrouter_client().stream_completion(prompt):
+            if kind == "usage":
+                usage = payload
+                continue
+            if first_content is None:
+                first_content = time.perf_counter() - started
+                record("llm_first_content", first_content)
+            for event in parser.feed(payload):
+                yield event
+    except OpenRouterStreamError as e:
+        yield "assessment", {"error": str(e), "narrative": "Could not generate assessment due to an API error."}
+        return
+    except Exception as e:
+        print(f"AI Generation Error: {e}")
+        yield "assessment", {"error": str(e), "narrative": "Could not generate assessment due to an error."}
+        return
+
+    _log_token_usage(prompt, usage, time.perf_counter() - started)
+    with span("json_extract"):
+        assessment = _extract_assessment(parser.content)
+    yield "assessment", assessment
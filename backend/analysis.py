@@ -0,0 +1,407 @@
+"""
+Company analysis service shared by the HTTP routes.
+
+The LLM round-trip is awaited on the event loop. The short database steps
+around it run through AsyncSession.run_sync when the caller has an async
+session, or in worker threads via asyncio.to_thread for a sync Session, so a
+slow OpenRouter call never holds a threadpool worker.
+"""
+
+import asyncio
+import os
+import re
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import Assessment, Company
+from aggregation import get_financial_summary, get_financial_summaries, get_category_breakdown, get_monthly_breakdown
+from ai_service import build_prompt_inputs, generate_assessment_from_inputs, generate_multilingual_assessment, stream_assessment_from_inputs, SUPPORTED_LANGUAGES, OPENROUTER_MODEL
+from assessment_cache import assessment_cache_key, get_cached_assessment, store_cached_assessment, assessment_payload, MULTI_LANGUAGE
+from prompt_context import build_prompt_contexts, PROMPT_TOKEN_BUDGET
+from summary import get_data_versions
+from report_store import schedule_prerender
+from scoring import score_company, score_series
+from instrumentation import span
+
+
+class CompanyNotFound(Exception):
+    pass
+
+
+def parse_score(raw_score) -> float:
+    """Extract score safely (e.g. 85, "85", "85/100" -> 85.0; anything else -> 0.0)"""
+    try:
+        if isinstance(raw_score, (int, float)):
+            return float(raw_score)
+        # Try to extract the first number from string (e.g. "85/100" -> 85)
+        match = re.search(r"(\d+\.?\d*)", str(raw_score))
+        if match:
+            return float(match.group(1))
+    except (ValueError, TypeError):
+        pass
+    return 0.0
+
+
+# Companies prepared per grouped query in a batch run
+BATCH_CHUNK_SIZE = int(os.getenv("ANALYSIS_BATCH_CHUNK_SIZE", "200"))
+
+
+def cache_key_inputs(company_id: int, data_version: str, language: str) -> dict:
+    """
+    What an assessment's cache key is hashed from. The prompt context is a function of
+    the company's data, which data_version identifies, so the key is known without
+    building the context.
+    """
+    return {
+        "company_id": company_id,
+        "data_version": data_version,
+        "language": language,
+        "model": OPENROUTER_MODEL,
+        "context_budget": PROMPT_TOKEN_BUDGET,
+    }
+
+
+def prepare_prompts(db: Session, company_ids: list, language: str) -> dict:
+    """
+    Identify the assessment each company needs from its headline rollups only, so a
+    cache hit never pays for the prompt context (see build_prompts).
+
+    Returns:
+        Dict of company_id -> (company name, cache key inputs); unknown ids are absent
+    """
+    names = dict(db.query(Company.id, Company.name).filter(Company.id.in_(company_ids)).all())
+    if not names:
+        return {}
+    versions = get_data_versions(db, list(names))
+    return {
+        company_id: (name, cache_key_inputs(company_id, versions[company_id], language))
+        for company_id, name in names.items()
+    }
+
+
+def prepare_prompt(db: Session, company_id: int, language: str) -> tuple:
+    """
+    Name and cache key inputs of a company (see prepare_prompts).
+
+    Returns:
+        (company name, cache key inputs)
+    """
+    prepared = prepare_prompts(db, [company_id], language).get(company_id)
+    if prepared is None:
+        raise CompanyNotFound(company_id)
+    return prepared
+
+
+def build_prompts(db: Session, company_ids: list, language: str) -> dict:
+    """
+    Prompt inputs for several companies with grouped queries: exact figures over
+    the whole ledger, packed into the prompt token budget. Only needed on a cache miss.
+
+    Returns:
+        Dict of company_id -> prompt inputs
+    """
+    with span("prompt_context", companies=len(company_ids)):
+        contexts = build_prompt_contexts(db, company_ids)
+    return {company_id: build_prompt_inputs(contexts[company_id], language=language) for company_id in company_ids}
+
+
+def _normalize_assessment(assessment_data: dict, fallback: dict = None) -> dict:
+    """Stored fields of an LLM result; a failed generation takes score and risk from the local rules"""
+    if 'error' in assessment_data and fallback is not None:
+        score, risk_level = fallback["score"], fallback["risk_level"]
+    else:
+        score = parse_score(assessment_data.get('score', 0))
+        risk_level = str(assessment_data.get('risk_level', 'Unknown'))
+    return {
+        "score": score,
+        "risk_level": risk_level,
+        "narrative": str(assessment_data.get('narrative', '')),
+        "recommendations": assessment_data.get('recommendations', [])
+    }
+
+
+def save_assessment(db: Session, company_id: int, language: str, cache_key: str, assessment_data: dict,
+                    translations: dict = None) -> dict:
+    """
+    Store a generated assessment; failed generations are stored but never cached.
+    `translations` holds the per-language results of a multi-language run.
+    """
+    failed = 'error' in assessment_data or any('error' in t for t in (translations or {}).values())
+    # When OpenRouter is down the rule-based engine still provides a real score
+    fallback = score_company(db, company_id) if failed else None
+    fields = _normalize_assessment(assessment_data, fallback)
+    db_assessment = Assessment(
+        company_id=company_id,
+        overall_score=fields["score"],
+        risk_level=fields["risk_level"],
+        summary_narrative=fields["narrative"],
+        recommendations=fields["recommendations"],
+        language=language,
+        translations={lang: _normalize_assessment(t, fallback) for lang, t in translations.items()} if translations else None,
+        cache_key=None if failed else cache_key
+    )
+    db.add(db_assessment)
+    db.commit()
+    db.refresh(db_assessment)
+    store_cached_assessment(db_assessment)
+    schedule_prerender(db_assessment.id)
+    return assessment_payload(db_assessment, language)
+
+
+def _multi_language_key(key_inputs: dict) -> str:
+    return assessment_cache_key({**key_inputs, "language": MULTI_LANGUAGE})
+
+
+def lookup_cached(db: Session, key_inputs: dict, language: str):
+    """Single-language entry first, then a multi-language run over the same data"""
+    company_id = key_inputs["company_id"]
+    cached = get_cached_assessment(db, company_id, assessment_cache_key(key_inputs), language)
+    if cached is None:
+        cached = get_cached_assessment(db, company_id, _multi_language_key(key_inputs), language)
+    return cached
+
+
+def lookup_cached_many(db: Session, prepared: dict, language: str) -> dict:
+    """lookup_cached for every company of prepare_prompts' result: company_id -> payload or None"""
+    return {company_id: lookup_cached(db, key_inputs, language) for company_id, (_, key_inputs) in prepared.items()}
+
+
+def summary_block(db: Session, company_id: int) -> dict:
+    """Summary values for display, aggregated in SQL, plus the instant rule-based score"""
+    summary = get_financial_summary(db, company_id)
+    categories = get_category_breakdown(db, company_id)
+    monthly = get_monthly_breakdown(db, company_id)
+    category_expense = [c["total"] for c in categories if c["type"] == "Expense"]
+    return {
+        "summary": summary,
+        "breakdown": {
+            "categories": categories,
+            "monthly": monthly
+        },
+        "local_score": score_series(monthly, category_expense, summary)
+    }
+
+
+def release_connection(db: Session) -> None:
+    """End the session's read transaction so its connection returns to the pool"""
+    db.rollback()
+
+
+async def _generate_assessment(run_db, company_id: int, key_inputs: dict, prompt_inputs: dict, language: str,
+                               all_languages: bool) -> dict:
+    """Call the LLM and store the result under its cache key; returns the payload"""
+    # Give the pooled connection back while the LLM call is awaited
+    await run_db(release_connection)
+    if all_languages:
+        languages = tuple(dict.fromkeys((language,) + SUPPORTED_LANGUAGES))
+        results = await generate_multilingual_assessment(prompt_inputs, languages)
+        with span("persist"):
+            return await run_db(save_assessment, company_id, language, _multi_language_key(key_inputs),
+                                results[language], results)
+    # Generate assessment in specified language
+    assessment_data = await generate_assessment_from_inputs(prompt_inputs)
+    with span("persist"):
+        return await run_db(save_assessment, company_id, language, assessment_cache_key(key_inputs), assessment_data)
+
+
+async def _resolve_assessment(run_db, company_id: int, key_inputs: dict, language: str,
+                              force_refresh: bool, all_languages: bool) -> tuple:
+    """
+    Cached assessment or a freshly generated and stored one.
+    `run_db(fn, *args)` awaits fn(session, *args) off the event loop.
+
+    Returns:
+        (payload, cached)
+    """
+    # The same data in the same language reuses the stored assessment instead of calling the LLM again
+    if not force_refresh:
+        with span("cache_lookup"):
+            cached = await run_db(lookup_cached, key_inputs, language)
+        if cached is not None:
+            return cached, True
+
+    prompt_inputs = (await run_db(build_prompts, [company_id], language))[company_id]
+    return await _generate_assessment(run_db, company_id, key_inputs, prompt_inputs, language, all_languages), False
+
+
+def _assessment_block(payload: dict) -> dict:
+    return {
+        "score": payload["score"],
+        "risk_level": payload["risk_level"],
+        "narrative": payload["narrative"],
+        "recommendations": payload["recommendations"]
+    }
+
+
+def _session_runner(db):
+    """run_db(fn, *args) awaiting fn(session, *args): run_sync for an AsyncSession, a worker thread otherwise"""
+    if isinstance(db, AsyncSession):
+        return db.run_sync
+
+    async def run_db(fn, *args):
+        return await asyncio.to_thread(fn, db, *args)
+    return run_db
+
+
+async def analyze_company(db, company_id: int, language: str = "en", force_refresh: bool = False,
+                          all_languages: bool = False) -> dict:
+    """
+    Full /analyze flow: cache lookup, LLM call on a miss, persistence and summary.
+    `db` is a sync Session or an AsyncSession.
+    With all_languages, every supported language is generated in the same pass and
+    stored together, so later language switches are served from the cache.
+
+    Raises:
+        CompanyNotFound: if the company does not exist
+    """
+    run_db = _session_runner(db)
+    company_name, key_inputs = await run_db(prepare_prompt, company_id, language)
+    payload, cached = await _resolve_assessment(run_db, company_id, key_inputs, language, force_refresh, all_languages)
+
+    with span("aggregation"):
+        summary = await run_db(summary_block, company_id)
+    return _analysis_response(company_name, summary, payload, cached)
+
+
+def _analysis_response(company_name: str, summary: dict, payload: dict, cached: bool) -> dict:
+    return {
+        "company": company_name,
+        **summary,
+        "assessment": _assessment_block(payload),
+        "assessment_id": payload["assessment_id"],
+        "cached": cached
+    }
+
+
+def _assessment_events(payload: dict) -> list:
+    """A stored assessment as the events a live stream would have produced"""
+    events = [("score", payload["score"]), ("risk_level", payload["risk_level"]), ("narrative", payload["narrative"])]
+    return events + [("recommendation", r) for r in payload["recommendations"] or []]
+
+
+async def stream_company_analysis(db, company_id: int, language: str = "en", force_refresh: bool = False,
+                                  all_languages: bool = False):
+    """
+    The /analyze flow as a stream of (event, data) pairs for Server-Sent Events.
+
+    "meta" (company name, cached flag) comes first, then the assessment fields as soon
+    as they are known: score and risk level, narrative fragments while the model writes
+    them, and recommendations. A cached assessment is replayed in the same shape. The
+    last event, "result", is the full /analyze response, sent once the assessment is stored.
+    With all_languages, the other languages are generated alongside the streamed one and
+    stored with it.
+
+    Raises:
+        CompanyNotFound: if the company does not exist (before anything is yielded)
+    """
+    run_db = _session_runner(db)
+    company_name, key_inputs = await run_db(prepare_prompt, company_id, language)
+    cached = None
+    if not force_refresh:
+        with span("cache_lookup"):
+            cached = await run_db(lookup_cached, key_inputs, language)
+    yield "meta", {"company": company_name, "cached": cached is not None}
+
+    if cached is not None:
+        payload = cached
+        for event in _assessment_events(payload):
+            yield event
+    else:
+        prompt_inputs = (await run_db(build_prompts, [company_id], language))[company_id]
+        await run_db(release_connection)
+        others = [lang for lang in SUPPORTED_LANGUAGES if lang != language] if all_languages else []
+        # Non-streamed languages run concurrently with the streamed one
+        translations = asyncio.ensure_future(generate_multilingual_assessment(prompt_inputs, others)) if others else None
+        try:
+            async for event, data in stream_assessment_from_inputs(prompt_inputs):
+                if event == "assessment":
+                    assessment_data = data
+                else:
+                    yield event, data
+            results = {language: assessment_data, **(await translations)} if translations is not None else None
+        finally:
+            if translations is not None and not translations.done():
+                translations.cancel()
+
+        with span("persist"):
+            if results is not None:
+                payload = await run_db(save_assessment, company_id, language, _multi_language_key(key_inputs),
+                                       assessment_data, results)
+            else:
+                payload = await run_db(save_assessment, company_id, language, assessment_cache_key(key_inputs),
+                                       assessment_data)
+
+    with span("aggregation"):
+        summary = await run_db(summary_block, company_id)
+    yield "result", _analysis_response(company_name, summary, payload, cached is not None)
+
+
+async def _run_in_new_session(fn, *args):
+    """Run fn(session, *args) in a worker thread with its own short-lived session"""
+    def call():
+        db = SessionLocal()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+    return await asyncio.to_thread(call)
+
+
+async def analyze_companies(company_ids: list, language: str = "en", force_refresh: bool = False,
+                            all_languages: bool = False, concurrency: int = 8):
+    """
+    Batch analysis for a portfolio. Companies are prepared in chunks with grouped
+    queries (data versions and headline totals for the whole chunk at once, prompt
+    contexts for the chunk's cache misses), LLM calls run with bounded concurrency,
+    and results are yielded as they complete.
+
+    Yields:
+        One dict per company: the /analyze response plus company_id, or company_id and error
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    unique_ids = list(dict.fromkeys(company_ids))
+
+    async def analyze_one(company_id, prepared, summary, payload, prompt_inputs):
+        name, key_inputs = prepared
+        cached = payload is not None
+        if not cached:
+            async with semaphore:
+                try:
+                    payload = await _generate_assessment(
+                        _run_in_new_session, company_id, key_inputs, prompt_inputs, language, all_languages
+                    )
+                except Exception as e:
+                    return {"company_id": company_id, "company": name, "error": str(e)}
+        return {
+            "company_id": company_id,
+            "company": name,
+            "summary": summary,
+            "assessment": _assessment_block(payload),
+            "assessment_id": payload["assessment_id"],
+            "cached": cached
+        }
+
+    for start in range(0, len(unique_ids), BATCH_CHUNK_SIZE):
+        chunk = unique_ids[start:start + BATCH_CHUNK_SIZE]
+        prepared = await _run_in_new_session(prepare_prompts, chunk, language)
+        summaries = await _run_in_new_session(get_financial_summaries, list(prepared))
+        cached = {} if force_refresh else await _run_in_new_session(lookup_cached_many, prepared, language)
+        misses = [company_id for company_id in prepared if cached.get(company_id) is None]
+        prompts = await _run_in_new_session(build_prompts, misses, language) if misses else {}
+
+        for company_id in chunk:
+            if company_id not in prepared:
+                yield {"company_id": company_id, "error": "Company not found"}
+
+        tasks = [
+            asyncio.create_task(analyze_one(company_id, prepared[company_id], summaries[company_id],
+                                            cached.get(company_id), prompts.get(company_id)))
+            for company_id in prepared
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Client went away mid-stream: stop the remaining LLM calls
+            for task in tasks:
+                task.cancel()
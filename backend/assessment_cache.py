@@ -0,0 +1,112 @@
+"""
+Content-addressed cache for LLM assessments.
+
+Assessments are keyed by a hash of what the prompt is built from (company,
+data version, language, model, context budget), so an unchanged company
+analysed in the same language never calls OpenRouter twice, and a hit is found
+without building the prompt. Lookups go to the shared state store first (one
+cache for every worker process, see shared_state.py) and then to the
+assessments table, which keeps the cache warm across restarts.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session
+from models import Assessment
+from shared_state import get_shared_state
+
+# Bump when the prompt template or response parsing changes so old entries stop matching
+PROMPT_VERSION = 3
+
+CACHE_TTL_SECONDS = int(os.getenv("ASSESSMENT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+# Namespace of the cache entries in the shared state store
+CACHE_KEY_PREFIX = "assessment:"
+
+
+def assessment_cache_key(key_inputs: dict) -> str:
+    """SHA-256 of the canonical JSON form of the key inputs (see analysis.cache_key_inputs)"""
+    canonical = json.dumps(
+        {"prompt_version": PROMPT_VERSION, **key_inputs},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# Language placeholder in the cache key of a multi-language (fan-out) assessment
+MULTI_LANGUAGE = "*"
+
+
+def _assessment_record(assessment: Assessment) -> dict:
+    """What the cache holds: the stored fields plus any per-language translations"""
+    return {
+        "assessment_id": assessment.id,
+        "company_id": assessment.company_id,
+        "language": assessment.language,
+        "score": assessment.overall_score,
+        "risk_level": assessment.risk_level,
+        "narrative": assessment.summary_narrative,
+        "recommendations": assessment.recommendations,
+        "translations": assessment.translations or {}
+    }
+
+
+def _select_language(record: dict, language: str = None):
+    """Payload for one language; None if the assessment has no text in it"""
+    translations = record["translations"]
+    # Assessments stored before the language column existed are English
+    if language and language != (record["language"] or "en"):
+        translated = translations.get(language)
+        if translated is None:
+            return None
+        return {"assessment_id": record["assessment_id"], **translated}
+    return {
+        "assessment_id": record["assessment_id"],
+        "score": record["score"],
+        "risk_level": record["risk_level"],
+        "narrative": record["narrative"],
+        "recommendations": record["recommendations"]
+    }
+
+
+def assessment_payload(assessment: Assessment, language: str = None) -> dict:
+    """The cached/returned view of a stored Assessment, in `language` when it carries translations"""
+    return _select_language(_assessment_record(assessment), language)
+
+
+def get_cached_assessment(db: Session, company_id: int, cache_key: str, language: str = None):
+    """
+    Look up a company's assessment by cache key: shared state store first, then the assessments table.
+    Only assessments stored for company_id ever match.
+
+    Returns:
+        Payload dict (see assessment_payload) or None on a miss
+    """
+    store = get_shared_state()
+    record = store.get(CACHE_KEY_PREFIX + cache_key)
+    if record is None or record.get("company_id") != company_id:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=CACHE_TTL_SECONDS)
+        stored = db.query(Assessment).filter(
+            Assessment.cache_key == cache_key,
+            Assessment.company_id == company_id,
+            Assessment.created_at >= cutoff
+        ).order_by(Assessment.created_at.desc(), Assessment.id.desc()).first()
+        if stored is None:
+            return None
+        record = _assessment_record(stored)
+        store.set(CACHE_KEY_PREFIX + cache_key, record, CACHE_TTL_SECONDS)
+    return _select_language(record, language)
+
+
+def store_cached_assessment(assessment: Assessment) -> None:
+    """Remember a freshly saved assessment under its cache key"""
+    if assessment.cache_key:
+        get_shared_state().set(CACHE_KEY_PREFIX + assessment.cache_key, _assessment_record(assessment), CACHE_TTL_SECONDS)
+
+
+def clear_assessment_cache() -> None:
+    """Drop the cached entries of every worker (e.g. after the database has been reset)"""
+    get_shared_state().delete_prefix(CACHE_KEY_PREFIX)
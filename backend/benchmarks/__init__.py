@@ -0,0 +1,8 @@
+"""
+Benchmarks for the SME Financial Health Platform backend.
+Run from the backend directory, e.g. `python -m benchmarks.bench_ingestion`.
+
+`python -m benchmarks.suite` runs the end-to-end suite against generated
+ledgers (`benchmarks.ledger`) and writes JSON results that can be compared
+between commits.
+"""
@@ -0,0 +1,53 @@
+"""
+Benchmark: async OpenRouter client against the local stub server.
+
+Fires concurrent assessments through ai_service.query_openrouter while the
+stub injects latency and 429s, and reports throughput, errors and how many
+requests the stub had to rate-limit.
+
+Usage (from backend/):
+    python -m benchmarks.bench_llm_client --requests 40 --latency 0.3 --rate-limit 5
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--rate-limit", type=float, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    from benchmarks.stub_openrouter import serve
+    server, state = serve(port=args.port, latency=args.latency, rate_limit=args.rate_limit)
+    # ai_service reads its endpoint at import time
+    os.environ["OPENROUTER_URL"] = f"http://127.0.0.1:{args.port}/api/v1/chat/completions"
+    import ai_service
+
+    async def run():
+        started = time.perf_counter()
+        results = await asyncio.gather(*(ai_service.query_openrouter("ping") for _ in range(args.requests)))
+        elapsed = time.perf_counter() - started
+        await ai_service.close_openrouter_client()
+        return results, elapsed
+
+    try:
+        results, elapsed = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    errors = sum(1 for r in results if r.startswith("[Error:") or r.startswith("[Exception:"))
+    print(f"requests:      {args.requests}")
+    print(f"elapsed:       {elapsed:.2f}s")
+    print(f"throughput:    {args.requests / elapsed:.2f} req/s")
+    print(f"errors:        {errors}")
+    print(f"stub 429s:     {state.limited}")
+
+
+if __name__ == "__main__":
+    main()
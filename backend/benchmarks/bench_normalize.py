@@ -0,0 +1,63 @@
+"""
+Benchmark: per-row cost of processor.normalize_financial_frame on a synthetic raw ledger.
+
+Two inputs are measured: a clean ledger (numeric amounts, canonical columns)
+and a messy one with a `txn_date` column, string amounts with currency
+symbols and separators, and mixed-case type labels.
+
+Usage (from backend/):
+    python -m benchmarks.bench_normalize --rows 1000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from processor import normalize_financial_frame
+
+CATEGORIES = ["Sales Revenue", "Consulting Fees", "Office Rent", "Raw Materials",
+              "Utilities", "Employee Salaries", "Marketing Campaign", ""]
+TYPE_LABELS = ["Revenue", "revenue", "CR", "Income", "Expense", "expense", "DR", "Debit", "Liability", None]
+
+
+def raw_ledger(rows: int, messy: bool = True, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2019-01-01") + pd.to_timedelta(rng.integers(0, 5 * 365, rows), unit="D")
+    amounts = rng.gamma(2.0, 5000.0, rows).round(2)
+    if not messy:
+        return pd.DataFrame({
+            "date": dates.strftime("%Y-%m-%d"),
+            "category": rng.choice(CATEGORIES, rows),
+            "amount": amounts,
+            "type": rng.choice(["Revenue", "Expense"], rows),
+        })
+    return pd.DataFrame({
+        "Txn Date": dates.strftime("%Y-%m-%d"),
+        "Category": rng.choice(CATEGORIES, rows),
+        "Amount": pd.Series(amounts).map("₹{:,.2f}".format),
+        "Debit/Credit": rng.choice(np.array(TYPE_LABELS, dtype=object), rows),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"rows: {args.rows:,}  (best of {args.repeat})")
+    for label, messy in (("clean", False), ("messy", True)):
+        df = raw_ledger(args.rows, messy=messy)
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            normalized = normalize_financial_frame(df.copy())
+            best = min(best, time.perf_counter() - started)
+        print(f"{label:<6} {best:8.3f}s  {best / args.rows * 1e9:8,.0f} ns/row  {args.rows / best:12,.0f} rows/sec")
+
+    print(normalized.dtypes.to_string())
+
+
+if __name__ == "__main__":
+    main()
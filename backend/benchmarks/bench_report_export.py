@@ -0,0 +1,49 @@
+"""
+Benchmark: PDF report throughput, serial vs. the export process pool.
+
+Renders the same synthetic report N times in-process, then through
+ProcessPoolExecutors of increasing size (workers warmed as in report_export),
+and prints reports/sec and the speed-up over serial for each size.
+
+Usage (from backend/):
+    python -m benchmarks.bench_report_export --reports 200 --workers 1 2 4 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.bench_reports import ASSESSMENTS, SUMMARY
+from report_generator import render_report_bytes, warm_report_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=200)
+    parser.add_argument("--language", default="en", choices=sorted(ASSESSMENTS))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+    job = ("Demo SME Pvt Ltd", ASSESSMENTS[args.language], SUMMARY, args.language)
+
+    warm_report_worker()
+    started = time.perf_counter()
+    for _ in range(args.reports):
+        render_report_bytes(*job)
+    serial = args.reports / (time.perf_counter() - started)
+    print(f"serial      {serial:8.1f} reports/s")
+
+    for workers in sorted(set(args.workers)):
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=warm_report_worker) as pool:
+            # Start every worker before timing
+            list(pool.map(render_report_bytes, *zip(*[job] * workers)))
+            started = time.perf_counter()
+            list(pool.map(render_report_bytes, *zip(*[job] * args.reports), chunksize=4))
+            rate = args.reports / (time.perf_counter() - started)
+        print(f"{workers:2d} workers  {rate:8.1f} reports/s  ({rate / serial:.2f}x serial, {os.cpu_count()} CPUs)")
+
+
+if __name__ == "__main__":
+    main()
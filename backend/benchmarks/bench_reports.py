@@ -0,0 +1,62 @@
+"""
+Benchmark: PDF report rendering time and file size per language.
+
+Fonts are registered before timing starts (as the app does at startup), so the
+numbers cover layout and subset embedding only.
+
+Usage (from backend/):
+    python -m benchmarks.bench_reports --repeat 20
+"""
+
+import argparse
+import time
+
+from report_fonts import fonts_for_language, register_fonts
+from report_generator import generate_pdf_report
+
+SUMMARY = {"total_revenue": 1250000.0, "total_expense": 980000.0, "net_income": 270000.0}
+
+ASSESSMENTS = {
+    "en": {
+        "score": 68, "risk_level": "Medium",
+        "narrative": "Revenue covers operating costs with a thin margin; salaries and inventory dominate spending.",
+        "recommendations": ["Build a three-month cash reserve", "Negotiate supplier terms", "Track monthly margins"],
+    },
+    "hi": {
+        "score": 68, "risk_level": "मध्यम",
+        "narrative": "राजस्व परिचालन लागत को कम मार्जिन के साथ कवर करता है; वेतन और इन्वेंटरी खर्च पर हावी हैं।",
+        "recommendations": ["तीन महीने का नकद भंडार बनाएं", "आपूर्तिकर्ता शर्तों पर बातचीत करें", "मासिक मार्जिन पर नज़र रखें"],
+    },
+    "ta": {
+        "score": 68, "risk_level": "நடுத்தரம்",
+        "narrative": "வருவாய் குறைந்த லாபத்துடன் செயல்பாட்டுச் செலவுகளை ஈடுகட்டுகிறது; சம்பளமும் சரக்கும் செலவில் முதன்மையானவை.",
+        "recommendations": ["மூன்று மாத பண இருப்பை உருவாக்குங்கள்", "சப்ளையர் விதிமுறைகளை பேச்சுவார்த்தை செய்யுங்கள்", "மாதாந்திர லாபத்தைக் கண்காணியுங்கள்"],
+    },
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    register_fonts()
+    print(f"Font registration: {(time.perf_counter() - started) * 1000:.1f} ms (once per process)")
+
+    for language, assessment in ASSESSMENTS.items():
+        # Warm-up render builds the per-language styles
+        size = len(generate_pdf_report("Demo SME Pvt Ltd", assessment, SUMMARY, language).getvalue())
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            generate_pdf_report("Demo SME Pvt Ltd", assessment, SUMMARY, language)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        regular, _ = fonts_for_language(language)
+        print(f"{language}: font {regular:<20} median {timings[len(timings) // 2] * 1000:7.1f} ms  "
+              f"best {timings[0] * 1000:7.1f} ms  size {size / 1024:6.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
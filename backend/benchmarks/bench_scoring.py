@@ -0,0 +1,58 @@
+"""
+Benchmark: vectorized rule-based scoring (scoring.score_arrays) over synthetic companies.
+
+Usage (from backend/):
+    python -m benchmarks.bench_scoring --companies 10000 --months 24
+"""
+
+import argparse
+import time
+
+import numpy as np
+from scoring import score_arrays
+
+
+def synthetic_portfolio(companies: int, months: int, categories: int, seed: int = 11):
+    rng = np.random.default_rng(seed)
+    base = rng.lognormal(11, 1, (companies, 1))
+    growth = 1 + rng.normal(0.01, 0.03, (companies, 1)) * np.arange(months)
+    revenue = base * growth * rng.lognormal(0, 0.25, (companies, months))
+    expense = revenue * rng.uniform(0.6, 1.2, (companies, 1)) * rng.lognormal(0, 0.15, (companies, months))
+    # Companies with shorter histories: mask out their earliest months
+    start = rng.integers(0, months // 2, companies)
+    mask = np.arange(months) >= start[:, None]
+    category_expense = rng.dirichlet(np.full(categories, 0.7), companies) * expense.sum(axis=1, keepdims=True)
+    return revenue, expense, mask, category_expense
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--companies", type=int, default=10000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--categories", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    revenue, expense, mask, category_expense = synthetic_portfolio(args.companies, args.months, args.categories)
+    best = float("inf")
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        result = score_arrays(revenue, expense, mask, category_expense)
+        best = min(best, time.perf_counter() - started)
+
+    single = float("inf")
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        score_arrays(revenue[:1], expense[:1], mask[:1], category_expense[:1])
+        single = min(single, time.perf_counter() - started)
+
+    levels, counts = np.unique(result["risk_level"], return_counts=True)
+    print(f"companies:       {args.companies:,} x {args.months} months")
+    print(f"batch (best):    {best * 1000:.1f} ms  ->  {args.companies / best:,.0f} companies/sec")
+    print(f"single company:  {single * 1e6:.0f} us")
+    print(f"mean score:      {result['score'].mean():.1f}")
+    print("risk levels:     " + ", ".join(f"{l}={c}" for l, c in zip(levels, counts)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Import-time budget for the API process.
+
+Imports main in fresh interpreters and fails (exit status 1) when the median
+import takes longer than --budget-ms, or when any of the modules that
+warmup.py defers (pandas, numpy, reportlab, ...) got loaded by the import.
+The module check is exact. The time budget depends on the machine, so set
+IMPORT_BUDGET_MS for the CI runner.
+
+Usage (from backend/):
+    python -m benchmarks.import_budget
+    python -m benchmarks.import_budget --budget-ms 800 --repeat 7 --top 15
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Must stay out of `import main`: they are loaded by warmup.py or on first use
+DEFERRED_MODULES = ("pandas", "numpy", "openpyxl", "reportlab", "pyarrow", "httpx", "processor", "ingestion",
+                    "analysis", "ai_service", "report_generator", "report_export", "trends", "scoring")
+
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({"ms": elapsed * 1000, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def _environment() -> dict:
+    env = dict(os.environ)
+    # main needs a DATABASE_URL at import; nothing connects until startup
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'import_budget.db')}")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def measure_import(extra_args=()) -> tuple:
+    """(milliseconds, deferred modules loaded, stderr) of one `import main` in a new interpreter"""
+    result = subprocess.run([sys.executable, *extra_args, "-c", _CHILD % (DEFERRED_MODULES,)],
+                            capture_output=True, text=True, env=_environment(), check=True)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return report["ms"], report["loaded"], result.stderr
+
+
+def slowest_imports(stderr: str, top: int) -> list:
+    """(cumulative µs, module) of the slowest direct imports of main in -X importtime output"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nesting adds two spaces: " main", then "   fastapi" for what main imports itself
+        if name.startswith("   ") and not name.startswith("    "):
+            entries.append((int(cumulative), name.strip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1500")))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="also list the N slowest imports of main")
+    args = parser.parse_args()
+
+    # The first run also warms the OS file cache
+    measure_import()
+    timings, loaded = [], set()
+    for _ in range(args.repeat):
+        ms, modules, _ = measure_import()
+        timings.append(ms)
+        loaded.update(modules)
+    median = statistics.median(timings)
+    print(f"import main: median {median:.0f} ms, min {min(timings):.0f} ms over {args.repeat} runs "
+          f"(budget {args.budget_ms:.0f} ms)")
+
+    if args.top:
+        _, _, stderr = measure_import(["-X", "importtime"])
+        for cumulative, name in slowest_imports(stderr, args.top):
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: import main loaded deferred modules: {', '.join(sorted(loaded))}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"FAIL: import main took {median:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Synthetic SME ledger generator for benchmarks.
+
+Produces Date, Category, Amount, Type ledgers that look like the real uploads:
+recurring monthly rent and salaries, seasonal sales, long-tailed (lognormal)
+amounts per category and roughly a third of rows as revenue. Rows come out in
+date order. Output is deterministic for a given (rows, seed), so files
+generated on two machines or two commits are identical.
+
+Files are written in chunks, so a 10M-row CSV never needs the whole ledger in
+memory. XLSX is capped at Excel's sheet limit of 1,048,576 rows.
+
+Usage (from backend/):
+    python -m benchmarks.ledger --rows 1m --format csv xlsx --out-dir /tmp/ledgers
+"""
+
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Named benchmark sizes
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+# (category, type, share of rows, lognormal median amount, lognormal sigma)
+CATEGORY_PROFILES = [
+    ("Sales Revenue", "Revenue", 0.22, 18000.0, 0.9),
+    ("Consulting Fees", "Revenue", 0.06, 9000.0, 0.6),
+    ("Interest Income", "Revenue", 0.02, 600.0, 0.5),
+    ("Raw Materials", "Expense", 0.18, 7000.0, 0.8),
+    ("Inventory Purchase", "Expense", 0.14, 5500.0, 0.9),
+    ("Employee Salaries", "Expense", 0.10, 30000.0, 0.2),
+    ("Office Rent", "Expense", 0.04, 25000.0, 0.05),
+    ("Utilities", "Expense", 0.07, 1800.0, 0.4),
+    ("Marketing Campaign", "Expense", 0.06, 4000.0, 1.0),
+    ("Logistics", "Expense", 0.07, 2200.0, 0.7),
+    ("Equipment Loan", "Liability", 0.02, 15000.0, 0.3),
+    ("Machinery", "Asset", 0.02, 40000.0, 0.8),
+]
+
+START_DATE = "2019-01-01"
+YEARS = 5
+# Rows generated (and written) per chunk
+CHUNK_ROWS = 500_000
+XLSX_MAX_ROWS = 1_048_575  # one sheet, minus the header row
+
+_NAMES = np.array([p[0] for p in CATEGORY_PROFILES], dtype=object)
+_TYPES = np.array([p[1] for p in CATEGORY_PROFILES], dtype=object)
+_SHARES = np.array([p[2] for p in CATEGORY_PROFILES]) / sum(p[2] for p in CATEGORY_PROFILES)
+_LOG_MEDIANS = np.log([p[3] for p in CATEGORY_PROFILES])
+_SIGMAS = np.array([p[4] for p in CATEGORY_PROFILES])
+
+
+def parse_size(value: str) -> int:
+    """'100k', '1m', '10m' or a plain integer"""
+    value = str(value).lower().replace("_", "")
+    if value in SIZES:
+        return SIZES[value]
+    return int(value)
+
+
+def size_label(rows: int) -> str:
+    for label, size in SIZES.items():
+        if size == rows:
+            return label
+    return str(rows)
+
+
+def _chunk(rows: int, start: int, total: int, seed: int) -> pd.DataFrame:
+    """Rows [start, start + rows) of a `total`-row ledger; each chunk covers its own slice of the date range"""
+    rng = np.random.default_rng([seed, start])
+    days = YEARS * 365
+    first_day = start * days // total
+    last_day = max((start + rows) * days // total, first_day + 1)
+    offsets = np.sort(rng.integers(first_day, last_day, rows))
+    dates = pd.Timestamp(START_DATE) + pd.to_timedelta(offsets, unit="D")
+
+    category = rng.choice(len(CATEGORY_PROFILES), rows, p=_SHARES)
+    amount = np.exp(rng.normal(_LOG_MEDIANS[category], _SIGMAS[category]))
+    # Revenue peaks before the year-end festive season
+    seasonal = 1.0 + 0.25 * np.sin(2 * np.pi * (dates.month.to_numpy() - 8) / 12)
+    amount = np.where(_TYPES[category] == "Revenue", amount * seasonal, amount).round(2)
+
+    return pd.DataFrame({
+        "Date": dates.strftime("%Y-%m-%d"),
+        "Category": _NAMES[category],
+        "Amount": amount,
+        "Type": _TYPES[category],
+    })
+
+
+def iter_ledger(rows: int, seed: int = 42, chunk_rows: int = CHUNK_ROWS):
+    """Yield the ledger in DataFrames of at most chunk_rows rows"""
+    for start in range(0, rows, chunk_rows):
+        yield _chunk(min(chunk_rows, rows - start), start, rows, seed)
+
+
+def synthetic_ledger(rows: int, seed: int = 42) -> pd.DataFrame:
+    """The whole ledger as one DataFrame (raw upload columns, dates as strings)"""
+    return pd.concat(list(iter_ledger(rows, seed)), ignore_index=True)
+
+
+def write_csv(path: str, rows: int, seed: int = 42) -> str:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for index, chunk in enumerate(iter_ledger(rows, seed)):
+            chunk.to_csv(f, index=False, header=index == 0)
+    return path
+
+
+def write_xlsx(path: str, rows: int, seed: int = 42) -> str:
+    from openpyxl import Workbook
+
+    if rows > XLSX_MAX_ROWS:
+        raise ValueError(f"XLSX sheets hold at most {XLSX_MAX_ROWS:,} data rows; use CSV for {rows:,}")
+    # write_only streams rows to disk instead of building the sheet in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Ledger")
+    sheet.append(["Date", "Category", "Amount", "Type"])
+    for chunk in iter_ledger(rows, seed):
+        for row in chunk.itertuples(index=False):
+            sheet.append([row.Date, row.Category, float(row.Amount), row.Type])
+    workbook.save(path)
+    return path
+
+
+def ledger_file(rows: int, fmt: str = "csv", seed: int = 42, out_dir: str = None) -> str:
+    """
+    Path of a generated ledger, writing it only if it is not already on disk.
+
+    Args:
+        fmt: "csv" or "xlsx"
+        out_dir: Directory for generated files (default: BENCH_DATA_DIR or <tmp>/sme_bench_ledgers)
+    """
+    out_dir = out_dir or os.getenv("BENCH_DATA_DIR") or os.path.join(tempfile.gettempdir(), "sme_bench_ledgers")
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"ledger_{size_label(rows)}_s{seed}.{fmt}")
+    if not os.path.exists(path):
+        # Write next to the target and rename, so an interrupted run never leaves a truncated ledger
+        partial = f"{path}.partial"
+        (write_csv if fmt == "csv" else write_xlsx)(partial, rows, seed)
+        os.replace(partial, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", nargs="+", default=["1k"], help="sizes: 1k 100k 1m 10m or row counts")
+    parser.add_argument("--format", nargs="+", choices=["csv", "xlsx"], default=["csv"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out-dir", default=None)
+    args = parser.parse_args()
+
+    for size in args.rows:
+        rows = parse_size(size)
+        for fmt in args.format:
+            try:
+                path = ledger_file(rows, fmt, args.seed, args.out_dir)
+            except ValueError as e:
+                print(f"skipped {size_label(rows)} {fmt}: {e}")
+                continue
+            print(f"{path}  {os.path.getsize(path) / 1e6:,.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
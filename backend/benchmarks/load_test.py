@@ -0,0 +1,111 @@
+"""
+Load test for the hot routes (/upload and /analyze) of a running API.
+
+Each worker loops for --duration seconds: "upload" posts a small generated
+ledger (unique per request, so none is rejected as a duplicate), "analyze"
+enqueues an analysis job for a company created at start-up, and "mixed"
+alternates between the two. Prints throughput and latency percentiles, plus
+the server's connection pool metrics when /metrics/db-pool is available.
+
+Run the API against a local Postgres (e.g. DATABASE_URL=postgresql://...
+uvicorn main:app --workers 1) and then, from backend/:
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000 --scenario mixed --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+
+def _ledger(rows: int = 200) -> bytes:
+    lines = ["date,category,amount,type"]
+    salt = random.random()
+    for i in range(rows):
+        kind = "Revenue" if i % 3 == 0 else "Expense"
+        lines.append(f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d},Cat{i % 7},{1000 + i + salt:.4f},{kind}")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def _upload(client: httpx.AsyncClient, rows: int) -> httpx.Response:
+    return await client.post("/upload", files={"file": ("load.csv", _ledger(rows), "text/csv")})
+
+
+async def _analyze(client: httpx.AsyncClient, company_id: int) -> httpx.Response:
+    return await client.post("/analyze", json={"company_id": company_id})
+
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def run(args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60.0, limits=limits) as client:
+        seed = await _upload(client, args.rows)
+        seed.raise_for_status()
+        company_id = seed.json()["company_id"]
+
+        latencies = {"upload": [], "analyze": []}
+        errors = {"upload": 0, "analyze": 0}
+        deadline = time.perf_counter() + args.duration
+
+        async def worker(index: int) -> None:
+            turn = index
+            while time.perf_counter() < deadline:
+                if args.scenario == "mixed":
+                    route = "upload" if turn % 2 == 0 else "analyze"
+                else:
+                    route = args.scenario
+                turn += 1
+                started = time.perf_counter()
+                try:
+                    response = await (_upload(client, args.rows) if route == "upload" else _analyze(client, company_id))
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                latencies[route].append(time.perf_counter() - started)
+                if not ok:
+                    errors[route] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        report = {"scenario": args.scenario, "concurrency": args.concurrency, "seconds": round(elapsed, 2), "routes": {}}
+        for route, values in latencies.items():
+            if not values:
+                continue
+            values.sort()
+            report["routes"][route] = {
+                "requests": len(values),
+                "errors": errors[route],
+                "rps": round(len(values) / elapsed, 1),
+                "p50_ms": round(_percentile(values, 0.50) * 1000, 1),
+                "p95_ms": round(_percentile(values, 0.95) * 1000, 1),
+                "p99_ms": round(_percentile(values, 0.99) * 1000, 1),
+            }
+        pool = await client.get("/metrics/db-pool")
+        if pool.status_code == 200:
+            report["db_pool"] = pool.json()
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenario", choices=["upload", "analyze", "mixed"], default="mixed")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--rows", type=int, default=200, help="rows per uploaded ledger")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
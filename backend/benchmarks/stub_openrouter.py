@@ -0,0 +1,166 @@
+"""
+Local stand-in for the OpenRouter chat completions API.
+
+Simulates latency, rate limiting and server errors so the async client (ai_service) can be
+exercised without network access or API quota. Requests with "stream": true
+get Server-Sent Events: the first fragment after a tenth of the latency, the
+rest spread over the remainder, and usage in the last chunk. Point the backend at it with
+OPENROUTER_URL=http://127.0.0.1:8765/api/v1/chat/completions
+
+Usage (from backend/):
+    python -m benchmarks.stub_openrouter --latency 0.8 --rate-limit 5
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Characters of the completion per streamed chunk
+STREAM_CHUNK_CHARS = 8
+STUB_USAGE = {"prompt_tokens": 250, "completion_tokens": 120, "total_tokens": 370}
+
+STUB_ASSESSMENT = {
+    "score": 72,
+    "risk_level": "Medium",
+    "narrative": "Revenue comfortably covers operating expenses, but costs are concentrated in salaries and inventory.",
+    "recommendations": ["Build a three-month cash reserve", "Negotiate supplier terms", "Track monthly margins"],
+}
+
+
+class StubState:
+    """Sliding one-second window used to decide when to answer 429, and the 503s still to send"""
+
+    def __init__(self, rate_limit: float, retry_after: float, fail_first: int = 0):
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.failures_left = fail_first
+        self.calls = []
+        self.served = 0
+        self.limited = 0
+        self.failed = 0
+        self.lock = threading.Lock()
+
+    def fail(self) -> bool:
+        with self.lock:
+            if self.failures_left <= 0:
+                return False
+            self.failures_left -= 1
+            self.failed += 1
+            return True
+
+    def admit(self) -> bool:
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        with self.lock:
+            self.calls = [t for t in self.calls if now - t < 1.0]
+            if len(self.calls) >= self.rate_limit:
+                self.limited += 1
+                return False
+            self.calls.append(now)
+            return True
+
+
+def make_handler(state: StubState, latency: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def _send_json(self, status: int, body: dict, headers: dict = None):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+
+            if not state.admit():
+                self._send_json(429, {"error": {"code": 429, "message": "Rate limit exceeded"}},
+                                {"Retry-After": str(state.retry_after)})
+                return
+            if state.fail():
+                self._send_json(503, {"error": {"code": 503, "message": "Service temporarily unavailable"}})
+                return
+
+            if request.get("stream"):
+                self._stream(request)
+                return
+
+            time.sleep(latency)
+            with state.lock:
+                state.served += 1
+            self._send_json(200, {
+                "model": request.get("model"),
+                "choices": [{"message": {"role": "assistant", "content": json.dumps(STUB_ASSESSMENT)}}],
+                "usage": STUB_USAGE,
+            })
+
+        def _write_chunk(self, text: str):
+            data = text.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def _stream(self, request: dict):
+            content = json.dumps(STUB_ASSESSMENT, ensure_ascii=False)
+            pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self._write_chunk(": OPENROUTER PROCESSING\n\n")
+            time.sleep(latency / 10)
+            for index, piece in enumerate(pieces):
+                if index:
+                    time.sleep(latency * 0.9 / len(pieces))
+                chunk = {"model": request.get("model"), "choices": [{"delta": {"content": piece}}]}
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+            self._write_chunk(f"data: {json.dumps({'choices': [], 'usage': STUB_USAGE})}\n\n")
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            with state.lock:
+                state.served += 1
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, latency: float = 0.5,
+          rate_limit: float = 0, retry_after: float = 1.0, fail_first: int = 0):
+    """Start the stub in a background thread; returns (server, state)"""
+    state = StubState(rate_limit, retry_after, fail_first)
+    server = ThreadingHTTPServer((host, port), make_handler(state, latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds before each completion")
+    parser.add_argument("--rate-limit", type=float, default=0, help="Requests per second before 429 (0 = unlimited)")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429")
+    parser.add_argument("--fail-first", type=int, default=0, help="Answer the first N requests with 503")
+    args = parser.parse_args()
+
+    server, state = serve(args.host, args.port, args.latency, args.rate_limit, args.retry_after, args.fail_first)
+    print(f"Stub OpenRouter listening on http://{args.host}:{args.port}/api/v1/chat/completions")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"served={state.served} rate_limited={state.limited} failed={state.failed}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Reproducible benchmark suite: parsing, upload ingestion, /analyze and PDF rendering
+against synthetic ledgers (see benchmarks.ledger) of increasing size.
+
+Every run uses a throwaway database (SQLite unless BENCH_DATABASE_URL is set)
+and the local OpenRouter stub in place of the LLM, so numbers depend only on
+the code and the machine. Results are written as JSON with the git commit they
+were measured on. Pass an earlier result file to --compare to flag
+regressions: the exit status is 1 when any median got slower by more than
+--threshold.
+
+Benchmarks:
+    parse            processor.parse_financial_document (whole file in memory)
+    parse_streaming  processor.StreamingFinancialDocument, batch by batch
+    upload           POST /upload end to end (streaming parse + bulk insert + rollups)
+    analyze_summary  analysis.summary_block: the SQL aggregation behind /analyze
+    analyze          POST /analyze/{company_id}?force_refresh=true with the stub LLM
+    report           report_generator.generate_pdf_report for the uploaded company
+
+Usage (from backend/):
+    python -m benchmarks.suite --sizes 1k 100k --formats csv xlsx --output bench.json
+    python -m benchmarks.suite --sizes 1k 100k --formats csv xlsx --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.ledger import ledger_file, parse_size, size_label
+
+BENCHMARKS = ["parse", "parse_streaming", "upload", "analyze_summary", "analyze", "report"]
+# Benchmarks that run once per size on the uploaded company rather than once per file format
+PER_COMPANY = {"analyze_summary", "analyze", "report"}
+
+
+def _git_revision() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def _environment(database_url: str) -> dict:
+    import numpy
+    import pandas
+    import sqlalchemy
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "database": database_url.split(":", 1)[0],
+        "packages": {"pandas": pandas.__version__, "numpy": numpy.__version__, "sqlalchemy": sqlalchemy.__version__},
+    }
+
+
+def _measure(fn, repeat: int, setup=None) -> tuple:
+    """(timings, last result); setup() runs untimed before every repetition"""
+    timings, result = [], None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return timings, result
+
+
+def _entry(benchmark: str, rows: int, fmt, timings: list, **extra) -> dict:
+    median = statistics.median(timings)
+    entry = {
+        "benchmark": benchmark,
+        "size": size_label(rows),
+        "rows": rows,
+        "format": fmt,
+        "repeat": len(timings),
+        "seconds": {
+            "min": round(min(timings), 6),
+            "median": round(median, 6),
+            "mean": round(statistics.fmean(timings), 6),
+            "max": round(max(timings), 6),
+        },
+        "rows_per_sec": round(rows / median, 1) if median > 0 else None,
+    }
+    if extra:
+        entry["extra"] = extra
+    print(f"{benchmark:<16} {size_label(rows):>5} {fmt or '-':<5} median {median * 1000:10.1f} ms  "
+          f"{entry['rows_per_sec'] or 0:>14,.0f} rows/sec", file=sys.stderr)
+    return entry
+
+
+def _skipped(benchmark: str, rows: int, fmt, reason: str) -> dict:
+    print(f"{benchmark:<16} {size_label(rows):>5} {fmt or '-':<5} skipped: {reason}", file=sys.stderr)
+    return {"benchmark": benchmark, "size": size_label(rows), "rows": rows, "format": fmt, "skipped": reason}
+
+
+def run_suite(args) -> dict:
+    from fastapi.testclient import TestClient
+    import main as app_module
+    from database import SessionLocal
+    from processor import StreamingFinancialDocument, parse_financial_document
+    from analysis import summary_block
+    from aggregation import get_financial_summary
+    from report_generator import generate_pdf_report
+    from benchmarks.stub_openrouter import STUB_ASSESSMENT
+
+    selected = [b for b in BENCHMARKS if b in args.benchmarks]
+    results = []
+
+    with TestClient(app_module.app) as client:
+        def reset():
+            client.post("/reset-db").raise_for_status()
+
+        def upload(path):
+            with open(path, "rb") as f:
+                response = client.post("/upload", files={"file": (os.path.basename(path), f)})
+            response.raise_for_status()
+            return response.json()
+
+        for size in args.sizes:
+            rows = parse_size(size)
+            company_id = None
+
+            for fmt in args.formats:
+                try:
+                    path = ledger_file(rows, fmt, args.seed, args.data_dir)
+                except ValueError as e:
+                    results += [_skipped(b, rows, fmt, str(e)) for b in selected if b not in PER_COMPANY]
+                    continue
+
+                if "parse" in selected:
+                    if rows > args.in_memory_max_rows:
+                        results.append(_skipped("parse", rows, fmt, f"above --in-memory-max-rows ({args.in_memory_max_rows:,})"))
+                    else:
+                        with open(path, "rb") as f:
+                            content = f.read()
+                        timings, records = _measure(lambda: parse_financial_document(content, path), args.repeat)
+                        results.append(_entry("parse", rows, fmt, timings, records=len(records)))
+                        del content, records
+
+                if "parse_streaming" in selected:
+                    def stream_parse():
+                        with open(path, "rb") as f:
+                            document = StreamingFinancialDocument(f, path)
+                            for _ in document:
+                                pass
+                            return document.rows
+                    timings, parsed = _measure(stream_parse, args.repeat)
+                    results.append(_entry("parse_streaming", rows, fmt, timings, records=parsed))
+
+                if "upload" in selected:
+                    timings, body = _measure(lambda: upload(path), args.repeat, setup=reset)
+                    results.append(_entry("upload", rows, fmt, timings, ingestion=body.get("ingestion")))
+                    company_id = body["company_id"]
+
+            if not PER_COMPANY.intersection(selected):
+                continue
+            if company_id is None:
+                # Nothing uploaded for this size yet: load the first format untimed
+                reset()
+                company_id = upload(ledger_file(rows, args.formats[0], args.seed, args.data_dir))["company_id"]
+
+            if "analyze_summary" in selected:
+                db = SessionLocal()
+                try:
+                    timings, _ = _measure(lambda: summary_block(db, company_id), args.repeat)
+                finally:
+                    db.close()
+                results.append(_entry("analyze_summary", rows, None, timings))
+
+            if "analyze" in selected:
+                def analyze():
+                    response = client.post(f"/analyze/{company_id}", params={"force_refresh": "true"})
+                    response.raise_for_status()
+                    return response.json()
+                timings, _ = _measure(analyze, args.repeat)
+                results.append(_entry("analyze", rows, None, timings, stub_latency=args.stub_latency))
+
+            if "report" in selected:
+                db = SessionLocal()
+                try:
+                    summary = get_financial_summary(db, company_id)
+                finally:
+                    db.close()
+                generate_pdf_report("Benchmark SME", STUB_ASSESSMENT, summary, "en")  # warm fonts and styles
+                timings, pdf = _measure(
+                    lambda: generate_pdf_report("Benchmark SME", STUB_ASSESSMENT, summary, "en"), args.repeat
+                )
+                results.append(_entry("report", rows, None, timings, pdf_bytes=len(pdf.getvalue())))
+
+    return {
+        "suite": "sme-backend",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git": _git_revision(),
+        "environment": _environment(os.environ["DATABASE_URL"]),
+        "config": {"sizes": args.sizes, "formats": args.formats, "repeat": args.repeat, "seed": args.seed},
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> bool:
+    """Print median ratios against a baseline run; True when something regressed beyond threshold"""
+    def key(entry):
+        return entry["benchmark"], entry["size"], entry["format"]
+
+    before = {key(e): e for e in baseline.get("results", []) if "seconds" in e}
+    regressed = False
+    print(f"\nvs {(baseline.get('git') or {}).get('commit') or 'baseline'}:", file=sys.stderr)
+    for entry in current["results"]:
+        old = before.get(key(entry))
+        if old is None or "seconds" not in entry:
+            continue
+        ratio = entry["seconds"]["median"] / old["seconds"]["median"] if old["seconds"]["median"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag, regressed = "  REGRESSION", True
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        benchmark, size, fmt = key(entry)
+        print(f"{benchmark:<16} {size:>5} {fmt or '-':<5} {old['seconds']['median'] * 1000:10.1f} ms -> "
+              f"{entry['seconds']['median'] * 1000:10.1f} ms  x{ratio:5.2f}{flag}", file=sys.stderr)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["1k", "100k"], help="1k 100k 1m 10m or row counts")
+    parser.add_argument("--formats", nargs="+", choices=["csv", "xlsx"], default=["csv", "xlsx"])
+    parser.add_argument("--benchmarks", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default=None, help="where generated ledgers are cached")
+    parser.add_argument("--in-memory-max-rows", type=int, default=1_000_000,
+                        help="largest ledger given to the whole-file parse_financial_document")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="seconds the stub LLM waits per call")
+    parser.add_argument("--stub-port", type=int, default=8767)
+    parser.add_argument("--output", help="write the JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="earlier JSON results to compare medians against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    # The backend reads these at import time, so they are set before anything from it is imported
+    workdir = tempfile.mkdtemp(prefix="sme_suite_")
+    os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["REPORT_CACHE_DIR"] = os.path.join(workdir, "reports")
+    os.environ["OPENROUTER_URL"] = f"http://127.0.0.1:{args.stub_port}/api/v1/chat/completions"
+
+    baseline = None
+    if args.compare:
+        # Read first: --output may point at the same file
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    from benchmarks.stub_openrouter import serve
+    server, _ = serve(port=args.stub_port, latency=args.stub_latency)
+    try:
+        report = run_suite(args)
+    finally:
+        server.shutdown()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if baseline is not None and compare(report, baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Production serving: gunicorn managing uvicorn workers.
+
+    cd backend && gunicorn -c gunicorn.conf.py main:app
+
+Workers share the assessment cache, the OpenRouter rate-limit bucket and the
+analysis job queue through shared_state.py (a SQLite file next to the other
+workers by default, SHARED_STATE_URL=redis://... across hosts), so N workers
+make the same number of OpenRouter calls as one and any of them can run a job
+another accepted. /metrics sums the metrics every worker publishes there
+(instrumentation.py), so a scrape covers all workers. The master runs the schema migrations and requeues jobs left
+over from the last run once before forking; workers skip both.
+
+Settings (environment):
+    WEB_CONCURRENCY      worker processes (default: one per CPU, at least 2)
+    BIND / PORT          listen address (default 0.0.0.0:$PORT, PORT 8000)
+    WORKER_TIMEOUT       seconds a silent worker is allowed before it is restarted
+    GRACEFUL_TIMEOUT     seconds workers get to finish in-flight requests and jobs on shutdown
+"""
+
+import os
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", str(max(2, os.cpu_count() or 1))))
+worker_class = "uvicorn_worker.UvicornWorker"
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+accesslog = "-"
+
+# Read by migrations.py and jobs.py when each worker imports main: on_starting has done both already
+os.environ["AUTO_MIGRATE"] = "false"
+os.environ["JOB_RECOVERY"] = "false"
+
+
+def on_starting(server):
+    from database import engine
+    from instrumentation import METRICS_KEY_PREFIX
+    from jobs import recover_jobs
+    from migrations import upgrade
+    from shared_state import close_shared_state, get_shared_state
+
+    upgrade()
+    requeued = recover_jobs()
+    if requeued:
+        server.log.info("Requeued %d unfinished analysis jobs", requeued)
+    # Metrics count from this start on, like the process-local counters they replace
+    get_shared_state().delete_prefix(METRICS_KEY_PREFIX)
+    # Workers are forked from the master: none of its connections may leak into them
+    engine.dispose()
+    close_shared_state()
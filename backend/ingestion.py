@@ -0,0 +1,278 @@
+"""
+Bulk ingestion engine for parsed financial records.
+Streams rows with COPY on PostgreSQL and falls back to batched executemany
+inserts on other dialects.
+
+Every row is stored with a 64-bit fingerprint of (date, category, amount,
+type, occurrence), where occurrence counts identical rows earlier in the same
+upload. Uploading a ledger again into the same company inserts only the rows
+whose fingerprints the company does not have yet, so a re-upload with a few
+new rows costs about as much as ingesting those rows.
+
+ingest_batches_async is the same pipeline for an AsyncSession: parsing and
+hashing run in worker threads and the inserts go through the async driver
+(binary COPY on asyncpg).
+"""
+
+import asyncio
+import io
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, select, union_all
+from sqlalchemy.orm import Session
+from models import FinancialRecord, FinancialRecordArchive
+from summary import apply_summary_delta
+from instrumentation import add_count, span
+
+# Rows sent per COPY statement / executemany batch
+COPY_CHUNK_ROWS = 50000
+INSERT_BATCH_SIZE = 5000
+
+RECORD_COLUMNS = ["company_id", "record_type", "category", "amount", "currency", "date", "source_document",
+                  "row_fingerprint"]
+
+FINGERPRINT_COLUMNS = ["date", "category", "amount", "type"]
+# Fingerprints per IN (...) lookup, well below the bind-parameter limits of SQLite and PostgreSQL
+FINGERPRINT_LOOKUP_SIZE = 10000
+
+
+def _prepare_frame(df: pd.DataFrame, company_id: int, source_document: str, fingerprints=None) -> pd.DataFrame:
+    """Lay a normalized batch out as financial_records columns; no per-row Python work."""
+    frame = df.rename(columns={'type': 'record_type'})
+    frame = frame.assign(company_id=company_id, currency="INR", source_document=source_document,
+                         row_fingerprint=fingerprints)
+    return frame[RECORD_COLUMNS]
+
+
+class RowFingerprinter:
+    """
+    Vectorized row fingerprints over the batches of one upload.
+    Identical rows are told apart by their occurrence number, which keeps counting
+    across batches, so a ledger with two equal rent payments keeps both.
+    """
+
+    def __init__(self):
+        # Base row hash -> rows with that hash seen so far in this upload
+        self._seen = pd.Series(dtype="int64", index=pd.Index([], dtype="uint64"))
+
+    def __call__(self, df: pd.DataFrame) -> np.ndarray:
+        """int64 fingerprint per row of a normalized batch"""
+        base = pd.util.hash_pandas_object(
+            df[FINGERPRINT_COLUMNS].assign(amount=df["amount"].round(2)), index=False
+        ).to_numpy()
+        prior = self._seen.reindex(base).fillna(0).to_numpy(dtype="int64")
+        occurrence = pd.Series(base).groupby(base).cumcount().to_numpy() + prior
+        counts = pd.Series(base).value_counts()
+        self._seen = self._seen.add(counts, fill_value=0).astype("int64")
+        fingerprints = pd.util.hash_pandas_object(
+            pd.DataFrame({"base": base, "occurrence": occurrence}), index=False
+        ).to_numpy()
+        return fingerprints.view("int64")
+
+
+def existing_fingerprints(db: Session, company_id: int, fingerprints: np.ndarray) -> np.ndarray:
+    """
+    The subset of `fingerprints` the company already has, live or archived (see retention.py),
+    via the (company_id, row_fingerprint) indexes
+    """
+    found = []
+    for start in range(0, len(fingerprints), FINGERPRINT_LOOKUP_SIZE):
+        chunk = fingerprints[start:start + FINGERPRINT_LOOKUP_SIZE].tolist()
+        found.extend(db.execute(union_all(*[
+            select(table.row_fingerprint).where(table.company_id == company_id, table.row_fingerprint.in_(chunk))
+            for table in (FinancialRecord, FinancialRecordArchive)
+        ])).scalars())
+    return np.array(found, dtype="int64")
+
+
+def _supports_copy(db: Session) -> bool:
+    bind = db.get_bind()
+    return bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg2"
+
+
+def _supports_async_copy(db: Session) -> bool:
+    """asyncpg connection behind a sync Session facade (AsyncSession.run_sync)"""
+    bind = db.get_bind()
+    return bind.dialect.name == "postgresql" and bind.dialect.driver == "asyncpg"
+
+
+def _copy_frame(db: Session, frame: pd.DataFrame) -> None:
+    """Stream the frame into financial_records with COPY ... FROM STDIN, one CSV chunk at a time."""
+    raw = db.connection().connection.driver_connection
+    statement = f"COPY financial_records ({', '.join(RECORD_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+    with raw.cursor() as cursor:
+        for start in range(0, len(frame), COPY_CHUNK_ROWS):
+            buffer = io.StringIO()
+            # Empty unquoted fields are read back as NULL by COPY
+            frame.iloc[start:start + COPY_CHUNK_ROWS].to_csv(
+                buffer, index=False, header=False, date_format='%Y-%m-%d %H:%M:%S'
+            )
+            buffer.seek(0)
+            cursor.copy_expert(statement, buffer)
+
+
+def _copy_frame_asyncpg(db: Session, frame: pd.DataFrame) -> None:
+    """Binary COPY through asyncpg's copy_records_to_table, awaited from the run_sync greenlet."""
+    from sqlalchemy.util import await_only
+
+    raw = db.connection().connection.driver_connection
+    for start in range(0, len(frame), COPY_CHUNK_ROWS):
+        chunk = frame.iloc[start:start + COPY_CHUNK_ROWS]
+        records = list(chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None))
+        await_only(raw.copy_records_to_table("financial_records", records=records, columns=RECORD_COLUMNS))
+
+
+def _executemany_frame(db: Session, frame: pd.DataFrame) -> None:
+    """Insert the frame in fixed-size executemany batches."""
+    for start in range(0, len(frame), INSERT_BATCH_SIZE):
+        chunk = frame.iloc[start:start + INSERT_BATCH_SIZE]
+        rows = chunk.astype(object).where(chunk.notna(), None).to_dict(orient='records')
+        db.execute(insert(FinancialRecord), rows)
+
+
+def bulk_insert_records(db: Session, company_id: int, df: pd.DataFrame, source_document: str = None,
+                        update_summary: bool = True, fingerprints=None) -> dict:
+    """
+    Insert all rows of a parsed upload for a company and add them to its summary rollups.
+
+    Args:
+        db: Active session; the caller owns the transaction and commits
+        company_id: ID of the company the records belong to
+        df: Normalized batch from processor.normalize_financial_frame
+        source_document: Filename stored on every record
+        update_summary: Apply the batch to company_financial_summary in the same transaction
+        fingerprints: Optional int64 row fingerprints stored alongside the rows
+
+    Returns:
+        Dict with rows, seconds, rows_per_sec and the method used
+    """
+    started = time.perf_counter()
+    frame = _prepare_frame(df, company_id, source_document, fingerprints)
+
+    with span("db_insert", rows=len(frame)) as attrs:
+        if frame.empty:
+            method = "none"
+        elif _supports_copy(db):
+            method = "copy"
+            _copy_frame(db, frame)
+        elif _supports_async_copy(db):
+            method = "copy"
+            _copy_frame_asyncpg(db, frame)
+        else:
+            method = "executemany"
+            _executemany_frame(db, frame)
+        attrs["method"] = method
+    add_count("rows_inserted", len(frame))
+
+    if update_summary:
+        with span("summary_update"):
+            apply_summary_delta(db, company_id, df)
+
+    elapsed = time.perf_counter() - started
+    rows = len(frame)
+    return {
+        "rows": rows,
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else None,
+        "method": method,
+    }
+
+
+def ingest_batches(db: Session, company_id: int, batches, source_document: str = None,
+                   incremental: bool = False) -> dict:
+    """
+    Insert a stream of parsed batches (e.g. a StreamingFinancialDocument) for a company.
+    Only one batch is held in memory at a time.
+
+    Args:
+        incremental: Skip rows whose fingerprint the company already has (re-upload of a grown ledger);
+            only the new rows are inserted and added to the summary rollups
+
+    Returns:
+        Dict with inserted rows, skipped rows, seconds, rows_per_sec, batch count and the method used
+    """
+    started = time.perf_counter()
+    fingerprint = RowFingerprinter()
+    rows = 0
+    skipped = 0
+    count = 0
+    method = "none"
+
+    for batch in batches:
+        with span("fingerprint", rows=len(batch)):
+            fingerprints = fingerprint(batch)
+        if incremental and len(batch):
+            with span("dedup_lookup", rows=len(batch)):
+                new = ~np.isin(fingerprints, existing_fingerprints(db, company_id, fingerprints))
+            skipped += int((~new).sum())
+            if not new.all():
+                batch = batch[new]
+                fingerprints = fingerprints[new]
+        stats = bulk_insert_records(db, company_id, batch, source_document=source_document,
+                                    fingerprints=fingerprints)
+        rows += stats["rows"]
+        count += 1
+        if stats["method"] != "none":
+            method = stats["method"]
+
+    add_count("rows_skipped", skipped)
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "skipped": skipped,
+        "batches": count,
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else None,
+        "method": method,
+    }
+
+
+async def ingest_batches_async(db, company_id: int, batches, source_document: str = None,
+                               incremental: bool = False) -> dict:
+    """
+    ingest_batches for an AsyncSession. Batches are parsed and fingerprinted in worker
+    threads so a large upload never blocks the event loop; inserts and summary updates
+    run through AsyncSession.run_sync on the async driver.
+
+    Returns:
+        Same stats as ingest_batches
+    """
+    started = time.perf_counter()
+    fingerprint = RowFingerprinter()
+    iterator = iter(batches)
+    rows = 0
+    skipped = 0
+    count = 0
+    method = "none"
+
+    while True:
+        batch = await asyncio.to_thread(next, iterator, None)
+        if batch is None:
+            break
+        with span("fingerprint", rows=len(batch)):
+            fingerprints = await asyncio.to_thread(fingerprint, batch)
+        if incremental and len(batch):
+            with span("dedup_lookup", rows=len(batch)):
+                existing = await db.run_sync(existing_fingerprints, company_id, fingerprints)
+            new = ~np.isin(fingerprints, existing)
+            skipped += int((~new).sum())
+            if not new.all():
+                batch = batch[new]
+                fingerprints = fingerprints[new]
+        stats = await db.run_sync(bulk_insert_records, company_id, batch, source_document, True, fingerprints)
+        rows += stats["rows"]
+        count += 1
+        if stats["method"] != "none":
+            method = stats["method"]
+
+    add_count("rows_skipped", skipped)
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "skipped": skipped,
+        "batches": count,
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else None,
+        "method": method,
+    }
@@ -0,0 +1,412 @@
+"""
+Request-level performance instrumentation.
+
+A pure ASGI middleware opens a trace for every request. Code on the request
+path records named stages with `span(...)`, which times the block, and with
+`add_count(...)`, which counts rows, tokens and similar units. Traces follow
+the request into worker threads and AsyncSession.run_sync through
+contextvars.
+
+Every span feeds an in-process histogram per (route, stage) and every request
+feeds a duration histogram per (method, route, status). `collect_metrics()`
+serializes them in the Prometheus text format for GET /metrics. With
+PERF_LOG_JSON=1, each finished request or background job also prints one
+JSON log line listing its spans and counts, which shows where the p99 goes.
+
+Background work (analysis jobs) opens its own trace with `trace_context`.
+
+Under gunicorn every worker process counts on its own. Each worker publishes a
+snapshot of its series to the shared state store (shared_state.py) every
+METRICS_PUBLISH_SECONDS and whenever it answers /metrics, and
+`collect_metrics()` sums the snapshots of every worker, so one scrape covers
+the whole deployment whichever worker answers it. Snapshots of exited workers
+are kept, so totals never go backwards when a worker restarts; the gunicorn
+master clears them at startup. Pool gauges only count workers that published
+recently.
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from shared_state import get_shared_state
+
+PERF_LOG_JSON = os.getenv("PERF_LOG_JSON", "false").lower() in ("1", "true", "yes")
+
+# Seconds; spans range from sub-millisecond lookups to multi-second LLM calls and uploads
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# How often each worker publishes its metrics to the shared state store
+METRICS_PUBLISH_SECONDS = float(os.getenv("METRICS_PUBLISH_SECONDS", "15"))
+METRICS_KEY_PREFIX = "metrics:"
+METRICS_WORKERS_KEY = "metrics:workers"
+# Pool gauges of workers that have not published for this many intervals are left out
+METRICS_STALE_INTERVALS = 3
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_task = None
+_pool_metrics_fn = None
+
+
+class Histogram:
+    """Thread-safe Prometheus-style histogram with labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def snapshot(self) -> list:
+        """Every series as JSON-friendly [labels, buckets, sum, count] entries"""
+        with self._lock:
+            return [[list(labels), list(series["buckets"]), series["sum"], series["count"]]
+                    for labels, series in self._series.items()]
+
+    def render(self, snapshots: list = None) -> list:
+        """Text lines for this process, or for the sum of several snapshot() results"""
+        if snapshots is None:
+            snapshots = [self.snapshot()]
+        merged = {}
+        for snapshot in snapshots:
+            for labels, buckets, total, count in snapshot:
+                series = merged.setdefault(tuple(labels), {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+                series["buckets"] = [a + b for a, b in zip(series["buckets"], buckets)]
+                series["sum"] += total
+                series["count"] += count
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(merged.items()):
+            base = _format_labels(self.labelnames, labels)
+            for bound, count in zip(self.buckets, series["buckets"]):
+                lines.append(f"{self.name}_bucket{_label_set(base, 'le', bound)} {count}")
+            lines.append(f"{self.name}_bucket{_label_set(base, 'le', '+Inf')} {series['count']}")
+            lines.append(f"{self.name}_sum{_label_set(base)} {series['sum']:.6f}")
+            lines.append(f"{self.name}_count{_label_set(base)} {series['count']}")
+        return lines
+
+
+class Counter:
+    """Thread-safe Prometheus-style counter with labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float, *labels) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def snapshot(self) -> list:
+        """Every series as JSON-friendly [labels, value] entries"""
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    def render(self, snapshots: list = None) -> list:
+        """Text lines for this process, or for the sum of several snapshot() results"""
+        if snapshots is None:
+            snapshots = [self.snapshot()]
+        merged = {}
+        for snapshot in snapshots:
+            for labels, value in snapshot:
+                merged[tuple(labels)] = merged.get(tuple(labels), 0) + value
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(merged.items()):
+            base = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}{_label_set(base)} {value}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _label_set(base: str, name: str = None, value=None) -> str:
+    """`{a="x",le="0.5"}`, or an empty string when there are no labels"""
+    parts = [base] if base else []
+    if name is not None:
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency, from receipt to the last body byte",
+    ("method", "route", "status")
+)
+STAGE_DURATION = Histogram(
+    "stage_duration_seconds", "Latency of named stages inside a request or job (parse, db_insert, llm_call, ...)",
+    ("route", "stage")
+)
+UNITS_TOTAL = Counter(
+    "processed_units_total", "Rows, tokens and other units processed, by stage",
+    ("route", "unit")
+)
+
+
+class Trace:
+    """Spans and counts recorded for one request or background job"""
+
+    def __init__(self, route: str = None, method: str = None, path: str = None, scope: dict = None):
+        self._route = route
+        self._scope = scope
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.spans = []
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    @property
+    def route(self) -> str:
+        """Fixed name for background work; for a request, the matched route template
+        (/analyze/{company_id}, not /analyze/42) so label cardinality stays bounded"""
+        if self._route is not None:
+            return self._route
+        return getattr(self._scope.get("route"), "path", None) or "unmatched"
+
+    def add_span(self, stage: str, seconds: float, attrs: dict) -> None:
+        with self._lock:
+            self.spans.append({"stage": stage, "ms": round(seconds * 1000, 3), **attrs})
+
+    def add_count(self, unit: str, amount: float) -> None:
+        with self._lock:
+            self.counts[unit] = self.counts.get(unit, 0) + amount
+
+    def log(self, **fields) -> None:
+        if not PERF_LOG_JSON:
+            return
+        entry = {
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "route": self.route,
+            "method": self.method,
+            "path": self.path,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            **fields,
+            "spans": self.spans,
+            "counts": self.counts,
+        }
+        print(json.dumps(entry, default=str), flush=True)
+
+
+def record(stage: str, seconds: float, **attrs) -> None:
+    """Record an already measured stage duration"""
+    trace = _current_trace.get()
+    STAGE_DURATION.observe(seconds, trace.route if trace is not None else "background", stage)
+    if trace is not None:
+        trace.add_span(stage, seconds, attrs)
+
+
+@contextmanager
+def span(stage: str, **attrs):
+    """Time a block as one stage of the current request (or as background work outside one)"""
+    started = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        record(stage, time.perf_counter() - started, **attrs)
+
+
+def add_count(unit: str, amount: float) -> None:
+    """Count rows, tokens, ... against the current request's route"""
+    if not amount:
+        return
+    trace = _current_trace.get()
+    UNITS_TOTAL.inc(amount, trace.route if trace is not None else "background", unit)
+    if trace is not None:
+        trace.add_count(unit, amount)
+
+
+@contextmanager
+def trace_context(route: str, **log_fields):
+    """Trace a unit of background work (e.g. an analysis job) like a request"""
+    trace = Trace(route)
+    token = _current_trace.set(trace)
+    status = "ok"
+    try:
+        yield trace
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _current_trace.reset(token)
+        STAGE_DURATION.observe(time.perf_counter() - trace.started, route, "total")
+        trace.log(status=status, **log_fields)
+
+
+class InstrumentationMiddleware:
+    """Pure ASGI middleware: one trace per HTTP request, timed until the response body is complete"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(method=scope["method"], path=scope["path"], scope=scope)
+        token = _current_trace.set(trace)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            elapsed = time.perf_counter() - trace.started
+            REQUEST_DURATION.observe(elapsed, scope["method"], trace.route, str(status["code"]))
+            trace.log(status=status["code"])
+
+
+def pool_metric_lines(pool_metrics: dict) -> list:
+    """database.get_pool_metrics() as Prometheus lines, one label set per engine (sync / async)"""
+    lines = [
+        "# HELP db_pool_checkout_wait_seconds Time spent waiting for a pooled connection",
+        "# TYPE db_pool_checkout_wait_seconds histogram",
+    ]
+    for name, status in sorted(pool_metrics.items()):
+        base = _format_labels(("engine",), (name,))
+        for bound, count in status["wait_buckets"].items():
+            lines.append(f"db_pool_checkout_wait_seconds_bucket{_label_set(base, 'le', bound)} {count}")
+        lines.append(f"db_pool_checkout_wait_seconds_bucket{_label_set(base, 'le', '+Inf')} {status['checkouts']}")
+        lines.append(f"db_pool_checkout_wait_seconds_sum{_label_set(base)} {status['wait_seconds_total']}")
+        lines.append(f"db_pool_checkout_wait_seconds_count{_label_set(base)} {status['checkouts']}")
+
+    lines += ["# HELP db_pool_checkout_timeouts_total Checkouts that failed waiting for a connection",
+              "# TYPE db_pool_checkout_timeouts_total counter"]
+    lines += [f"db_pool_checkout_timeouts_total{_label_set(_format_labels(('engine',), (name,)))} {status['timeouts']}"
+              for name, status in sorted(pool_metrics.items())]
+    lines += ["# HELP db_pool_checkout_errors_total Checkouts that failed opening a connection (not timeouts)",
+              "# TYPE db_pool_checkout_errors_total counter"]
+    lines += [f"db_pool_checkout_errors_total{_label_set(_format_labels(('engine',), (name,)))} {status['errors']}"
+              for name, status in sorted(pool_metrics.items())]
+
+    for key, documentation in (("checked_out", "Connections currently checked out"),
+                               ("size", "Configured pool size"),
+                               ("overflow", "Overflow connections currently open")):
+        lines += [f"# HELP db_pool_{key} {documentation}", f"# TYPE db_pool_{key} gauge"]
+        lines += [f"db_pool_{key}{_label_set(_format_labels(('engine',), (name,)))} {status[key]}"
+                  for name, status in sorted(pool_metrics.items()) if key in status]
+    return lines
+
+
+POOL_GAUGES = ("checked_out", "size", "overflow")
+
+
+def merge_pool_metrics(snapshots: list, live: list) -> dict:
+    """Sum get_pool_metrics() results of several workers; gauges only count the live ones"""
+    merged = {}
+    for pool_metrics, is_live in zip(snapshots, live):
+        for name, status in pool_metrics.items():
+            total = merged.setdefault(name, {"checkouts": 0, "timeouts": 0, "errors": 0, "wait_seconds_total": 0.0, "wait_buckets": {}})
+            total["checkouts"] += status["checkouts"]
+            total["timeouts"] += status["timeouts"]
+            total["errors"] += status["errors"]
+            total["wait_seconds_total"] = round(total["wait_seconds_total"] + status["wait_seconds_total"], 6)
+            for bound, count in status["wait_buckets"].items():
+                total["wait_buckets"][str(bound)] = total["wait_buckets"].get(str(bound), 0) + count
+            for key in POOL_GAUGES:
+                if key in status:
+                    total[key] = total.get(key, 0) + (status[key] if is_live else 0)
+    return merged
+
+
+_worker = {"pid": None, "key": None}
+
+
+def _worker_key() -> str:
+    """Shared state key of this process's snapshot, renewed after a fork (pids can be reused)"""
+    if _worker["pid"] != os.getpid():
+        _worker.update(pid=os.getpid(), key=f"{METRICS_KEY_PREFIX}worker:{os.getpid()}:{uuid.uuid4().hex[:8]}")
+    return _worker["key"]
+
+
+def publish_metrics(pool_metrics: dict = None) -> None:
+    """Store this process's series in the shared state store, where collect_metrics() finds them"""
+    state = get_shared_state()
+    key = _worker_key()
+    state.set(key, {
+        "published": time.time(),
+        "requests": REQUEST_DURATION.snapshot(),
+        "stages": STAGE_DURATION.snapshot(),
+        "units": UNITS_TOTAL.snapshot(),
+        "pool": pool_metrics or {},
+    })
+    state.update(METRICS_WORKERS_KEY, lambda keys: ((keys or []) + [key] if key not in (keys or []) else keys,) * 2)
+
+
+def collect_metrics(pool_metrics: dict = None) -> str:
+    """
+    All metrics of every worker in the Prometheus text exposition format.
+
+    Args:
+        pool_metrics: This worker's database.get_pool_metrics(), published along with its other series
+
+    Returns:
+        The summed series of all workers, this one up to date and the others as of their last publish
+    """
+    publish_metrics(pool_metrics)
+    state = get_shared_state()
+    snapshots = [snapshot for snapshot in map(state.get, state.get(METRICS_WORKERS_KEY) or []) if snapshot]
+    fresh_after = time.time() - METRICS_STALE_INTERVALS * METRICS_PUBLISH_SECONDS
+    lines = (REQUEST_DURATION.render([snapshot["requests"] for snapshot in snapshots])
+             + STAGE_DURATION.render([snapshot["stages"] for snapshot in snapshots])
+             + UNITS_TOTAL.render([snapshot["units"] for snapshot in snapshots])
+             + pool_metric_lines(merge_pool_metrics([snapshot["pool"] for snapshot in snapshots],
+                                                    [snapshot["published"] >= fresh_after for snapshot in snapshots])))
+    return "\n".join(lines) + "\n"
+
+
+async def _publish_loop(pool_metrics_fn) -> None:
+    while True:
+        await asyncio.sleep(METRICS_PUBLISH_SECONDS)
+        try:
+            await asyncio.to_thread(lambda: publish_metrics(pool_metrics_fn()))
+        except Exception as e:
+            print(f"Publishing metrics failed: {e}")
+
+
+def start_metrics_task(pool_metrics_fn) -> None:
+    """Publish this worker's metrics every METRICS_PUBLISH_SECONDS (pool_metrics_fn: database.get_pool_metrics)"""
+    global _task, _pool_metrics_fn
+    if _task is None:
+        _pool_metrics_fn = pool_metrics_fn
+        _task = asyncio.create_task(_publish_loop(pool_metrics_fn))
+
+
+async def stop_metrics_task() -> None:
+    """Stop publishing, after a last snapshot so nothing counted since the previous one is lost"""
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+        await asyncio.to_thread(lambda: publish_metrics(_pool_metrics_fn()))
@@ -0,0 +1,325 @@
+"""
+Background analysis jobs.
+
+POST /analyze enqueues a job row in analysis_jobs and returns immediately;
+an in-process pool of asyncio workers runs the analysis and records the result
+on the row, which GET /jobs/{id} and the SSE stream report. A job for the same
+company, language and data version that is still queued or running is reused
+instead of enqueuing a duplicate; a unique index on the active jobs
+(migration 5) settles concurrent requests.
+
+Job ids travel through a queue in the shared state store (shared_state.py), so
+with several worker processes any idle process picks up the next job. Claiming
+a job is an atomic status update on its row, so an id that is delivered twice
+still runs once.
+
+Finished jobs keep their result for JOB_RETENTION_DAYS; each process's pool
+deletes older ones every hour.
+"""
+
+import asyncio
+import os
+import traceback
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import AnalysisJob, Company
+from instrumentation import trace_context
+from shared_state import get_shared_state
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+# How often idle workers check the shared queue; jobs submitted by this process wake them at once
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+# Requeue unfinished jobs at startup. gunicorn.conf.py does it once in the master and turns this off for workers
+JOB_RECOVERY = os.getenv("JOB_RECOVERY", "true").lower() in ("1", "true", "yes")
+JOB_QUEUE = "analysis_jobs"
+# Finished jobs (and their results) are deleted after this many days; 0 keeps them
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "30"))
+JOB_PURGE_INTERVAL_SECONDS = 3600
+
+ACTIVE_STATUSES = ("queued", "running")
+FINAL_STATUSES = ("done", "failed")
+
+
+def job_payload(job: AnalysisJob) -> dict:
+    return {
+        "job_id": job.id,
+        "company_id": job.company_id,
+        "language": job.language,
+        "all_languages": job.all_languages,
+        "data_version": job.data_version,
+        "status": job.status,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+def get_job(db: Session, job_id: str):
+    return db.query(AnalysisJob).filter(AnalysisJob.id == job_id).first()
+
+
+def load_job_payload(job_id: str):
+    """Current job state from a short-lived session (used by the SSE stream)"""
+    db = SessionLocal()
+    try:
+        job = get_job(db, job_id)
+        return job_payload(job) if job else None
+    finally:
+        db.close()
+
+
+def _active_job(db: Session, company_id: int, language: str, all_languages: bool, data_version: str,
+                force_refresh: bool):
+    query = db.query(AnalysisJob).filter(
+        AnalysisJob.company_id == company_id,
+        AnalysisJob.language == language,
+        AnalysisJob.all_languages == all_languages,
+        AnalysisJob.data_version == data_version,
+        AnalysisJob.status.in_(ACTIVE_STATUSES)
+    )
+    if force_refresh:
+        # A forced refresh must not come back with a job that may answer from the cache
+        query = query.filter(AnalysisJob.force_refresh.is_(True))
+    return query.order_by(AnalysisJob.created_at).first()
+
+
+def create_or_merge_job(db: Session, company_id: int, language: str = "en", all_languages: bool = False,
+                        force_refresh: bool = False) -> tuple:
+    """
+    Create a queued job, or return the active one for the same company/language/data version.
+    A forced refresh only merges into another forced job.
+
+    Returns:
+        (job, merged) where merged is True when an existing job was reused
+    """
+    from summary import get_data_version
+
+    if not db.query(Company.id).filter(Company.id == company_id).first():
+        return None, False
+
+    data_version = get_data_version(db, company_id)
+    existing = _active_job(db, company_id, language, all_languages, data_version, force_refresh)
+    if existing:
+        return existing, True
+
+    job = AnalysisJob(
+        id=uuid.uuid4().hex,
+        company_id=company_id,
+        language=language,
+        all_languages=all_languages,
+        force_refresh=force_refresh,
+        data_version=data_version,
+        status="queued"
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another request enqueued the same job in between (ix_analysis_jobs_active): merge into it
+        db.rollback()
+        existing = _active_job(db, company_id, language, all_languages, data_version, force_refresh)
+        if existing is None:
+            raise
+        return existing, True
+    db.refresh(job)
+    return job, False
+
+
+def _claim_job(job_id: str) -> bool:
+    """Atomically move a job from queued to running; False if another worker got it first"""
+    db = SessionLocal()
+    try:
+        claimed = db.query(AnalysisJob).filter(
+            AnalysisJob.id == job_id, AnalysisJob.status == "queued"
+        ).update({"status": "running", "started_at": datetime.now(timezone.utc)}, synchronize_session=False)
+        db.commit()
+        return claimed == 1
+    finally:
+        db.close()
+
+
+def _finish_job(job_id: str, status: str, result: dict = None, error: str = None) -> None:
+    db = SessionLocal()
+    try:
+        db.query(AnalysisJob).filter(AnalysisJob.id == job_id).update({
+            "status": status,
+            "result": result,
+            "error": error,
+            "finished_at": datetime.now(timezone.utc)
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def recover_jobs() -> int:
+    """
+    Requeue the jobs a previous deployment left unfinished. Must run while no worker
+    is running jobs, since a "running" job is taken to have lost its worker.
+
+    Returns:
+        Number of jobs queued again
+    """
+    db = SessionLocal()
+    try:
+        db.query(AnalysisJob).filter(AnalysisJob.status == "running").update(
+            {"status": "queued", "started_at": None}, synchronize_session=False
+        )
+        db.commit()
+        job_ids = [job_id for (job_id,) in db.query(AnalysisJob.id).filter(
+            AnalysisJob.status == "queued"
+        ).order_by(AnalysisJob.created_at)]
+    finally:
+        db.close()
+    # Ids still in a persistent queue arrive twice; the second claim is a no-op
+    store = get_shared_state()
+    for job_id in job_ids:
+        store.push(JOB_QUEUE, job_id)
+    return len(job_ids)
+
+
+def purge_finished_jobs(days: float = JOB_RETENTION_DAYS) -> int:
+    """
+    Delete the done and failed jobs that finished more than `days` days ago
+
+    Returns:
+        Number of jobs deleted
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    db = SessionLocal()
+    try:
+        deleted = db.query(AnalysisJob).filter(
+            AnalysisJob.status.in_(FINAL_STATUSES), AnalysisJob.finished_at < cutoff
+        ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+
+def clear_job_queue() -> int:
+    """
+    Drop every queued job id (e.g. after the database has been reset, when they point at nothing)
+
+    Returns:
+        Number of ids dropped
+    """
+    store = get_shared_state()
+    dropped = 0
+    while store.pop(JOB_QUEUE) is not None:
+        dropped += 1
+    return dropped
+
+
+class JobWorkerPool:
+    """In-process asyncio workers fed from the shared queue of job ids"""
+
+    def __init__(self, workers: int = ANALYSIS_WORKERS):
+        self.workers = workers
+        self._tasks = []
+        self._events = {}
+        self._watchers = {}
+        self._wakeup = None
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        if JOB_RECOVERY:
+            await asyncio.to_thread(recover_jobs)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        if JOB_RETENTION_DAYS > 0:
+            self._tasks.append(asyncio.create_task(self._purge_loop()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, job_id: str) -> None:
+        await asyncio.to_thread(get_shared_state().push, JOB_QUEUE, job_id)
+        self._wakeup.set()
+
+    async def _next_job(self) -> str:
+        while True:
+            job_id = await asyncio.to_thread(get_shared_state().pop, JOB_QUEUE)
+            if job_id is not None:
+                return job_id
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def _notify(self, job_id: str) -> None:
+        event = self._events.get(job_id)
+        if event is not None:
+            event.set()
+
+    async def wait_for_update(self, job_id: str, timeout: float) -> None:
+        """Block until this process changes the job's status, or the timeout passes"""
+        event = self._events.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            event.clear()
+
+    def watch(self, job_id: str) -> None:
+        """Register a stream waiting on the job; pair with release() once it ends, however it ends"""
+        self._watchers[job_id] = self._watchers.get(job_id, 0) + 1
+
+    def release(self, job_id: str) -> None:
+        """Drop a stream's interest in the job, and its wakeup event once no stream is left"""
+        watchers = self._watchers.pop(job_id, 0) - 1
+        if watchers > 0:
+            self._watchers[job_id] = watchers
+        else:
+            self._events.pop(job_id, None)
+
+    async def _purge_loop(self) -> None:
+        while True:
+            try:
+                deleted = await asyncio.to_thread(purge_finished_jobs)
+                if deleted:
+                    print(f"Deleted {deleted} analysis jobs finished over {JOB_RETENTION_DAYS:g} days ago")
+            except Exception as e:
+                print(f"Purging finished jobs failed: {e}")
+            await asyncio.sleep(JOB_PURGE_INTERVAL_SECONDS)
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id = await self._next_job()
+            # Imported on the first job rather than at startup (warmup.py usually has it loaded by then)
+            from analysis import analyze_company
+            try:
+                if not await asyncio.to_thread(_claim_job, job_id):
+                    continue
+                self._notify(job_id)
+
+                db = SessionLocal()
+                try:
+                    with trace_context("job:analyze", job_id=job_id):
+                        job = await asyncio.to_thread(get_job, db, job_id)
+                        result = await analyze_company(
+                            db, job.company_id, language=job.language,
+                            force_refresh=job.force_refresh, all_languages=job.all_languages
+                        )
+                finally:
+                    db.close()
+                await asyncio.to_thread(_finish_job, job_id, "done", result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                traceback.print_exc()
+                await asyncio.to_thread(_finish_job, job_id, "failed", None, str(e))
+            finally:
+                self._notify(job_id)
+
+
+job_pool = JobWorkerPool()
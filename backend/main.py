@@ -1,21 +1,60 @@
 # Backend reloaded to refresh database connections
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
+# Only what routing and the database need is imported here; the modules behind the
+# upload/analysis/report routes (pandas, numpy, reportlab, openpyxl) are imported by the
+# handlers that use them and preloaded by warmup.py once the app is serving.
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import get_db, engine, Base
-from models import Company, FinancialRecord
-from processor import parse_financial_document
-from ai_service import generate_financial_assessment
+from database import get_db, get_async_db, get_pool_metrics, dispose_async_engine, engine, AsyncSessionLocal
+from models import Assessment, Company
+from typing import List, Optional
+from datetime import date
+from contextlib import asynccontextmanager
+from assessment_cache import clear_assessment_cache
+from instrumentation import InstrumentationMiddleware, collect_metrics, start_metrics_task, stop_metrics_task
+from migrations import AUTO_MIGRATE, reset_schema, upgrade
+from retention import start_retention_task, stop_retention_task
+from jobs import job_pool, clear_job_queue, create_or_merge_job, get_job, job_payload, load_job_payload, FINAL_STATUSES
+from shared_state import close_shared_state
+from warmup import is_warm, start_warmup, stop_warmup, status as warmup_status
+from pydantic import BaseModel
 from dotenv import load_dotenv
-import pandas as pd
+import asyncio
+import json
 import os
+import sys
+import time
 import traceback
 
 load_dotenv()
-app = FastAPI(title="SME Financial Health Assessment Platform API")
 
-# Create Tables (Simple migration for MVP)
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema migrations (see migrations.py); AUTO_MIGRATE=false leaves them to `python migrations.py upgrade`
+    if AUTO_MIGRATE:
+        await asyncio.to_thread(upgrade)
+    await job_pool.start()
+    start_retention_task()
+    start_metrics_task(get_pool_metrics)
+    # Heavy imports, report fonts and pool connections load in the background; /ready reports when done
+    start_warmup()
+    yield
+    await stop_warmup()
+    await stop_retention_task()
+    await job_pool.stop()
+    await stop_metrics_task()
+    # Only modules that were ever loaded have a client or worker pool to close
+    if "ai_service" in sys.modules:
+        await sys.modules["ai_service"].close_openrouter_client()
+    if "report_export" in sys.modules:
+        sys.modules["report_export"].shutdown_export_pool()
+    close_shared_state()
+    await dispose_async_engine()
+
+app = FastAPI(title="SME Financial Health Assessment Platform API", lifespan=lifespan)
 
 # Get allowed origins from environment variable
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173").split(",")
@@ -27,156 +66,398 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so request latency covers CORS handling and the full response body
+app.add_middleware(InstrumentationMiddleware)
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to SME Financial Health Assessment Platform API"}
 
-@app.post("/upload")
-async def upload_financial_doc(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    import hashlib
-    from models import Assessment
+def _ping_database() -> None:
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 200 once warmup has finished and the database answers, 503 until then"""
+    checks = {"warmup": warmup_status["state"], "database": "ok"}
+    try:
+        await asyncio.to_thread(_ping_database)
+    except Exception as e:
+        checks["database"] = f"{type(e).__name__}: {e}"
+    ready = is_warm() and checks["database"] == "ok"
+    body = {"ready": ready, "checks": checks, "warmup": warmup_status}
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Request and per-stage latency histograms, row/token counters and pool metrics of all workers (Prometheus text format)"""
+    return PlainTextResponse(
+        collect_metrics(get_pool_metrics()),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+@app.get("/metrics/db-pool")
+def db_pool_metrics():
+    """Connection pool checkout wait times, timeouts and saturation for the sync and async engines of the answering worker"""
+    return get_pool_metrics()
+
+def _duplicate_upload_response(db: Session, existing_company: Company) -> dict:
+    """Response for a file that has already been uploaded, with its latest assessment if any"""
+    latest_assessment = db.query(Assessment).filter(
+        Assessment.company_id == existing_company.id
+    ).order_by(Assessment.created_at.desc()).first()
     
-    content = await file.read()
+    if latest_assessment:
+        # Return existing data without reprocessing
+        return {
+            "message": f"This file was already uploaded. Showing existing analysis.",
+            "company_id": existing_company.id,
+            "duplicate": True,
+            "assessment": {
+                "score": latest_assessment.overall_score,
+                "risk_level": latest_assessment.risk_level,
+                "narrative": latest_assessment.summary_narrative,
+                "recommendations": latest_assessment.recommendations,
+                # Stored before the language column existed means English
+                "language": latest_assessment.language or "en"
+            }
+        }
+    # File uploaded but no assessment yet
+    return {
+        "message": f"File already uploaded. Please click 'Load Analysis' to generate assessment.",
+        "company_id": existing_company.id,
+        "duplicate": True
+    }
+
+async def _merge_upload(db: AsyncSession, company_id: int, document, filename: str) -> dict:
+    """Incremental upload into an existing company: only rows it does not have yet are inserted"""
+    from ingestion import ingest_batches_async
     
-    # Calculate file hash for duplicate detection
-    file_hash = hashlib.md5(content).hexdigest()
+    company = await db.get(Company, company_id)
+    if not company:
+        raise HTTPException(status_code=404, detail="Company not found")
     
-    # Check if this exact file has been uploaded before
-    existing_company = db.query(Company).filter(Company.file_hash == file_hash).first()
+    stats = await ingest_batches_async(db, company.id, document, source_document=filename, incremental=True)
+    stats["coerced"] = document.coerced
+    company.file_hash = document.file_hash
+    await db.commit()
+    print(f"Merged {stats['rows']} new records into company {company.id} ({stats['skipped']} already present) in {stats['seconds']}s")
     
-    if existing_company:
-        # File already uploaded - fetch existing assessment
-        latest_assessment = db.query(Assessment).filter(
-            Assessment.company_id == existing_company.id
-        ).order_by(Assessment.created_at.desc()).first()
-        
-        if latest_assessment:
-            # Return existing data without reprocessing
-            return {
-                "message": f"This file was already uploaded. Showing existing analysis.",
-                "company_id": existing_company.id,
-                "duplicate": True,
-                "assessment": {
-                    "score": latest_assessment.overall_score,
-                    "risk_level": latest_assessment.risk_level,
-                    "narrative": latest_assessment.summary_narrative,
-                    "recommendations": latest_assessment.recommendations
-                }
-            }
-        else:
-            # File uploaded but no assessment yet
-            return {
-                "message": f"File already uploaded. Please click 'Load Analysis' to generate assessment.",
-                "company_id": existing_company.id,
-                "duplicate": True
-            }
+    if stats["rows"] == 0:
+        return {**await db.run_sync(_duplicate_upload_response, company), "ingestion": stats}
+    return {
+        "message": f"Added {stats['rows']} new records ({stats['skipped']} already present).",
+        "company_id": company.id,
+        "duplicate": False,
+        "ingestion": stats
+    }
+
+@app.post("/upload")
+async def upload_financial_doc(file: UploadFile = File(...), company_id: Optional[int] = Form(None),
+                               db: AsyncSession = Depends(get_async_db)):
+    """
+    Stream-parse an uploaded CSV/XLSX into the database in bounded-memory batches.
+    The file is hashed in a sequential pre-pass first, so a duplicate upload is
+    answered before any row is parsed or written.
+    
+    With company_id, the file is merged into that company instead: rows it already
+    has (by row fingerprint) are skipped and only new rows are inserted.
+    
+    Parsing runs in worker threads and the inserts use the async engine, so a
+    large upload neither blocks the event loop nor holds a threadpool worker.
+    """
+    from processor import StreamingFinancialDocument
+    from ingestion import ingest_batches_async
     
-    # New file - process normally
     try:
-        records = parse_financial_document(content, file.filename)
+        document = StreamingFinancialDocument(file.file, file.filename)
+        file_hash = await asyncio.to_thread(document.hash_file)
+        
+        if company_id is not None:
+            return await _merge_upload(db, company_id, document, file.filename)
+        
+        # Check if this exact file has been uploaded before
+        existing_company = (await db.execute(
+            select(Company).where(Company.file_hash == file_hash)
+        )).scalars().first()
+        if existing_company:
+            return await db.run_sync(_duplicate_upload_response, existing_company)
         
-        # Create new company with file hash
         company = Company(name="Demo SME", industry="Retail", file_hash=file_hash)
         db.add(company)
-        db.commit()
-        db.refresh(company)
-            
-        for record in records:
-            db_record = FinancialRecord(
-                company_id=company.id,
-                category=record.get('category', 'Uncategorized'),
-                amount=record.get('amount', 0.0),
-                record_type=record.get('type', 'Expense'),
-                date=pd.to_datetime(record.get('date')) if record.get('date') else None,
-                source_document=file.filename
-            )
-            db.add(db_record)
-        db.commit()
+        await db.flush()
+        
+        # Bulk ingest batch by batch (COPY on PostgreSQL, batched inserts elsewhere)
+        stats = await ingest_batches_async(db, company.id, document, source_document=file.filename)
+        # Cells that could not be parsed and were stored as no date, 0.0 or the default type
+        stats["coerced"] = document.coerced
+        await db.commit()
+        print(f"Ingested {stats['rows']} records in {stats['batches']} batches via {stats['method']} ({stats['rows_per_sec']} rows/sec)")
         
-        return {"message": f"Successfully processed {len(records)} records.", "company_id": company.id, "duplicate": False}
+        return {
+            "message": f"Successfully processed {stats['rows']} records.",
+            "company_id": company.id,
+            "duplicate": False,
+            "ingestion": stats
+        }
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
+        await db.rollback()
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=f"Processing Error: {str(e)}")
 
+class AnalysisJobRequest(BaseModel):
+    company_id: int
+    language: str = "en"
+    all_languages: bool = False
+    force_refresh: bool = False
+
+@app.post("/analyze", status_code=202)
+async def enqueue_analysis(request: AnalysisJobRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Queue an analysis and return its job id immediately.
+    An active job for the same company, language and data version is reused.
+    """
+    from scoring import score_company
+    
+    job, merged = await db.run_sync(
+        create_or_merge_job, request.company_id, request.language,
+        request.all_languages, request.force_refresh
+    )
+    if job is None:
+        raise HTTPException(status_code=404, detail="Company not found")
+    if not merged:
+        await job_pool.submit(job.id)
+    # Instant rule-based score to show while the narrative is generated
+    provisional = await db.run_sync(score_company, request.company_id)
+    return {**job_payload(job), "merged": merged, "provisional": provisional}
+
+# Upper bound on companies per /analyze/batch request
+MAX_BATCH_COMPANIES = int(os.getenv("MAX_BATCH_COMPANIES", "5000"))
+
+class BatchAnalysisRequest(BaseModel):
+    company_ids: List[int]
+    language: str = "en"
+    all_languages: bool = False
+    force_refresh: bool = False
+    concurrency: int = 8
+
+@app.post("/analyze/batch")
+async def analyze_batch(request: BatchAnalysisRequest):
+    """
+    Analyze a portfolio of companies. Results stream back as NDJSON, one line per
+    company, in completion order.
+    """
+    from analysis import analyze_companies
+    
+    if len(request.company_ids) > MAX_BATCH_COMPANIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_COMPANIES} companies per batch")
+    
+    async def lines():
+        async for result in analyze_companies(
+            request.company_ids, language=request.language, force_refresh=request.force_refresh,
+            all_languages=request.all_languages, concurrency=min(max(request.concurrency, 1), 32)
+        ):
+            yield json.dumps(result) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+class ReportExportRequest(BaseModel):
+    company_ids: List[int]
+    language: str = "en"
+
+@app.post("/reports/batch")
+async def export_reports(request: ReportExportRequest):
+    """
+    Download the latest PDF report of each company as one ZIP. Reports render in
+    parallel worker processes and the archive streams back as they finish.
+    """
+    from report_export import export_reports_zip
+    
+    if len(request.company_ids) > MAX_BATCH_COMPANIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_COMPANIES} companies per batch")
+    
+    return StreamingResponse(
+        export_reports_zip(request.company_ids, request.language),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=financial_reports_{request.language}.zip"}
+    )
+
+@app.get("/jobs/{job_id}")
+def get_analysis_job(job_id: str, db: Session = Depends(get_db)):
+    """Poll the status (and result, once done) of an analysis job"""
+    job = get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_payload(job)
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Server-Sent Events stream of job status changes; ends once the job is done or failed"""
+    if await asyncio.to_thread(load_job_payload, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        last_status = None
+        last_sent = time.monotonic()
+        job_pool.watch(job_id)
+        try:
+            while True:
+                payload = await asyncio.to_thread(load_job_payload, job_id)
+                if payload is None:
+                    yield "event: error\ndata: {\"detail\": \"Job not found\"}\n\n"
+                    return
+                if payload["status"] != last_status:
+                    last_status = payload["status"]
+                    last_sent = time.monotonic()
+                    yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+                elif time.monotonic() - last_sent > 15:
+                    last_sent = time.monotonic()
+                    yield ": keep-alive\n\n"
+                if last_status in FINAL_STATUSES:
+                    return
+                # Woken early by this process's workers; the timeout also catches updates from other processes
+                await job_pool.wait_for_update(job_id, timeout=2.0)
+        finally:
+            # Also when the client disconnects mid-job
+            job_pool.release(job_id)
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.post("/analyze/{company_id}")
-def analyze_company_health(company_id: int, language: str = "en", db: Session = Depends(get_db)):
+async def analyze_company_health(company_id: int, language: str = "en", force_refresh: bool = False,
+                                 all_languages: bool = False, db: AsyncSession = Depends(get_async_db)):
     """
     Analyze company financial health
     
     Args:
         company_id: ID of the company
         language: Language code for response ('en', 'hi', 'ta')
+        force_refresh: Bypass the assessment cache and always call the LLM
+        all_languages: Generate en/hi/ta in one pass so switching language is a cache read
     """
-    from models import Assessment
-    import json
+    from analysis import analyze_company, CompanyNotFound
     
-    company = db.query(Company).filter(Company.id == company_id).first()
-    if not company:
+    try:
+        return await analyze_company(db, company_id, language=language, force_refresh=force_refresh,
+                                     all_languages=all_languages)
+    except CompanyNotFound:
         raise HTTPException(status_code=404, detail="Company not found")
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/analyze/{company_id}/stream")
+async def stream_company_health(company_id: int, language: str = "en", force_refresh: bool = False,
+                                all_languages: bool = False):
+    """
+    /analyze/{company_id} as Server-Sent Events, streamed from the LLM as it writes.
+
+    Events: meta (company, cached), score, risk_level, narrative (text fragments to append),
+    recommendation (one per item), then result (the full /analyze response, after the
+    assessment is stored) or error.
+    """
+    from analysis import stream_company_analysis, CompanyNotFound
     
-    # Fetch records
-    records = db.query(FinancialRecord).filter(FinancialRecord.company_id == company_id).all()
-    # Serialize for AI
-    data_for_ai = [{"category": r.category, "amount": r.amount, "type": r.record_type} for r in records]
+    # The session lives as long as the stream, not just the handler
+    db = AsyncSessionLocal()
+    events = stream_company_analysis(db, company_id, language=language, force_refresh=force_refresh,
+                                     all_languages=all_languages)
+    try:
+        # Prepare and look up the cache before answering, so an unknown company is still a plain 404
+        first = await anext(events)
+    except CompanyNotFound:
+        await db.close()
+        raise HTTPException(status_code=404, detail="Company not found")
+    except Exception:
+        await db.close()
+        raise
     
-    # Generate assessment in specified language
-    assessment_data = generate_financial_assessment(data_for_ai, language=language)
+    async def sse():
+        try:
+            yield _sse(*first)
+            async for event, data in events:
+                yield _sse(event, data)
+        except Exception as e:
+            traceback.print_exc()
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            await events.aclose()
+            await db.close()
     
-    # Extract score safely
-    raw_score = assessment_data.get('score', 0)
-    score_val = 0.0
-    try:
-        if isinstance(raw_score, (int, float)):
-            score_val = float(raw_score)
-        else:
-            # Try to extract the first number from string (e.g. "85/100" -> 85)
-            import re
-            match = re.search(r"(\d+\.?\d*)", str(raw_score))
-            if match:
-                score_val = float(match.group(1))
-    except (ValueError, TypeError):
-        score_val = 0.0
-
-    # Store assessment in database for consistency
-    db_assessment = Assessment(
-        company_id=company.id,
-        overall_score=score_val,
-        risk_level=str(assessment_data.get('risk_level', 'Unknown')),
-        summary_narrative=str(assessment_data.get('narrative', '')),
-        recommendations=assessment_data.get('recommendations', [])
-    )
-    db.add(db_assessment)
-    db.commit()
-    db.refresh(db_assessment)
+    return StreamingResponse(sse(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/trends/{company_id}")
+def get_company_trends(company_id: int, weeks: int = 52, horizon: int = 3, window: int = 3, db: Session = Depends(get_db)):
+    """Monthly and weekly revenue/expense/net series, rolling averages and a net cash-flow forecast"""
+    from trends import get_trends
     
-    # Calculate summary values for display
-    total_revenue = sum(r.amount for r in records if r.record_type == 'Revenue')
-    total_expense = sum(r.amount for r in records if r.record_type == 'Expense')
-    net_income = total_revenue - total_expense
+    if not db.query(Company.id).filter(Company.id == company_id).first():
+        raise HTTPException(status_code=404, detail="Company not found")
+    if not (1 <= weeks <= 520 and 0 <= horizon <= 24 and 1 <= window <= 52):
+        raise HTTPException(status_code=400, detail="weeks must be 1-520, horizon 0-24 and window 1-52")
+    return get_trends(db, company_id, weeks=weeks, horizon=horizon, window=window)
 
-    return {
-        "company": company.name,
-        "summary": {
-            "total_revenue": total_revenue,
-            "total_expense": total_expense,
-            "net_income": net_income
-        },
-        "assessment": {
-            "score": db_assessment.overall_score,
-            "risk_level": db_assessment.risk_level,
-            "narrative": db_assessment.summary_narrative,
-            "recommendations": db_assessment.recommendations
-        },
-        "assessment_id": db_assessment.id
-    }
+@app.get("/companies/{company_id}/records")
+def list_company_records(company_id: int, limit: int = 500, cursor: Optional[str] = None,
+                         record_type: Optional[str] = Query(None, alias="type"), category: Optional[str] = None,
+                         date_from: Optional[date] = None, date_to: Optional[date] = None,
+                         db: Session = Depends(get_db)):
+    """
+    A page of the company's financial records in (date, id) order; undated records come last.
+    Pass the returned next_cursor to get the following page (it is null on the last one).
+    """
+    from records import InvalidCursor, MAX_PAGE_SIZE, get_records_page
+    
+    if not db.query(Company.id).filter(Company.id == company_id).first():
+        raise HTTPException(status_code=404, detail="Company not found")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be 1-{MAX_PAGE_SIZE}")
+    try:
+        return get_records_page(db, company_id, limit=limit, cursor=cursor, record_type=record_type,
+                                category=category, date_from=date_from, date_to=date_to)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/companies/{company_id}/records/export")
+def export_company_records(company_id: int, request: Request, format: str = "ndjson",
+                           record_type: Optional[str] = Query(None, alias="type"), category: Optional[str] = None,
+                           date_from: Optional[date] = None, date_to: Optional[date] = None,
+                           db: Session = Depends(get_db)):
+    """
+    Stream every matching record as NDJSON, Arrow IPC or Parquet, in (date, id) order.
+    NDJSON and Arrow are zstd/gzip encoded when the client's Accept-Encoding allows it.
+    """
+    from records import EXPORT_MEDIA_TYPES, available_formats, iter_records_export, negotiate_encoding
+    
+    if not db.query(Company.id).filter(Company.id == company_id).first():
+        raise HTTPException(status_code=404, detail="Company not found")
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_MEDIA_TYPES)}")
+    if format not in available_formats():
+        raise HTTPException(status_code=501, detail=f"format '{format}' needs pyarrow installed on the server")
+    # The stream opens its own session; give this one's connection back before it starts
+    db.close()
+    
+    # Parquet compresses its column chunks itself
+    encoding = None if format == "parquet" else negotiate_encoding(request.headers.get("accept-encoding"))
+    headers = {"Content-Disposition": f'attachment; filename="company_{company_id}_records.{format}"',
+               "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    body = iter_records_export(company_id, format, encoding, record_type=record_type, category=category,
+                               date_from=date_from, date_to=date_to)
+    return StreamingResponse(body, media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
 
 @app.get("/download-report/{company_id}")
-def download_report(company_id: int, db: Session = Depends(get_db)):
-    """Generate and download PDF report using stored assessment"""
-    from fastapi.responses import StreamingResponse
-    from report_generator import generate_pdf_report
-    from models import Assessment
+def download_report(company_id: int, request: Request, language: str = None, db: Session = Depends(get_db)):
+    """Download the PDF report of the latest assessment, rendered once and then served from the report store"""
+    from report_store import get_report
     
     company = db.query(Company).filter(Company.id == company_id).first()
     if not company:
@@ -185,54 +466,49 @@ def download_report(company_id: int, db: Session = Depends(get_db)):
     # Fetch the latest assessment from database
     latest_assessment = db.query(Assessment).filter(
         Assessment.company_id == company_id
-    ).order_by(Assessment.created_at.desc()).first()
+    ).order_by(Assessment.created_at.desc(), Assessment.id.desc()).first()
     
     if not latest_assessment:
         raise HTTPException(status_code=404, detail="No assessment found. Please run analysis first.")
     
-    # Fetch records for financial summary
-    records = db.query(FinancialRecord).filter(FinancialRecord.company_id == company_id).all()
+    report = get_report(db, latest_assessment, language)
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"No assessment in language '{language}'. Please run analysis first.")
+    path, key = report
     
-    # Calculate summary
-    total_revenue = sum(r.amount for r in records if r.record_type == 'Revenue')
-    total_expense = sum(r.amount for r in records if r.record_type == 'Expense')
-    financial_summary = {
-        "total_revenue": total_revenue,
-        "total_expense": total_expense,
-        "net_income": total_revenue - total_expense
-    }
-    
-    # Use stored assessment data
-    assessment_dict = {
-        "score": latest_assessment.overall_score,
-        "risk_level": latest_assessment.risk_level,
-        "narrative": latest_assessment.summary_narrative,
-        "recommendations": latest_assessment.recommendations
-    }
+    # Same assessment, language, template and data: the client's copy is still valid
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
     
-    # Generate PDF
-    pdf_buffer = generate_pdf_report(company.name, assessment_dict, financial_summary)
-    
-    return StreamingResponse(
-        pdf_buffer,
+    return FileResponse(
+        path,
         media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=financial_report_{company.name.replace(' ', '_')}.pdf"}
+        filename=f"financial_report_{company.name.replace(' ', '_')}.pdf",
+        headers=headers
     )
 
 @app.post("/reset-db")
 def reset_database(db: Session = Depends(get_db)):
     """Developer endpoint to reset the database for demo purposes"""
     try:
-        from database import engine, Base
+        from report_store import clear_report_cache
+        from trends import clear_trend_cache
         # We need to dispose the engine to close active connections before dropping
         engine.dispose()
-        Base.metadata.drop_all(bind=engine)
-        Base.metadata.create_all(bind=engine)
+        reset_schema(engine)
+        clear_assessment_cache()
+        clear_job_queue()
+        clear_report_cache()
+        clear_trend_cache()
         return {"message": "Database reset successfully"}
     except Exception as e:
         print(f"Reset error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Single process for development; production runs `gunicorn -c gunicorn.conf.py main:app`
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,542 @@
+"""
+Versioned schema migrations.
+
+Replaces create_all at import time: every migration runs once, in order, and
+is recorded in schema_migrations. An upgrade is one transaction, serialized
+across processes with an advisory lock on PostgreSQL, so several workers
+starting together apply it exactly once.
+
+Each migration carries its own DDL (schema_v1 below is the schema of
+migrations 1-3) and data logic, so the history never changes with models.py
+or ingestion.py. Migration 1
+creates missing tables, so migrations 2-3 tolerate a schema that is already
+up to date (they inspect before altering). tests/test_migrations.py checks
+that an upgraded database matches the models.
+
+On PostgreSQL the ledger (financial_records) can be declaratively partitioned,
+selected with LEDGER_PARTITIONING:
+    none          one table (default)
+    company_hash  PARTITION BY HASH (company_id) into LEDGER_HASH_PARTITIONS tables,
+                  so every per-company query and index stays within one partition
+    month         PARTITION BY RANGE (date), one table per month plus a default
+                  partition for undated rows; retention.py archives expired months whole
+An empty ledger is partitioned during upgrade. Converting a populated one
+copies every row, so it only runs from the CLI.
+
+Usage (from backend/):
+    python migrations.py upgrade
+    python migrations.py status
+    python migrations.py partition --by company_hash
+"""
+
+import argparse
+import os
+from datetime import date, datetime
+from sqlalchemy import (JSON, BigInteger, Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, MetaData,
+                        String, Table, Text, UniqueConstraint, bindparam, func, inspect, literal, select, text, union,
+                        union_all)
+from database import Base, engine
+from models import FinancialRecord
+
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
+LEDGER_PARTITIONING = os.getenv("LEDGER_PARTITIONING", "none").lower()
+LEDGER_HASH_PARTITIONS = int(os.getenv("LEDGER_HASH_PARTITIONS", "16"))
+# Month partitions kept created ahead of the current month
+LEDGER_MONTHS_AHEAD = int(os.getenv("LEDGER_MONTHS_AHEAD", "3"))
+
+PARTITION_SCHEMES = ("none", "company_hash", "month")
+if LEDGER_PARTITIONING not in PARTITION_SCHEMES:
+    raise ValueError(f"LEDGER_PARTITIONING must be one of {', '.join(PARTITION_SCHEMES)}, not {LEDGER_PARTITIONING!r}")
+
+LEDGER_TABLE = FinancialRecord.__tablename__
+# Arbitrary application-wide key for the upgrade's pg_advisory_xact_lock
+MIGRATION_LOCK_KEY = 72510231
+
+schema_migrations = Table(
+    "schema_migrations", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+MIGRATIONS = []
+
+
+def migration(version: int, name: str):
+    def register(fn):
+        MIGRATIONS.append((version, name, fn))
+        return fn
+    return register
+
+
+def _quote(conn, name: str) -> str:
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def _add_missing_columns(conn, table: Table) -> list:
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    added = []
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        conn.execute(text(
+            f"ALTER TABLE {_quote(conn, table.name)} ADD COLUMN {_quote(conn, column.name)} "
+            f"{column.type.compile(dialect=conn.dialect)}"
+        ))
+        added.append(column.name)
+    return added
+
+
+# Schema as of migration 3, frozen here so that changing models.py never rewrites
+# applied migrations. Later schema changes are migrations of their own.
+schema_v1 = MetaData()
+
+Table(
+    "companies", schema_v1,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, index=True),
+    Column("industry", String),
+    Column("gst_number", String, unique=True, nullable=True),
+    Column("file_hash", String, nullable=True, index=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+Table(
+    "financial_records", schema_v1,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("company_id", Integer, ForeignKey("companies.id")),
+    Column("record_type", String),
+    Column("category", String),
+    Column("amount", Float),
+    Column("currency", String),
+    Column("date", DateTime),
+    Column("source_document", String, nullable=True),
+    Column("row_fingerprint", BigInteger, nullable=True),
+    Index("ix_financial_records_company_type", "company_id", "record_type"),
+    Index("ix_financial_records_company_date_id", "company_id", "date", "id"),
+    Index("ix_financial_records_company_fingerprint", "company_id", "row_fingerprint"),
+)
+
+Table(
+    "financial_records_archive", schema_v1,
+    Column("id", Integer, primary_key=True, autoincrement=False),
+    Column("company_id", Integer, ForeignKey("companies.id"), nullable=False),
+    Column("record_type", String),
+    Column("category", String),
+    Column("amount", Float),
+    Column("currency", String),
+    Column("date", DateTime),
+    Column("source_document", String, nullable=True),
+    Column("row_fingerprint", BigInteger, nullable=True),
+    Column("archived_at", DateTime(timezone=True), server_default=func.now()),
+    Index("ix_financial_records_archive_company_date", "company_id", "date"),
+    Index("ix_financial_records_archive_company_fingerprint", "company_id", "row_fingerprint"),
+)
+
+Table(
+    "assessments", schema_v1,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("company_id", Integer, ForeignKey("companies.id")),
+    Column("overall_score", Float),
+    Column("risk_level", String),
+    Column("summary_narrative", Text),
+    Column("recommendations", JSON),
+    Column("language", String(8), nullable=True),
+    Column("translations", JSON, nullable=True),
+    Column("cache_key", String(64), nullable=True, index=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+Table(
+    "company_financial_summary", schema_v1,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("company_id", Integer, ForeignKey("companies.id"), nullable=False),
+    Column("record_type", String, nullable=False),
+    Column("category", String, nullable=False),
+    Column("period", String(7), nullable=False),
+    Column("total_amount", Float, nullable=False),
+    Column("record_count", Integer, nullable=False),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+    UniqueConstraint("company_id", "record_type", "category", "period", name="uq_company_summary_bucket"),
+)
+
+Table(
+    "analysis_jobs", schema_v1,
+    Column("id", String(32), primary_key=True),
+    Column("company_id", Integer, ForeignKey("companies.id"), nullable=False),
+    Column("language", String(8), nullable=False),
+    Column("all_languages", Boolean, nullable=False),
+    Column("force_refresh", Boolean, nullable=False),
+    Column("data_version", String(16), nullable=False),
+    Column("status", String(16), nullable=False),
+    Column("result", JSON, nullable=True),
+    Column("error", Text, nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("started_at", DateTime(timezone=True), nullable=True),
+    Column("finished_at", DateTime(timezone=True), nullable=True),
+    Index("ix_analysis_jobs_dedup", "company_id", "language", "data_version", "status"),
+    Index("ix_analysis_jobs_status", "status"),
+)
+
+
+@migration(1, "baseline")
+def _baseline(conn):
+    schema_v1.create_all(bind=conn)
+
+
+@migration(2, "model_columns")
+def _model_columns(conn):
+    # Nullable columns added to the models while create_all was the only schema management
+    for table in schema_v1.sorted_tables:
+        for name in _add_missing_columns(conn, table):
+            print(f"  added {table.name}.{name}")
+
+
+@migration(3, "ledger_indexes")
+def _ledger_indexes(conn):
+    # Superseded by ix_financial_records_company_date_id
+    if "ix_financial_records_company_date" in {i["name"] for i in inspect(conn).get_indexes(LEDGER_TABLE)}:
+        conn.execute(text("DROP INDEX ix_financial_records_company_date"))
+    for table in schema_v1.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+
+# Rows read and updated per step of the fingerprint backfill
+BACKFILL_BATCH = 50000
+
+
+class _RowFingerprinterV1:
+    """
+    ingestion.RowFingerprinter as migration 4 was written against, frozen here
+    like the DDL: fingerprints only match across uploads if this never changes.
+    """
+
+    def __init__(self):
+        # Base row hash -> rows with that hash seen so far
+        self._seen = None
+
+    def __call__(self, df):
+        import pandas as pd
+
+        if self._seen is None:
+            self._seen = pd.Series(dtype="int64", index=pd.Index([], dtype="uint64"))
+        base = pd.util.hash_pandas_object(
+            df[["date", "category", "amount", "type"]].assign(amount=df["amount"].round(2)), index=False
+        ).to_numpy()
+        prior = self._seen.reindex(base).fillna(0).to_numpy(dtype="int64")
+        occurrence = pd.Series(base).groupby(base).cumcount().to_numpy() + prior
+        self._seen = self._seen.add(pd.Series(base).value_counts(), fill_value=0).astype("int64")
+        fingerprints = pd.util.hash_pandas_object(
+            pd.DataFrame({"base": base, "occurrence": occurrence}), index=False
+        ).to_numpy()
+        return fingerprints.view("int64")
+
+
+@migration(4, "row_fingerprint_backfill")
+def _row_fingerprint_backfill(conn):
+    """
+    Fingerprint ledger rows stored before fingerprints existed, which merge uploads
+    could never match. Each company's rows are numbered in id order, as one upload
+    of its whole ledger would number them.
+    """
+    import pandas as pd
+
+    tables = [schema_v1.tables[LEDGER_TABLE], schema_v1.tables["financial_records_archive"]]
+    company_ids = conn.execute(union(*[
+        select(table.c.company_id).where(table.c.row_fingerprint.is_(None)) for table in tables
+    ])).scalars().all()
+    filled = 0
+    for company_id in company_ids:
+        fingerprint = _RowFingerprinterV1()
+        last_id = 0
+        while True:
+            # Archived rows keep their ids, so one id order spans both tables
+            pending = union_all(*[
+                select(table.c.id, table.c.date, table.c.category, table.c.amount, table.c.record_type.label("type"),
+                       literal(index).label("source")).where(
+                    table.c.company_id == company_id, table.c.row_fingerprint.is_(None), table.c.id > last_id
+                ) for index, table in enumerate(tables)
+            ]).subquery()
+            rows = conn.execute(select(pending).order_by(pending.c.id).limit(BACKFILL_BATCH)).all()
+            if not rows:
+                break
+            frame = pd.DataFrame(rows, columns=["id", "date", "category", "amount", "type", "source"])
+            frame["date"] = pd.to_datetime(frame["date"]).astype("datetime64[ns]")
+            frame["amount"] = frame["amount"].astype("float64")
+            frame["fingerprint"] = fingerprint(frame)
+            for index, table in enumerate(tables):
+                updates = frame.loc[frame["source"] == index, ["id", "fingerprint"]]
+                if len(updates):
+                    conn.execute(
+                        table.update().where(table.c.id == bindparam("row_id")).values(row_fingerprint=bindparam("fp")),
+                        [{"row_id": int(i), "fp": int(f)} for i, f in zip(updates["id"], updates["fingerprint"])]
+                    )
+            filled += len(frame)
+            last_id = int(frame["id"].iloc[-1])
+    if filled:
+        print(f"  fingerprinted {filled} rows of {len(company_ids)} companies")
+
+
+@migration(5, "analysis_jobs_active_unique")
+def _analysis_jobs_active_unique(conn):
+    """
+    At most one queued or running job per company, language, scope, data version and
+    force_refresh, so concurrent /analyze requests cannot both enqueue one. Duplicates
+    that raced in before are failed first, keeping the oldest.
+    """
+    conn.execute(text(
+        "UPDATE analysis_jobs SET status = 'failed', error = 'duplicate of an earlier active job' "
+        "WHERE status IN ('queued', 'running') AND EXISTS ("
+        "SELECT 1 FROM analysis_jobs AS older WHERE older.status IN ('queued', 'running') "
+        "AND older.company_id = analysis_jobs.company_id AND older.language = analysis_jobs.language "
+        "AND older.all_languages = analysis_jobs.all_languages AND older.data_version = analysis_jobs.data_version "
+        "AND older.force_refresh = analysis_jobs.force_refresh "
+        "AND (older.created_at < analysis_jobs.created_at "
+        "OR (older.created_at = analysis_jobs.created_at AND older.id < analysis_jobs.id)))"
+    ))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_analysis_jobs_active ON analysis_jobs "
+        "(company_id, language, all_languages, data_version, force_refresh) WHERE status IN ('queued', 'running')"
+    ))
+
+
+def applied_versions(conn) -> dict:
+    """{version: applied_at} of the migrations recorded in schema_migrations"""
+    if not inspect(conn).has_table(schema_migrations.name):
+        return {}
+    return dict(conn.execute(select(schema_migrations.c.version, schema_migrations.c.applied_at)).all())
+
+
+def _lock(conn) -> None:
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+def upgrade(bind=None) -> list:
+    """
+    Apply pending migrations, then LEDGER_PARTITIONING if the ledger is still empty.
+
+    Returns:
+        Versions applied by this call
+    """
+    applied = []
+    with (bind or engine).begin() as conn:
+        _lock(conn)
+        schema_migrations.create(bind=conn, checkfirst=True)
+        done = applied_versions(conn)
+        for version, name, fn in sorted(MIGRATIONS):
+            if version in done:
+                continue
+            print(f"Applying migration {version:04d}_{name}")
+            fn(conn)
+            conn.execute(schema_migrations.insert().values(version=version, name=name))
+            applied.append(version)
+        _apply_configured_partitioning(conn)
+    return applied
+
+
+def reset_schema(bind=None) -> list:
+    """Drop every table, including the migration history, and upgrade from scratch. Deletes all data!"""
+    bind = bind or engine
+    Base.metadata.drop_all(bind=bind)
+    schema_migrations.drop(bind=bind, checkfirst=True)
+    return upgrade(bind)
+
+
+# Ledger partitioning (PostgreSQL)
+
+def ledger_partitioning(conn) -> str:
+    """How financial_records is partitioned right now: none, company_hash or month"""
+    if conn.dialect.name != "postgresql":
+        return "none"
+    strategy = conn.execute(
+        text("SELECT partstrat FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+        {"table": LEDGER_TABLE}
+    ).scalar()
+    return {"h": "company_hash", "r": "month"}.get(strategy, "none")
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month `months` after (or before) the month of `month`"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_partition_name(month: date) -> str:
+    return f"{LEDGER_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def month_partitions(conn) -> list:
+    """(partition name, first day of its month) of the ledger's month partitions, oldest first"""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table)"
+    ), {"table": LEDGER_TABLE}).scalars()
+    prefix = f"{LEDGER_TABLE}_y"
+    partitions = []
+    for name in names:
+        if name.startswith(prefix):
+            month = datetime.strptime(name[len(prefix):], "%Ym%m").date()
+            partitions.append((name, month))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def month_partition_ddl(month: date) -> list:
+    """
+    Statements that add the partition of one month to the month-partitioned ledger.
+    Rows of that month that landed in the default partition move along; ATTACH checks none are left behind.
+    """
+    name = month_partition_name(month)
+    low, high = month.isoformat(), add_months(month, 1).isoformat()
+    return [
+        f"CREATE TABLE {name} (LIKE {LEDGER_TABLE} INCLUDING DEFAULTS)",
+        f"WITH moved AS (DELETE FROM {LEDGER_TABLE}_default WHERE \"date\" >= '{low}' AND \"date\" < '{high}' RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved",
+        f"ALTER TABLE {LEDGER_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{low}') TO ('{high}')",
+    ]
+
+
+def _attach_month(conn, month: date) -> None:
+    for statement in month_partition_ddl(month):
+        conn.execute(text(statement))
+
+
+def ensure_month_partitions(conn, start: date = None, months_ahead: int = LEDGER_MONTHS_AHEAD) -> list:
+    """
+    Create the month partitions from `start` (default: this month) to `months_ahead` months from now.
+
+    Returns:
+        Names of the partitions created
+    """
+    existing = {name for name, _ in month_partitions(conn)}
+    this_month = date.today().replace(day=1)
+    month = (start or this_month).replace(day=1)
+    created = []
+    while month <= add_months(this_month, months_ahead):
+        if month_partition_name(month) not in existing:
+            _attach_month(conn, month)
+            created.append(month_partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def partitioned_ledger_ddl(scheme: str, source: str, partitions: int = LEDGER_HASH_PARTITIONS) -> list:
+    """
+    Statements that create the partitioned ledger, with the columns of table `source`,
+    and its fixed partitions (month partitions come from month_partition_ddl)
+    """
+    if scheme == "company_hash":
+        # The partition key has to be part of the primary key
+        return [
+            f"CREATE TABLE {LEDGER_TABLE} (LIKE {source} INCLUDING DEFAULTS, PRIMARY KEY (company_id, id)) "
+            f"PARTITION BY HASH (company_id)",
+            *[f"CREATE TABLE {LEDGER_TABLE}_p{remainder} PARTITION OF {LEDGER_TABLE} "
+              f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})" for remainder in range(partitions)],
+        ]
+    # No primary key: it would have to include date, which is nullable. ids still come from the sequence
+    return [
+        f'CREATE TABLE {LEDGER_TABLE} (LIKE {source} INCLUDING DEFAULTS) PARTITION BY RANGE ("date")',
+        f"CREATE TABLE {LEDGER_TABLE}_default PARTITION OF {LEDGER_TABLE} DEFAULT",
+    ]
+
+
+def partition_ledger(conn, scheme: str, partitions: int = LEDGER_HASH_PARTITIONS) -> int:
+    """
+    Rebuild financial_records as a partitioned table and copy every row into it.
+    Runs in the caller's transaction, so a failure leaves the old table as it was.
+
+    Args:
+        scheme: "company_hash" or "month"
+        partitions: Number of hash partitions
+
+    Returns:
+        Number of rows copied
+    """
+    if scheme not in ("company_hash", "month"):
+        raise ValueError(f"Unknown partitioning scheme: {scheme}")
+    if conn.dialect.name != "postgresql":
+        raise RuntimeError("Ledger partitioning needs PostgreSQL")
+    current = ledger_partitioning(conn)
+    if current == scheme:
+        return 0
+    if current != "none":
+        raise RuntimeError(f"{LEDGER_TABLE} is already partitioned by {current}")
+
+    old = f"{LEDGER_TABLE}_unpartitioned"
+    conn.execute(text(f"ALTER TABLE {LEDGER_TABLE} RENAME TO {old}"))
+    # Index names are schema-wide: free them for the new table, whose indexes are built after the copy
+    inspector = inspect(conn)
+    for index in inspector.get_indexes(old):
+        conn.execute(text(f"DROP INDEX {_quote(conn, index['name'])}"))
+    primary_key = inspector.get_pk_constraint(old).get("name")
+    if primary_key:
+        conn.execute(text(f"ALTER TABLE {old} RENAME CONSTRAINT {_quote(conn, primary_key)} TO {old}_pkey"))
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": old}).scalar()
+
+    for statement in partitioned_ledger_ddl(scheme, old, partitions):
+        conn.execute(text(statement))
+    if scheme == "month":
+        first = conn.execute(text(f'SELECT min("date") FROM {old}')).scalar()
+        ensure_month_partitions(conn, start=first.date() if first is not None else None)
+    conn.execute(text(f"ALTER TABLE {LEDGER_TABLE} ADD FOREIGN KEY (company_id) REFERENCES companies (id)"))
+
+    copied = conn.execute(text(f"INSERT INTO {LEDGER_TABLE} SELECT * FROM {old}")).rowcount
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {LEDGER_TABLE}.id"))
+    conn.execute(text(f"DROP TABLE {old}"))
+    for index in FinancialRecord.__table__.indexes:
+        index.create(bind=conn)
+    conn.execute(text(f"ANALYZE {LEDGER_TABLE}"))
+    return copied
+
+
+def _apply_configured_partitioning(conn) -> None:
+    if LEDGER_PARTITIONING == "none":
+        return
+    if conn.dialect.name != "postgresql":
+        print(f"LEDGER_PARTITIONING={LEDGER_PARTITIONING} ignored: partitioning needs PostgreSQL")
+        return
+    current = ledger_partitioning(conn)
+    if current == LEDGER_PARTITIONING:
+        if current == "month":
+            ensure_month_partitions(conn)
+        return
+    if current == "none" and conn.execute(select(FinancialRecord.id).limit(1)).first() is None:
+        partition_ledger(conn, LEDGER_PARTITIONING)
+        print(f"Partitioned {LEDGER_TABLE} by {LEDGER_PARTITIONING}")
+        return
+    print(f"{LEDGER_TABLE} is partitioned by {current}, not {LEDGER_PARTITIONING}: "
+          f"convert it with `python migrations.py partition --by {LEDGER_PARTITIONING}`")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("upgrade", help="apply pending migrations")
+    commands.add_parser("status", help="list applied and pending migrations")
+    partition = commands.add_parser("partition", help="convert a populated ledger to a partitioned table")
+    partition.add_argument("--by", choices=["company_hash", "month"], required=True)
+    partition.add_argument("--partitions", type=int, default=LEDGER_HASH_PARTITIONS, help="hash partitions")
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        applied = upgrade()
+        print(f"Applied {len(applied)} migrations" if applied else "Schema is up to date")
+    elif args.command == "status":
+        with engine.connect() as conn:
+            done = applied_versions(conn)
+            for version, name, _ in sorted(MIGRATIONS):
+                state = f"applied {done[version]}" if version in done else "pending"
+                print(f"{version:04d}_{name:<20} {state}")
+            print(f"\n{LEDGER_TABLE} partitioning: {ledger_partitioning(conn)}")
+    else:
+        upgrade()
+        with engine.begin() as conn:
+            _lock(conn)
+            copied = partition_ledger(conn, args.by, args.partitions)
+        print(f"Partitioned {LEDGER_TABLE} by {args.by}: copied {copied:,} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, ForeignKey, Text, JSON, Index, UniqueConstraint, Boolean
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from database import Base
 
 class Company(Base):
@@ -27,9 +27,43 @@ class FinancialRecord(Base):
     currency = Column(String, default="INR")
     date = Column(DateTime)
     source_document = Column(String, nullable=True) # Filename or ID
+    row_fingerprint = Column(BigInteger, nullable=True) # ingestion.RowFingerprinter: (date, category, amount, type, occurrence)
     
     company = relationship("Company", back_populates="financial_records")
 
+    __table_args__ = (
+        # Backs the per-company SUM(amount) GROUP BY record_type aggregations
+        Index("ix_financial_records_company_type", "company_id", "record_type"),
+        # Backs date-range scans and weekly GROUP BYs for /trends, and (date, id) keyset pages of /records
+        Index("ix_financial_records_company_date_id", "company_id", "date", "id"),
+        # Per-company fingerprint lookups for incremental uploads
+        Index("ix_financial_records_company_fingerprint", "company_id", "row_fingerprint"),
+    )
+
+class FinancialRecordArchive(Base):
+    """
+    FinancialRecord rows moved out of the live ledger by the retention job (retention.py).
+    Rows keep their original id; the summary rollups still count them.
+    """
+    __tablename__ = "financial_records_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
+    record_type = Column(String)
+    category = Column(String)
+    amount = Column(Float)
+    currency = Column(String)
+    date = Column(DateTime)
+    source_document = Column(String, nullable=True)
+    row_fingerprint = Column(BigInteger, nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_financial_records_archive_company_date", "company_id", "date"),
+        # Re-uploads of archived rows are still recognized as duplicates
+        Index("ix_financial_records_archive_company_fingerprint", "company_id", "row_fingerprint"),
+    )
+
 class Assessment(Base):
     __tablename__ = "assessments"
 
@@ -39,6 +73,56 @@ class Assessment(Base):
     risk_level = Column(String) # Low, Medium, High
     summary_narrative = Column(Text) # LLM generated summary
     recommendations = Column(JSON) # Structured list of recommendations
+    language = Column(String(8), nullable=True) # Language code the assessment was generated in
+    translations = Column(JSON, nullable=True) # {language: {score, risk_level, narrative, recommendations}} for multi-language runs
+    cache_key = Column(String(64), nullable=True, index=True) # Hash of company, data version, language and model (see assessment_cache)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     company = relationship("Company", back_populates="assessments")
+
+class CompanyFinancialSummary(Base):
+    """
+    Materialized rollups of financial_records, maintained incrementally on upload.
+    category/period hold '*' on rollup rows, so headline totals per record_type are
+    (category='*', period='*'), per-category totals are period='*' and monthly totals are category='*'.
+    """
+    __tablename__ = "company_financial_summary"
+
+    id = Column(Integer, primary_key=True, index=True)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
+    record_type = Column(String, nullable=False)
+    category = Column(String, nullable=False)
+    period = Column(String(7), nullable=False) # 'YYYY-MM', '' for undated records, '*' for all
+    total_amount = Column(Float, nullable=False, default=0.0)
+    record_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("company_id", "record_type", "category", "period", name="uq_company_summary_bucket"),
+    )
+
+class AnalysisJob(Base):
+    """Queued /analyze run; duplicates for the same company, language and data version are merged"""
+    __tablename__ = "analysis_jobs"
+
+    id = Column(String(32), primary_key=True) # uuid4 hex
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
+    language = Column(String(8), nullable=False, default="en")
+    all_languages = Column(Boolean, nullable=False, default=False)
+    force_refresh = Column(Boolean, nullable=False, default=False)
+    data_version = Column(String(16), nullable=False) # summary.get_data_version at enqueue time
+    status = Column(String(16), nullable=False, default="queued") # queued, running, done, failed
+    result = Column(JSON, nullable=True) # /analyze response once done
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_analysis_jobs_dedup", "company_id", "language", "data_version", "status"),
+        Index("ix_analysis_jobs_status", "status"),
+        # One active job per merge key (migration 5); concurrent enqueues hit it instead of duplicating
+        Index("ix_analysis_jobs_active", "company_id", "language", "all_languages", "data_version", "force_refresh",
+              unique=True, sqlite_where=text("status IN ('queued', 'running')"),
+              postgresql_where=text("status IN ('queued', 'running')")),
+    )
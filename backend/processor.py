@@ -1,11 +1,186 @@
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, BinaryIO, Iterator
+import codecs
+import hashlib
 import io
+import os
+import time
+from instrumentation import add_count, record
 
-def parse_financial_document(file_content: bytes, filename: str) -> List[Dict[str, Any]]:
+# Rows per batch yielded by StreamingFinancialDocument
+DEFAULT_CHUNK_ROWS = 50000
+# Bytes pulled from the upload stream per read
+READ_BLOCK_SIZE = 1024 * 1024
+
+# Canonical record types and the spellings we accept for them
+RECORD_TYPES = ('Revenue', 'Expense', 'Asset', 'Liability')
+DEFAULT_RECORD_TYPE = 'Expense'
+DEFAULT_CATEGORY = 'Uncategorized'
+# The "all categories" rollup key (summary.ROLLUP_ALL), so no ledger row may use it
+ROLLUP_ALL = '*'
+# Opt-in sign convention for ledgers without a type column: positive amounts are
+# revenue and negative ones expenses. Off, every such row is a DEFAULT_RECORD_TYPE
+# with its amount as given.
+SIGNED_AMOUNT_TYPES = os.getenv("SIGNED_AMOUNT_TYPES", "false").lower() in ("1", "true", "yes")
+# Uploads are rejected once more than this fraction of their rows has an unparseable
+# date, amount or type (those cells fall back to no date, 0.0 and DEFAULT_RECORD_TYPE)
+MAX_COERCED_FRACTION = float(os.getenv("MAX_COERCED_FRACTION", "0.1"))
+COERCED_FIELDS = ('invalid_dates', 'invalid_amounts', 'unknown_types')
+
+TYPE_SYNONYMS = {
+    'revenue': 'Revenue', 'income': 'Revenue', 'sales': 'Revenue', 'sale': 'Revenue',
+    'credit': 'Revenue', 'cr': 'Revenue', 'inflow': 'Revenue', 'receipt': 'Revenue',
+    'expense': 'Expense', 'expenses': 'Expense', 'cost': 'Expense', 'payment': 'Expense',
+    'debit': 'Expense', 'dr': 'Expense', 'outflow': 'Expense',
+    'asset': 'Asset', 'assets': 'Asset',
+    'liability': 'Liability', 'liabilities': 'Liability',
+}
+
+# Source column names mapped onto the canonical ledger columns
+COLUMN_SYNONYMS = {
+    'date': ['date', 'txn_date', 'transaction_date', 'posting_date', 'value_date', 'entry_date'],
+    'category': ['category', 'account', 'ledger', 'head', 'particulars', 'description', 'narration'],
+    'amount': ['amount', 'amt', 'value', 'transaction_amount', 'txn_amount'],
+    'type': ['type', 'record_type', 'txn_type', 'transaction_type',
+             'debit/credit', 'credit/debit', 'dr/cr', 'cr/dr'],
+    'debit': ['debit', 'dr', 'withdrawal', 'debit_amount'],
+    'credit': ['credit', 'cr', 'deposit', 'credit_amount'],
+}
+
+NORMALIZED_COLUMNS = ['date', 'category', 'amount', 'type']
+
+def _canonical_column_name(name) -> str:
+    return '_'.join(str(name).strip().lower().split())
+
+def _resolve_columns(columns) -> Dict[str, Any]:
+    """Pick the source column for each canonical field, first synonym wins"""
+    by_name = {_canonical_column_name(c): c for c in columns}
+    resolved = {}
+    for field, synonyms in COLUMN_SYNONYMS.items():
+        for synonym in synonyms:
+            if synonym in by_name:
+                resolved[field] = by_name[synonym]
+                break
+    return resolved
+
+def _to_float(series: pd.Series) -> pd.Series:
+    """Coerce a column to float64, stripping currency symbols, thousands separators and (negatives)"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype('float64')
+    values = pd.to_numeric(series, errors='coerce').astype('float64')
+    # Only the cells the fast path could not parse go through string cleaning
+    dirty = values.isna() & series.notna()
+    if dirty.any():
+        text = series[dirty].astype(str)
+        negative = text.str.contains(r'^\s*\(.*\)\s*$', regex=True)
+        cleaned = pd.to_numeric(text.str.replace(r'[^0-9.\-]', '', regex=True), errors='coerce')
+        values[dirty] = cleaned.where(~negative, -cleaned.abs())
+    return values
+
+def _map_distinct(series: pd.Series, fn) -> pd.Series:
+    """Apply a Python function once per distinct value instead of once per row"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    lookup = pd.array([fn(u) for u in uniques] + [None], dtype='object')
+    return pd.Series(lookup[codes], index=series.index, dtype='object')
+
+def _coerced(raw: pd.Series, parsed: pd.Series) -> int:
+    """Cells that held something (not blank) but parsed to nothing"""
+    # Only the cells that failed to parse are looked at, usually none
+    failed = raw[parsed.isna() & raw.notna()]
+    return int((failed.astype(str).str.strip() != '').sum()) if len(failed) else 0
+
+def _category(value):
+    category = str(value).strip() or None
+    if category == ROLLUP_ALL:
+        # The summary rollups use it for "all categories": rows filed under it would merge into the totals
+        raise ValueError(f"'{ROLLUP_ALL}' is reserved and cannot be used as a category; rename it in the file")
+    return category
+
+def _canonical_types(series: pd.Series) -> pd.Series:
+    """Map free-text record types onto RECORD_TYPES"""
+    return _map_distinct(series, lambda value: TYPE_SYNONYMS.get(str(value).strip().lower()))
+
+def normalize_financial_frame(df: pd.DataFrame, signed_amounts: bool = None) -> pd.DataFrame:
     """
-    Parses a financial document (CSV or XLSX) and returns a list of records.
-    Assumes a standard format for simplicity: Date, Category, Amount, Type (Revenue/Expense).
+    Vectorized normalization of a raw ledger into the typed columnar batch the DB layer ingests.
+
+    Works on whole columns: maps column synonyms (txn_date, debit/credit, ...),
+    keeps dates as datetime64, coerces amount to float64, canonicalizes type to
+    Revenue/Expense/Asset/Liability and fills default categories/types. A category
+    named ROLLUP_ALL ('*') raises ValueError.
+
+    Cells that hold a value that cannot be parsed are coerced rather than rejected;
+    how many per field is recorded in the result's attrs["coerced"] (COERCED_FIELDS).
+
+    Args:
+        df: Raw ledger as read from the file
+        signed_amounts: Without a type column, take the type from the amount's sign
+            (defaults to SIGNED_AMOUNT_TYPES)
+
+    Returns:
+        DataFrame with columns date (datetime64[ns]), category (str), amount (float64), type (str)
+    """
+    source = _resolve_columns(df.columns)
+    index = df.index
+    if signed_amounts is None:
+        signed_amounts = SIGNED_AMOUNT_TYPES
+    coerced = dict.fromkeys(COERCED_FIELDS, 0)
+
+    if 'date' in source:
+        date = pd.to_datetime(df[source['date']], errors='coerce')
+        if getattr(date.dt, 'tz', None) is not None:
+            date = date.dt.tz_localize(None)
+        date = date.astype('datetime64[ns]')
+        coerced['invalid_dates'] = _coerced(df[source['date']], date)
+    else:
+        date = pd.Series(pd.NaT, index=index, dtype='datetime64[ns]')
+
+    if 'category' in source:
+        category = _map_distinct(df[source['category']], _category)
+        category = category.fillna(DEFAULT_CATEGORY)
+    else:
+        category = pd.Series(DEFAULT_CATEGORY, index=index, dtype='object')
+
+    if 'type' in source:
+        record_type = _canonical_types(df[source['type']])
+        coerced['unknown_types'] = _coerced(df[source['type']], record_type)
+    else:
+        record_type = pd.Series(None, index=index, dtype='object')
+
+    if 'amount' in source:
+        amount = _to_float(df[source['amount']])
+        coerced['invalid_amounts'] = _coerced(df[source['amount']], amount)
+        if 'type' not in source and signed_amounts:
+            record_type = record_type.mask(amount > 0, 'Revenue').mask(amount < 0, 'Expense')
+            amount = amount.abs()
+    elif 'debit' in source or 'credit' in source:
+        # Separate debit/credit columns: credits are revenue, debits are expenses
+        sides = {side: pd.Series(0.0, index=index) for side in ('debit', 'credit')}
+        for side in sides:
+            if side in source:
+                parsed = _to_float(df[source[side]])
+                coerced['invalid_amounts'] += _coerced(df[source[side]], parsed)
+                sides[side] = parsed.fillna(0.0)
+        debit, credit = sides['debit'], sides['credit']
+        is_credit = credit.abs() > 0
+        amount = credit.abs().where(is_credit, debit.abs())
+        record_type = record_type.fillna(is_credit.map({True: 'Revenue', False: 'Expense'}))
+    else:
+        amount = pd.Series(0.0, index=index)
+
+    frame = pd.DataFrame({
+        'date': date,
+        'category': category,
+        'amount': amount.fillna(0.0).astype('float64'),
+        'type': record_type.fillna(DEFAULT_RECORD_TYPE).astype(object),
+    }, index=index)[NORMALIZED_COLUMNS]
+    frame.attrs['coerced'] = coerced
+    return frame
+
+def parse_financial_dataframe(file_content: bytes, filename: str) -> pd.DataFrame:
+    """
+    Parses a financial document (CSV or XLSX) into a normalized DataFrame
+    (see normalize_financial_frame) that can be handed straight to the bulk ingestion engine.
     """
     filename = filename.lower()
     try:
@@ -21,21 +196,215 @@ def parse_financial_document(file_content: bytes, filename: str) -> List[Dict[st
         else:
             raise ValueError("Unsupported file format. Please upload CSV or XLSX.")
 
-        # Basic standardization - expects specific columns or tries to guess
-        # Normalizing column names to lowercase
-        df.columns = [c.lower() for c in df.columns]
-
-        required_cols = ['date', 'amount', 'category', 'type']
-        
-        # Convert date to string (ISO format) for JSON serialization
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-        
-        # Fill NaN for optional fields if needed, or handle in loop
-        df = df.fillna('')
-            
-        return df.to_dict(orient='records')
-        
+        return normalize_financial_frame(df)
+
     except Exception as e:
         print(f"Error parsing file: {e}")
         raise e
+
+def parse_financial_document(file_content: bytes, filename: str) -> List[Dict[str, Any]]:
+    """
+    Parses a financial document (CSV or XLSX) and returns a list of records.
+    Assumes a standard format for simplicity: Date, Category, Amount, Type (Revenue/Expense).
+    """
+    df = parse_financial_dataframe(file_content, filename)
+
+    # Convert date to string (ISO format) for JSON serialization
+    if 'date' in df.columns:
+        df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+
+    # Fill NaN for optional fields if needed, or handle in loop
+    df = df.fillna('')
+
+    return df.to_dict(orient='records')
+
+
+class _HashingStream(io.RawIOBase):
+    """Read-only stream wrapper that feeds every byte read through an MD5 digest (unless hash=False)."""
+
+    def __init__(self, raw: BinaryIO, hash: bool = True):
+        self._raw = raw
+        self.md5 = hashlib.md5() if hash else None
+        self.read_seconds = 0.0
+        self.hash_seconds = 0.0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        started = time.perf_counter()
+        data = self._raw.read(len(buffer))
+        read = time.perf_counter()
+        size = len(data)
+        buffer[:size] = data
+        if self.md5 is not None:
+            self.md5.update(data)
+        self.read_seconds += read - started
+        self.hash_seconds += time.perf_counter() - read
+        return size
+
+    def drain(self) -> None:
+        """Consume whatever the parser did not read so the digest covers the whole file."""
+        buffer = bytearray(READ_BLOCK_SIZE)
+        while self.readinto(buffer):
+            pass
+
+
+class _FallbackTextStream(io.TextIOBase):
+    """
+    Text view of an upload: UTF-8 until the first byte that is not valid UTF-8, cp1252
+    from there on. Windows Excel CSVs are often plain ASCII for their first megabytes,
+    so the encoding cannot be picked from the head of a stream that is never rewound.
+    """
+
+    def __init__(self, raw: BinaryIO):
+        self._raw = raw
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        data = self._raw.read(size if size is not None and size >= 0 else -1)
+        final = not data or size is None or size < 0
+        try:
+            return self._decoder.decode(data, final)
+        except UnicodeDecodeError as e:
+            # e.start indexes the bytes the decoder still held plus this block
+            data = self._decoder.getstate()[0] + data
+            # Never raises: bytes cp1252 leaves undefined become U+FFFD
+            self._decoder = codecs.getincrementaldecoder('cp1252')(errors='replace')
+            return data[:e.start].decode('utf-8') + self._decoder.decode(data[e.start:], final)
+
+
+class StreamingFinancialDocument:
+    """
+    Parses a CSV or XLSX upload in bounded-memory batches.
+
+    Iterating yields standardized DataFrames of at most `chunk_size` rows.
+    The MD5 of the file (used for duplicate detection) comes from hash_file(),
+    a sequential pre-pass that lets callers reject duplicates before parsing.
+    Without it, a CSV is hashed during the same pass and `file_hash` is
+    available once iteration has finished. So are the counts of coerced cells
+    in `coerced`; iteration ends with a ValueError when more than
+    MAX_COERCED_FRACTION of the rows had one in the same field.
+
+    Args:
+        fileobj: Binary file object, e.g. UploadFile.file
+        filename: Original filename, used to pick the format
+        chunk_size: Maximum rows per yielded batch
+    """
+
+    def __init__(self, fileobj: BinaryIO, filename: str, chunk_size: int = DEFAULT_CHUNK_ROWS):
+        self.fileobj = fileobj
+        self.filename = filename.lower()
+        self.chunk_size = chunk_size
+        self.rows = 0
+        # Cells coerced by normalize_financial_frame, summed over the batches
+        self.coerced = dict.fromkeys(COERCED_FIELDS, 0)
+        self._md5 = None
+        # Time spent producing batches, split into reading the upload, hashing it and parsing it
+        self.read_seconds = 0.0
+        self.hash_seconds = 0.0
+        self.parse_seconds = 0.0
+
+        if not (self.filename.endswith('.csv') or self.filename.endswith('.xlsx')):
+            raise ValueError("Unsupported file format. Please upload CSV or XLSX.")
+
+    @property
+    def file_hash(self) -> str:
+        if self._md5 is None:
+            raise RuntimeError("file_hash is only available after the document has been fully read")
+        return self._md5.hexdigest()
+
+    def hash_file(self) -> str:
+        """
+        MD5 of the whole upload, in one sequential pass over the file, which is then rewound
+        (uploads are spooled to a seekable file, and XLSX needs random access anyway)
+        """
+        md5 = hashlib.md5()
+        started = time.perf_counter()
+        self.fileobj.seek(0)
+        for block in iter(lambda: self.fileobj.read(READ_BLOCK_SIZE), b''):
+            md5.update(block)
+        self.fileobj.seek(0)
+        record("hash", time.perf_counter() - started)
+        self._md5 = md5
+        return md5.hexdigest()
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        if self._md5 is None and not self.filename.endswith('.csv'):
+            self.hash_file()
+        batches = self._iter_csv() if self.filename.endswith('.csv') else self._iter_xlsx()
+        try:
+            while True:
+                # Only the producer side is timed; the consumer's work between batches is not parsing
+                started = time.perf_counter()
+                batch = next(batches, None)
+                self.parse_seconds += time.perf_counter() - started
+                if batch is None:
+                    break
+                self.rows += len(batch)
+                for field, count in batch.attrs['coerced'].items():
+                    self.coerced[field] += count
+                yield batch
+        except Exception as e:
+            print(f"Error parsing file: {e}")
+            raise e
+        self._check_coerced()
+
+        record("file_read", self.read_seconds)
+        record("hash", self.hash_seconds)
+        record("parse", max(self.parse_seconds - self.read_seconds - self.hash_seconds, 0.0), rows=self.rows)
+        add_count("rows_parsed", self.rows)
+
+    def _check_coerced(self) -> None:
+        """Reject the document when too many of its cells could not be parsed (MAX_COERCED_FRACTION)"""
+        limit = MAX_COERCED_FRACTION * self.rows
+        bad = {field: count for field, count in self.coerced.items() if count > limit}
+        if bad:
+            details = ", ".join(f"{count} {field.replace('_', ' ')}" for field, count in bad.items())
+            raise ValueError(f"Too many unparseable values in {self.rows} rows: {details} "
+                             f"(at most {MAX_COERCED_FRACTION:.0%} are accepted)")
+
+    def _iter_csv(self) -> Iterator[pd.DataFrame]:
+        stream = _HashingStream(self.fileobj, hash=self._md5 is None)
+        reader = _FallbackTextStream(io.BufferedReader(stream, buffer_size=READ_BLOCK_SIZE))
+
+        with pd.read_csv(reader, chunksize=self.chunk_size) as chunks:
+            for chunk in chunks:
+                yield normalize_financial_frame(chunk)
+
+        if stream.md5 is not None:
+            stream.drain()
+            self._md5 = stream.md5
+        self.read_seconds = stream.read_seconds
+        self.hash_seconds = stream.hash_seconds
+
+    def _iter_xlsx(self) -> Iterator[pd.DataFrame]:
+        from openpyxl import load_workbook
+
+        # XLSX is a zip archive and needs random access: hashed up front by hash_file()
+        workbook = load_workbook(self.fileobj, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                # Same error pandas raises for an empty CSV
+                raise pd.errors.EmptyDataError("No columns to parse from file")
+            columns = [str(c) if c is not None else f"unnamed_{i}" for i, c in enumerate(header)]
+            width = len(columns)
+
+            buffer = []
+            for row in rows:
+                if all(value is None for value in row):
+                    continue
+                # Read-only sheets can return ragged rows; pad/trim to the header width
+                buffer.append(tuple(row[:width]) + (None,) * (width - len(row)))
+                if len(buffer) >= self.chunk_size:
+                    yield normalize_financial_frame(pd.DataFrame.from_records(buffer, columns=columns))
+                    buffer = []
+            if buffer:
+                yield normalize_financial_frame(pd.DataFrame.from_records(buffer, columns=columns))
+        finally:
+            workbook.close()
@@ -0,0 +1,164 @@
+"""
+Prompt context builder for the LLM assessment.
+
+Instead of slicing the first records of a ledger, the prompt is built from
+exact figures over the whole dataset: totals, the monthly series and top
+categories come from the summary rollups, and outliers are found in SQL.
+The result is packed into a compact text block that fits a token budget,
+whether the ledger has ten rows or ten million.
+"""
+
+import os
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from ai_service import estimate_tokens
+from models import CompanyFinancialSummary, FinancialRecord
+from summary import ROLLUP_ALL, UNDATED
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "600"))
+TOP_CATEGORIES = 5
+MAX_OUTLIERS = 5
+# An amount is an outlier when it is more than this many standard deviations above its type's mean
+OUTLIER_SIGMA = 3.0
+# Types need this many records before outliers are meaningful
+OUTLIER_MIN_RECORDS = 8
+
+# Successively smaller layouts tried until the context fits the budget: (months, categories, outliers)
+_LAYOUTS = [
+    (36, TOP_CATEGORIES, MAX_OUTLIERS), (24, TOP_CATEGORIES, MAX_OUTLIERS), (12, TOP_CATEGORIES, 3),
+    (12, 3, 3), (6, 3, 0), (3, 3, 0), (0, 2, 0),
+]
+
+
+def _fmt(amount: float) -> str:
+    return f"{amount:,.0f}"
+
+
+def _load_rollups(db: Session, company_ids: list) -> dict:
+    """Headline, per-category and per-month rollups for many companies in one query"""
+    rows = db.query(CompanyFinancialSummary).filter(
+        CompanyFinancialSummary.company_id.in_(company_ids),
+        or_(CompanyFinancialSummary.category == ROLLUP_ALL, CompanyFinancialSummary.period == ROLLUP_ALL),
+    ).all()
+
+    facts = {cid: {"totals": {}, "counts": {}, "categories": [], "months": {}} for cid in company_ids}
+    for r in rows:
+        f = facts[r.company_id]
+        if r.category == ROLLUP_ALL and r.period == ROLLUP_ALL:
+            f["totals"][r.record_type] = r.total_amount
+            f["counts"][r.record_type] = r.record_count
+        elif r.period == ROLLUP_ALL:
+            f["categories"].append((r.record_type, r.category, r.total_amount))
+        elif r.period != UNDATED:
+            month = f["months"].setdefault(r.period, {"Revenue": 0.0, "Expense": 0.0})
+            if r.record_type in month:
+                month[r.record_type] += r.total_amount
+    return facts
+
+
+def _load_outliers(db: Session, company_ids: list, limit: int = MAX_OUTLIERS) -> dict:
+    """
+    Largest amounts more than OUTLIER_SIGMA standard deviations above their type's mean,
+    per company, found in SQL (variance form, so no SQRT is needed)
+    """
+    mean = func.avg(FinancialRecord.amount)
+    variance = func.avg(FinancialRecord.amount * FinancialRecord.amount) - mean * mean
+    stats = db.query(
+        FinancialRecord.company_id.label("company_id"),
+        FinancialRecord.record_type.label("record_type"),
+        mean.label("mean"),
+        variance.label("variance"),
+    ).filter(
+        FinancialRecord.company_id.in_(company_ids)
+    ).group_by(
+        FinancialRecord.company_id, FinancialRecord.record_type
+    ).having(func.count(FinancialRecord.id) >= OUTLIER_MIN_RECORDS).subquery()
+
+    deviation = FinancialRecord.amount - stats.c.mean
+    rank = func.row_number().over(partition_by=FinancialRecord.company_id, order_by=deviation.desc()).label("rank")
+    candidates = db.query(
+        FinancialRecord.company_id, FinancialRecord.date, FinancialRecord.category,
+        FinancialRecord.record_type, FinancialRecord.amount, rank
+    ).join(
+        stats, (stats.c.company_id == FinancialRecord.company_id) & (stats.c.record_type == FinancialRecord.record_type)
+    ).filter(
+        FinancialRecord.company_id.in_(company_ids),
+        deviation > 0,
+        deviation * deviation > OUTLIER_SIGMA * OUTLIER_SIGMA * stats.c.variance,
+    ).subquery()
+
+    outliers = {cid: [] for cid in company_ids}
+    for row in db.query(candidates).filter(candidates.c.rank <= limit).order_by(candidates.c.company_id, candidates.c.rank):
+        outliers[row.company_id].append(row)
+    return outliers
+
+
+def _render(facts: dict, outliers: list, months: int, categories: int, max_outliers: int) -> str:
+    totals, counts = facts["totals"], facts["counts"]
+    revenue = totals.get("Revenue", 0.0)
+    expense = totals.get("Expense", 0.0)
+    net = revenue - expense
+    series = sorted(facts["months"].items())
+
+    lines = []
+    record_count = sum(counts.values())
+    if series:
+        lines.append(f"Period: {series[0][0]}..{series[-1][0]} ({len(series)} months, {record_count} records)")
+    else:
+        lines.append(f"Records: {record_count} (undated)")
+    margin = f", margin {net / revenue * 100:.1f}%" if revenue else ""
+    lines.append(f"Totals: revenue {_fmt(revenue)}, expense {_fmt(expense)}, net {_fmt(net)}{margin}")
+    if totals.get("Asset") or totals.get("Liability"):
+        lines.append(f"Balance: assets {_fmt(totals.get('Asset', 0.0))}, liabilities {_fmt(totals.get('Liability', 0.0))}")
+
+    for record_type, label in (("Revenue", "revenue"), ("Expense", "expense")):
+        total = totals.get(record_type, 0.0)
+        top = sorted((c for c in facts["categories"] if c[0] == record_type), key=lambda c: -c[2])[:categories]
+        if top and total:
+            items = ", ".join(f"{name} {_fmt(amount)} ({amount / total * 100:.0f}%)" for _, name, amount in top)
+            lines.append(f"Top {label} categories: {items}")
+
+    if series and months:
+        shown = series[-months:]
+        earlier = series[:-months]
+        if earlier:
+            avg_net = sum(m["Revenue"] - m["Expense"] for _, m in earlier) / len(earlier)
+            lines.append(f"Earlier {len(earlier)} months: average net {_fmt(avg_net)}/month")
+        lines.append("Monthly revenue/expense/net: " + "; ".join(
+            f"{period} {_fmt(m['Revenue'])}/{_fmt(m['Expense'])}/{_fmt(m['Revenue'] - m['Expense'])}"
+            for period, m in shown
+        ))
+
+    if outliers and max_outliers:
+        lines.append(f"Outliers (>{OUTLIER_SIGMA:g} sd above type mean): " + "; ".join(
+            f"{o.date.strftime('%Y-%m-%d') if o.date else 'undated'} {o.category} {o.record_type.lower()} {_fmt(o.amount)}"
+            for o in outliers[:max_outliers]
+        ))
+    return "\n".join(lines)
+
+
+def _pack(facts: dict, outliers: list, budget: int) -> str:
+    for layout in _LAYOUTS:
+        text = _render(facts, outliers, *layout)
+        if estimate_tokens(text) <= budget:
+            return text
+    return text
+
+
+def build_prompt_contexts(db: Session, company_ids: list, budget: int = PROMPT_TOKEN_BUDGET) -> dict:
+    """
+    Token-budgeted data summaries for many companies with grouped queries.
+
+    Returns:
+        Dict of company_id -> context text
+    """
+    if not company_ids:
+        return {}
+    facts = _load_rollups(db, company_ids)
+    outliers = _load_outliers(db, company_ids)
+    return {cid: _pack(facts[cid], outliers[cid], budget) for cid in company_ids}
+
+
+def build_prompt_context(db: Session, company_id: int, budget: int = PROMPT_TOKEN_BUDGET) -> str:
+    """Token-budgeted data summary for one company"""
+    return build_prompt_contexts(db, [company_id], budget)[company_id]
@@ -0,0 +1,55 @@
+"""
+Rebuild / verify company_financial_summary from financial_records.
+
+Usage:
+    python rebuild_summaries.py                  # rebuild rollups for every company (backfill)
+    python rebuild_summaries.py --company-id 3   # rebuild a single company
+    python rebuild_summaries.py --check          # only compare stored rollups with the raw ledger
+"""
+
+import argparse
+import sys
+from database import SessionLocal
+from migrations import upgrade
+from models import Company
+from summary import rebuild_company_summary, check_company_summary
+
+parser = argparse.ArgumentParser(description="Rebuild or verify the per-company financial summary rollups")
+parser.add_argument("--company-id", type=int, help="Only process this company")
+parser.add_argument("--check", action="store_true", help="Report inconsistencies without writing anything")
+args = parser.parse_args()
+
+# Make sure the summary table exists on databases created before it was added
+upgrade()
+
+db = SessionLocal()
+try:
+    query = db.query(Company.id).order_by(Company.id)
+    if args.company_id is not None:
+        query = query.filter(Company.id == args.company_id)
+    company_ids = [company_id for (company_id,) in query]
+
+    inconsistent = 0
+    for company_id in company_ids:
+        if args.check:
+            mismatches = check_company_summary(db, company_id)
+            if mismatches:
+                inconsistent += 1
+                print(f"Company {company_id}: {len(mismatches)} inconsistent rollups")
+                for m in mismatches[:10]:
+                    print(f"  {m['record_type']}/{m['category']}/{m['period'] or 'undated'}: "
+                          f"stored {m['stored_total']} ({m['stored_count']} rows), "
+                          f"expected {m['expected_total']} ({m['expected_count']} rows)")
+            else:
+                print(f"Company {company_id}: OK")
+        else:
+            written = rebuild_company_summary(db, company_id)
+            db.commit()
+            print(f"Company {company_id}: rebuilt {written} rollup rows")
+
+    print(f"\nProcessed {len(company_ids)} companies")
+    if args.check and inconsistent:
+        print(f"{inconsistent} companies need a rebuild")
+        sys.exit(1)
+finally:
+    db.close()
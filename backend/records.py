@@ -0,0 +1,299 @@
+"""
+Read access to a company's ledger (its FinancialRecord rows).
+
+Pages use keyset pagination on (date, id): the cursor carries the last row's
+key, so every page costs the same index range scan however deep it is, and
+rows inserted meanwhile never shift or repeat a page. Undated records come
+after all dated ones.
+
+Exports stream the whole (filtered) ledger from a server-side cursor
+(yield_per) as NDJSON, Arrow IPC or Parquet, so the API process holds one
+batch at a time however large the ledger is. NDJSON and Arrow bodies can be
+gzip or zstd encoded; Parquet compresses its column chunks with zstd itself.
+pyarrow and zstandard are optional: without them those formats/encodings are
+simply not offered.
+"""
+
+import base64
+import json
+import os
+import zlib
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import DateTime, Integer, literal, select, tuple_
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import FinancialRecord
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+# Rows per round-trip from the server-side cursor during exports
+EXPORT_FETCH_ROWS = int(os.getenv("RECORDS_EXPORT_FETCH_ROWS", "10000"))
+# Rows per Arrow record batch / Parquet row group
+EXPORT_BATCH_ROWS = int(os.getenv("RECORDS_EXPORT_BATCH_ROWS", "65536"))
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+# Content encodings in order of preference
+CONTENT_ENCODINGS = ("zstd", "gzip")
+
+RECORD_FIELDS = ("id", "date", "type", "category", "amount", "currency", "source_document")
+_COLUMNS = (FinancialRecord.id, FinancialRecord.date, FinancialRecord.record_type, FinancialRecord.category,
+            FinancialRecord.amount, FinancialRecord.currency, FinancialRecord.source_document)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _optional_module(name: str):
+    try:
+        return __import__(name)
+    except ImportError:
+        return None
+
+
+def available_formats() -> list:
+    return ["ndjson"] + (["arrow", "parquet"] if _optional_module("pyarrow") else [])
+
+
+def available_encodings() -> list:
+    return [e for e in CONTENT_ENCODINGS if e != "zstd" or _optional_module("zstandard")]
+
+
+def negotiate_encoding(accept_encoding: str):
+    """Preferred content encoding the client accepts (Accept-Encoding header), or None for identity"""
+    accepted = set()
+    for token in (accept_encoding or "").split(","):
+        name, _, params = token.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    for encoding in available_encodings():
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+def encode_cursor(record_date, record_id: int) -> str:
+    key = {"d": record_date.isoformat() if record_date is not None else None, "i": record_id}
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """(date or None for the undated segment, id)"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        record_date = datetime.fromisoformat(key["d"]) if key["d"] is not None else None
+        return record_date, int(key["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def _filtered(company_id: int, record_type: str = None, category: str = None, date_from: date = None,
+              date_to: date = None):
+    query = select(*_COLUMNS).where(FinancialRecord.company_id == company_id)
+    if record_type is not None:
+        query = query.where(FinancialRecord.record_type == record_type)
+    if category is not None:
+        query = query.where(FinancialRecord.category == category)
+    if date_from is not None:
+        query = query.where(FinancialRecord.date >= datetime.combine(date_from, time.min))
+    if date_to is not None:
+        # Inclusive of the whole last day
+        query = query.where(FinancialRecord.date < datetime.combine(date_to + timedelta(days=1), time.min))
+    return query
+
+
+def _segments(query, date_filtered: bool, after=None) -> list:
+    """
+    The dated rows in (date, id) order, then the undated rows in id order, each starting after
+    the cursor key. Two plain range scans of (company_id, date, id) instead of one NULLS LAST sort.
+    """
+    after_date, after_id = after if after is not None else (None, None)
+    segments = []
+    if after is None or after_date is not None:
+        dated = query.where(FinancialRecord.date.isnot(None))
+        if after is not None:
+            dated = dated.where(tuple_(FinancialRecord.date, FinancialRecord.id) >
+                                tuple_(literal(after_date, DateTime), literal(after_id, Integer)))
+        segments.append(dated.order_by(FinancialRecord.date, FinancialRecord.id))
+    if not date_filtered:
+        # A date range never matches undated records
+        undated = query.where(FinancialRecord.date.is_(None))
+        if after is not None and after_date is None:
+            undated = undated.where(FinancialRecord.id > after_id)
+        segments.append(undated.order_by(FinancialRecord.id))
+    return segments
+
+
+def _record(row) -> dict:
+    return {
+        "id": row[0],
+        "date": row[1].isoformat() if row[1] is not None else None,
+        "type": row[2],
+        "category": row[3],
+        "amount": row[4],
+        "currency": row[5],
+        "source_document": row[6],
+    }
+
+
+def get_records_page(db: Session, company_id: int, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None,
+                     record_type: str = None, category: str = None, date_from: date = None,
+                     date_to: date = None) -> dict:
+    """
+    One page of a company's records in (date, id) order.
+
+    Args:
+        limit: Rows per page (1..MAX_PAGE_SIZE)
+        cursor: next_cursor of the previous page
+
+    Returns:
+        Dict with records, next_cursor (None on the last page) and limit
+
+    Raises:
+        InvalidCursor: if the cursor cannot be decoded
+    """
+    after = decode_cursor(cursor) if cursor else None
+    query = _filtered(company_id, record_type, category, date_from, date_to)
+
+    rows = []
+    # One row past the page tells whether another page exists
+    for segment in _segments(query, date_from is not None or date_to is not None, after):
+        rows += db.execute(segment.limit(limit + 1 - len(rows))).all()
+        if len(rows) > limit:
+            break
+
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1][1], page[-1][0]) if len(rows) > limit else None
+    return {"records": [_record(row) for row in page], "next_cursor": next_cursor, "limit": limit}
+
+
+class _BufferSink:
+    """Write-only file object collecting writer output until it is drained"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _rebatch(partitions, size: int):
+    """Regroup cursor partitions into lists of `size` rows (the last one may be shorter)"""
+    buffer = []
+    for partition in partitions:
+        buffer.extend(partition)
+        while len(buffer) >= size:
+            yield buffer[:size]
+            buffer = buffer[size:]
+    if buffer:
+        yield buffer
+
+
+def _write_ndjson(partitions):
+    for partition in partitions:
+        yield "".join(json.dumps(_record(row)) + "\n" for row in partition).encode("utf-8")
+
+
+def _arrow_schema(pa):
+    return pa.schema([
+        ("id", pa.int64()), ("date", pa.timestamp("us")), ("type", pa.string()), ("category", pa.string()),
+        ("amount", pa.float64()), ("currency", pa.string()), ("source_document", pa.string()),
+    ])
+
+
+def _arrow_batch(pa, schema, rows):
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+    )
+
+
+def _write_arrow(partitions):
+    import pyarrow as pa
+
+    schema = _arrow_schema(pa)
+    sink = _BufferSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for rows in _rebatch(partitions, EXPORT_BATCH_ROWS):
+            writer.write_batch(_arrow_batch(pa, schema, rows))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _write_parquet(partitions):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa)
+    sink = _BufferSink()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for rows in _rebatch(partitions, EXPORT_BATCH_ROWS):
+            writer.write_batch(_arrow_batch(pa, schema, rows))
+            yield sink.drain()
+    yield sink.drain()
+
+
+_WRITERS = {"ndjson": _write_ndjson, "arrow": _write_arrow, "parquet": _write_parquet}
+
+
+def _encoder(encoding: str):
+    if encoding == "gzip":
+        return zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    if encoding == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    return None
+
+
+def iter_records_export(company_id: int, fmt: str = "ndjson", encoding: str = None, record_type: str = None,
+                        category: str = None, date_from: date = None, date_to: date = None):
+    """
+    Body chunks of a full ledger export, read through a server-side cursor.
+    A plain generator: Starlette runs it in its threadpool, with its own session
+    that lives exactly as long as the stream.
+
+    Args:
+        fmt: "ndjson", "arrow" or "parquet"
+        encoding: Content encoding from negotiate_encoding ("zstd", "gzip" or None)
+    """
+    encoder = _encoder(encoding)
+    query = _filtered(company_id, record_type, category, date_from, date_to)
+    db = SessionLocal()
+    try:
+        def partitions():
+            for segment in _segments(query, date_from is not None or date_to is not None):
+                result = db.execute(segment.execution_options(stream_results=True, yield_per=EXPORT_FETCH_ROWS))
+                yield from result.partitions()
+
+        for chunk in _WRITERS[fmt](partitions()):
+            data = encoder.compress(chunk) if encoder is not None else chunk
+            if data:
+                yield data
+        if encoder is not None:
+            yield encoder.flush()
+    finally:
+        db.close()
@@ -0,0 +1,195 @@
+"""
+Portfolio PDF export.
+
+ReportLab layout is CPU-bound and holds the GIL, so batch renders run in a
+ProcessPoolExecutor whose workers register fonts and build styles once when
+they start. Reports already in the report store are reused, and new renders
+are added to it. The ZIP is written incrementally: each PDF is sent to the
+client as soon as it is ready, so the archive is never held in memory.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import Assessment, Company
+from aggregation import get_financial_summaries
+from assessment_cache import assessment_payload
+from summary import get_data_versions
+from report_generator import render_report_bytes, warm_report_worker
+from report_store import cached_report_path, report_fields, report_key, store_report
+from instrumentation import span
+
+REPORT_EXPORT_WORKERS = int(os.getenv("REPORT_EXPORT_WORKERS", str(os.cpu_count() or 1)))
+# Companies loaded per grouped query; also bounds the PDFs in flight
+EXPORT_CHUNK_SIZE = int(os.getenv("REPORT_EXPORT_CHUNK_SIZE", "200"))
+
+_pool = None
+
+
+def get_export_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: workers must not inherit the parent's database connections, threads or event loop
+        _pool = ProcessPoolExecutor(
+            max_workers=REPORT_EXPORT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=warm_report_worker,
+        )
+    return _pool
+
+
+def shutdown_export_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+class _ZipSink:
+    """Write-only file object collecting zipfile output until it is drained"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def load_export_items(db: Session, company_ids: list, language: str) -> tuple:
+    """
+    Everything needed to render (or reuse) the latest report of each company.
+
+    Returns:
+        (items, skipped): list of dicts per exportable company, and company_id -> reason for the rest
+    """
+    names = dict(db.query(Company.id, Company.name).filter(Company.id.in_(company_ids)).all())
+    latest_ids = db.query(func.max(Assessment.id)).filter(
+        Assessment.company_id.in_(list(names))
+    ).group_by(Assessment.company_id)
+    assessments = {a.company_id: a for a in db.query(Assessment).filter(Assessment.id.in_(latest_ids))}
+    summaries = get_financial_summaries(db, list(assessments))
+    versions = get_data_versions(db, list(assessments))
+
+    items, skipped = [], {}
+    for company_id in company_ids:
+        if company_id not in names:
+            skipped[company_id] = "Company not found"
+            continue
+        assessment = assessments.get(company_id)
+        if assessment is None:
+            skipped[company_id] = "No assessment found"
+            continue
+        payload = assessment_payload(assessment, language)
+        if payload is None:
+            skipped[company_id] = f"No assessment in language '{language}'"
+            continue
+        key = report_key(assessment.id, language, versions[company_id])
+        items.append({
+            "company_id": company_id,
+            "company": names[company_id],
+            "key": key,
+            "cached_path": cached_report_path(key),
+            "assessment": report_fields(payload),
+            "summary": summaries[company_id],
+        })
+    return items, skipped
+
+
+def _load_chunk(company_ids: list, language: str) -> tuple:
+    db = SessionLocal()
+    try:
+        return load_export_items(db, company_ids, language)
+    finally:
+        db.close()
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _entry_name(item: dict, language: str) -> str:
+    safe_name = re.sub(r"[^\w.-]+", "_", item["company"]).strip("_") or "company"
+    return f"{item['company_id']}_{safe_name}_{language}.pdf"
+
+
+async def _produce(item: dict, language: str) -> tuple:
+    """(item, pdf bytes, error) for one company"""
+    try:
+        if item["cached_path"] is not None:
+            try:
+                return item, await asyncio.to_thread(_read_file, item["cached_path"]), None
+            except FileNotFoundError:
+                pass  # pruned since it was looked up: render it again
+        loop = asyncio.get_running_loop()
+        with span("pdf_render", language=language):
+            pdf = await loop.run_in_executor(
+                get_export_pool(), render_report_bytes, item["company"], item["assessment"], item["summary"], language
+            )
+        await asyncio.to_thread(store_report, item["key"], pdf)
+        return item, pdf, None
+    except BrokenProcessPool as e:
+        # A worker died; start a fresh pool for the next renders
+        shutdown_export_pool()
+        return item, None, str(e)
+    except Exception as e:
+        return item, None, str(e)
+
+
+async def export_reports_zip(company_ids: list, language: str = "en"):
+    """
+    Stream a ZIP with the latest report of each company, in completion order.
+    A manifest.json at the end lists the companies that were skipped or failed.
+
+    Yields:
+        Chunks of the ZIP archive
+    """
+    sink = _ZipSink()
+    # PDFs are already compressed; storing them keeps the event loop's share of the work tiny
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED)
+    unique_ids = list(dict.fromkeys(company_ids))
+    exported, skipped = 0, {}
+
+    for start in range(0, len(unique_ids), EXPORT_CHUNK_SIZE):
+        items, missing = await asyncio.to_thread(_load_chunk, unique_ids[start:start + EXPORT_CHUNK_SIZE], language)
+        skipped.update(missing)
+
+        tasks = [asyncio.create_task(_produce(item, language)) for item in items]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item, pdf, error = await next_done
+                if error is not None:
+                    skipped[item["company_id"]] = f"Render failed: {error}"
+                    continue
+                archive.writestr(_entry_name(item, language), pdf)
+                exported += 1
+                yield sink.drain()
+        finally:
+            # Client went away mid-stream: drop the renders still queued
+            for task in tasks:
+                task.cancel()
+
+    archive.writestr("manifest.json", json.dumps({
+        "language": language,
+        "exported": exported,
+        "skipped": [{"company_id": company_id, "reason": reason} for company_id, reason in skipped.items()],
+    }, indent=2))
+    archive.close()
+    yield sink.drain()
@@ -0,0 +1,123 @@
+"""
+Font registry for PDF reports.
+
+Noto families are registered with ReportLab once per process (at startup, or
+on first use) instead of per report. ReportLab embeds TrueType fonts as
+subsets, so each PDF carries only the glyphs it actually uses. Hindi and Tamil
+reports turn on complex-script shaping (Devanagari conjuncts, Tamil vowel
+signs) in every paragraph and table style; ReportLab applies it when the
+optional uharfbuzz package is installed.
+
+Fonts are looked up in REPORT_FONT_DIR (default backend/fonts) and then in the
+usual system Noto directories. backend/fonts ships Noto Sans, Noto Sans
+Devanagari and Noto Serif Tamil (OFL, see fonts/OFL.txt); an installed Noto
+Sans Tamil or a Bold face is preferred when present. A script whose font is
+missing falls back to Noto Sans, then to Helvetica.
+
+The Devanagari and Tamil faces carry digits, punctuation and the rupee sign
+but no Latin letters, so report_generator sets Latin runs (company names,
+English terms) in the Latin face.
+"""
+
+import os
+import threading
+from reportlab.lib.fonts import addMapping
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont, TTFError
+
+REPORT_FONT_DIR = os.getenv("REPORT_FONT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts"))
+SYSTEM_FONT_DIRS = [
+    "/usr/share/fonts/truetype/noto",
+    "/usr/share/fonts/opentype/noto",
+    "/usr/share/fonts/noto",
+]
+
+# Script -> candidate (family name, regular file, bold file), the first one found wins
+SCRIPT_FONTS = {
+    "latin": [("NotoSans", "NotoSans-Regular.ttf", "NotoSans-Bold.ttf")],
+    "devanagari": [("NotoSansDevanagari", "NotoSansDevanagari-Regular.ttf", "NotoSansDevanagari-Bold.ttf")],
+    "tamil": [
+        ("NotoSansTamil", "NotoSansTamil-Regular.ttf", "NotoSansTamil-Bold.ttf"),
+        ("NotoSerifTamil", "NotoSerifTamil-Regular.ttf", "NotoSerifTamil-Bold.ttf"),
+    ],
+}
+LANGUAGE_SCRIPTS = {"en": "latin", "hi": "devanagari", "ta": "tamil"}
+# Scripts whose glyphs need OpenType shaping (conjuncts, reordered vowel signs) to render correctly
+SHAPED_SCRIPTS = ("devanagari", "tamil")
+FALLBACK_FONTS = ("Helvetica", "Helvetica-Bold")
+
+_registered = None
+_lock = threading.Lock()
+
+
+def _find_font(filename: str):
+    for directory in [REPORT_FONT_DIR] + SYSTEM_FONT_DIRS:
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _register_family(family: str, regular_file: str, bold_file: str):
+    """Register one family; returns (regular, bold) font names or None if the regular face is missing"""
+    regular_path = _find_font(regular_file)
+    if regular_path is None:
+        return None
+    try:
+        pdfmetrics.registerFont(TTFont(family, regular_path))
+        bold = family
+        bold_path = _find_font(bold_file)
+        if bold_path is not None:
+            bold = f"{family}-Bold"
+            pdfmetrics.registerFont(TTFont(bold, bold_path))
+    except TTFError as e:
+        print(f"⚠️ Could not load font {family}: {e}")
+        return None
+    # Lets <b> markup inside Paragraphs switch to the bold face
+    addMapping(family, 0, 0, family)
+    addMapping(family, 1, 0, bold)
+    addMapping(family, 0, 1, family)
+    addMapping(family, 1, 1, bold)
+    return family, bold
+
+
+def register_fonts() -> dict:
+    """
+    Register every available script family (idempotent, thread-safe).
+
+    Returns:
+        Dict of script -> (regular, bold) font names that were found
+    """
+    global _registered
+    if _registered is not None:
+        return _registered
+    with _lock:
+        if _registered is None:
+            registered = {}
+            for script, candidates in SCRIPT_FONTS.items():
+                for family, regular_file, bold_file in candidates:
+                    fonts = _register_family(family, regular_file, bold_file)
+                    if fonts is not None:
+                        registered[script] = fonts
+                        break
+                else:
+                    print(f"⚠️ No {script} font found ({candidates[0][1]}); reports in that script fall back")
+            _registered = registered
+    return _registered
+
+
+def fonts_for_language(language: str) -> tuple:
+    """(regular, bold) font names to render a report in `language`"""
+    registered = register_fonts()
+    script = LANGUAGE_SCRIPTS.get(language, "latin")
+    return registered.get(script) or registered.get("latin") or FALLBACK_FONTS
+
+
+def latin_fonts() -> tuple:
+    """(regular, bold) font names for Latin text inside reports in any language"""
+    return fonts_for_language("en")
+
+
+def needs_shaping(language: str) -> bool:
+    """Whether report text in `language` must be shaped (takes effect when uharfbuzz is installed)"""
+    return LANGUAGE_SCRIPTS.get(language, "latin") in SHAPED_SCRIPTS
@@ -4,58 +4,117 @@ from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib import colors
 from io import BytesIO
+import re
 from datetime import datetime
+from functools import lru_cache
+from report_fonts import fonts_for_language, latin_fonts, needs_shaping
+from translations import get_text
 
-def generate_pdf_report(company_name: str, assessment: dict, financial_summary: dict) -> BytesIO:
-    """
-    Generate a PDF financial health report
-    
-    Args:
-        company_name: Name of the company
-        assessment: AI assessment dict with score, risk_level, narrative, recommendations
-        financial_summary: Dict with total_revenue, total_expense, net_income
-    
-    Returns:
-        BytesIO object containing the PDF
-    """
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    story = []
+# Bump whenever the layout changes so cached renders (see report_store) stop matching
+REPORT_TEMPLATE_VERSION = 4
+
+# Letters the Devanagari and Tamil faces lack, with the spaces and punctuation joining them
+_LATIN_RUN = re.compile(r"[A-Za-z$@]+(?:[\s'.,/-]+[A-Za-z$@]+)*")
+# Markup tags and entities are left alone; group 2 is a Latin run
+_MARKUP_OR_LATIN = re.compile(r"(<[^>]*>|&#?\w+;)|(" + _LATIN_RUN.pattern + ")")
+
+
+@lru_cache(maxsize=None)
+def _report_styles(language: str = "en"):
+    """Paragraph styles for reports in a language (built once per process and language)"""
+    regular, bold = fonts_for_language(language)
+    # ReportLab only shapes text whose style asks for it (its default is shaping=0)
+    shaping = 1 if needs_shaping(language) else 0
     styles = getSampleStyleSheet()
+    body_style = ParagraphStyle('Body', parent=styles['Normal'], fontName=regular, shaping=shaping)
     
     # Custom styles
     title_style = ParagraphStyle(
         'CustomTitle',
         parent=styles['Heading1'],
+        fontName=bold,
         fontSize=24,
+        leading=32,
         textColor=colors.HexColor('#1a5490'),
         spaceAfter=30,
+        shaping=shaping,
     )
     
     heading_style = ParagraphStyle(
         'CustomHeading',
         parent=styles['Heading2'],
+        fontName=bold,
         fontSize=16,
+        leading=22,
         textColor=colors.HexColor('#2c5aa0'),
         spaceAfter=12,
+        shaping=shaping,
     )
+    # Script faces have no Latin letters: Latin runs switch to the Latin face
+    latin = latin_fonts() if (regular, bold) != latin_fonts() else None
+    return body_style, title_style, heading_style, regular, bold, latin, shaping
+
+
+def _latin_markup(text: str, latin) -> str:
+    """Paragraph text with its Latin runs set in the Latin face (unchanged when latin is None)"""
+    if latin is None:
+        return text
+    return _MARKUP_OR_LATIN.sub(
+        lambda m: m.group(0) if m.group(1) else f'<font name="{latin[0]}">{m.group(2)}</font>', text
+    )
+
+
+def _latin_cells(rows: list, latin, bold_rows: tuple) -> list:
+    """FONTNAME commands that set all-Latin table cells (e.g. an English risk level) in the Latin face"""
+    if latin is None:
+        return []
+    commands = []
+    for r, row in enumerate(rows):
+        for c, value in enumerate(row):
+            value = str(value)
+            if value.isascii() and _LATIN_RUN.search(value):
+                commands.append(('FONTNAME', (c, r), (c, r), latin[1] if r in bold_rows else latin[0]))
+    return commands
+
+
+def generate_pdf_report(company_name: str, assessment: dict, financial_summary: dict, language: str = "en") -> BytesIO:
+    """
+    Generate a PDF financial health report
+    
+    Args:
+        company_name: Name of the company
+        assessment: AI assessment dict with score, risk_level, narrative, recommendations
+        financial_summary: Dict with total_revenue, total_expense, net_income
+        language: Language code ('en', 'hi', 'ta') for labels and fonts
+    
+    Returns:
+        BytesIO object containing the PDF
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    story = []
+    body_style, title_style, heading_style, regular, bold, latin, shaping = _report_styles(language)
+
+    def t(key):
+        return get_text(key, language)
     
     # Title
-    story.append(Paragraph("Financial Health Assessment Report", title_style))
+    story.append(Paragraph(t("report_title"), title_style))
     story.append(Spacer(1, 0.2*inch))
     
     # Company Info
-    story.append(Paragraph(f"<b>Company:</b> {company_name}", styles['Normal']))
-    story.append(Paragraph(f"<b>Generated:</b> {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", styles['Normal']))
+    story.append(Paragraph(f"<b>{t('report_company')}:</b> {_latin_markup(company_name, latin)}", body_style))
+    generated = datetime.now().strftime('%B %d, %Y at %I:%M %p' if language == "en" else '%d-%m-%Y %H:%M')
+    story.append(Paragraph(f"<b>{t('report_generated')}:</b> {generated}", body_style))
     story.append(Spacer(1, 0.3*inch))
     
     # Financial Summary Table
-    story.append(Paragraph("Financial Summary", heading_style))
+    story.append(Paragraph(t("report_summary"), heading_style))
     summary_data = [
-        ['Metric', 'Amount (INR)'],
-        ['Total Revenue', f"₹{financial_summary.get('total_revenue', 0):,.2f}"],
-        ['Total Expenses', f"₹{financial_summary.get('total_expense', 0):,.2f}"],
-        ['Net Income', f"₹{financial_summary.get('net_income', 0):,.2f}"],
+        [t('report_metric'), t('report_amount')],
+        [t('report_total_revenue'), f"₹{financial_summary.get('total_revenue', 0):,.2f}"],
+        [t('report_total_expense'), f"₹{financial_summary.get('total_expense', 0):,.2f}"],
+        [t('report_net_income'), f"₹{financial_summary.get('net_income', 0):,.2f}"],
     ]
     
     summary_table = Table(summary_data, colWidths=[3*inch, 2*inch])
@@ -63,22 +122,25 @@ def generate_pdf_report(company_name: str, assessment: dict, financial_summary:
         ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c5aa0')),
         ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
         ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 0), (-1, -1), regular),
+        ('FONTNAME', (0, 0), (-1, 0), bold),
         ('FONTSIZE', (0, 0), (-1, 0), 12),
         ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
         ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
         ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('SHAPING', (0, 0), (-1, -1), shaping),
+        *_latin_cells(summary_data, latin, bold_rows=(0,)),
     ]))
     story.append(summary_table)
     story.append(Spacer(1, 0.3*inch))
     
     # Health Score
-    story.append(Paragraph("Health Score & Risk Assessment", heading_style))
+    story.append(Paragraph(t("report_score_section"), heading_style))
     score = assessment.get('score', 'N/A')
     risk = assessment.get('risk_level', 'Unknown')
     
     score_data = [
-        ['Financial Health Score', 'Risk Level'],
+        [t('score_label'), t('risk_label')],
         [f"{score}/100", risk],
     ]
     
@@ -87,34 +149,48 @@ def generate_pdf_report(company_name: str, assessment: dict, financial_summary:
         ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c5aa0')),
         ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
         ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 0), (-1, -1), regular),
+        ('FONTNAME', (0, 0), (-1, 0), bold),
         ('FONTSIZE', (0, 1), (-1, -1), 18),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), bold),
         ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
         ('BACKGROUND', (0, 1), (-1, -1), colors.lightgreen if risk == 'Low' else colors.lightyellow if risk == 'Medium' else colors.lightcoral),
         ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('SHAPING', (0, 0), (-1, -1), shaping),
+        *_latin_cells(score_data, latin, bold_rows=(0, 1)),
     ]))
     story.append(score_table)
     story.append(Spacer(1, 0.3*inch))
     
     # Assessment Narrative
-    story.append(Paragraph("Detailed Assessment", heading_style))
+    story.append(Paragraph(t("report_assessment"), heading_style))
     narrative = assessment.get('narrative', 'No assessment available')
-    story.append(Paragraph(narrative, styles['Normal']))
+    story.append(Paragraph(_latin_markup(narrative, latin), body_style))
     story.append(Spacer(1, 0.3*inch))
     
     # Recommendations
-    story.append(Paragraph("Recommendations", heading_style))
+    story.append(Paragraph(t("recommendations_label"), heading_style))
     recommendations = assessment.get('recommendations', [])
     if recommendations:
         for i, rec in enumerate(recommendations, 1):
             rec_text = rec if isinstance(rec, str) else rec.get('title', str(rec))
-            story.append(Paragraph(f"{i}. {rec_text}", styles['Normal']))
+            story.append(Paragraph(f"{i}. {_latin_markup(rec_text, latin)}", body_style))
             story.append(Spacer(1, 0.1*inch))
     else:
-        story.append(Paragraph("No specific recommendations available.", styles['Normal']))
+        story.append(Paragraph(t("report_no_recommendations"), body_style))
     
     # Build PDF
     doc.build(story)
     buffer.seek(0)
     return buffer
+
+
+def warm_report_worker(languages=("en", "hi", "ta")) -> None:
+    """Process-pool initializer: register fonts and build styles before the first job arrives"""
+    for language in languages:
+        _report_styles(language)
+
+
+def render_report_bytes(company_name: str, assessment: dict, financial_summary: dict, language: str = "en") -> bytes:
+    """generate_pdf_report as bytes (picklable result for process-pool workers)"""
+    return generate_pdf_report(company_name, assessment, financial_summary, language).getvalue()
@@ -0,0 +1,136 @@
+"""
+Rendered PDF report store.
+
+Reports are rendered once per (assessment, language, template version, data
+version) and kept as files under REPORT_CACHE_DIR, so repeat downloads are
+served straight from disk. Saving an assessment schedules a background
+pre-render, which usually means the first download is already a cache hit.
+"""
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import Assessment, Company
+from assessment_cache import assessment_payload
+from aggregation import get_financial_summary
+from summary import get_data_version
+from report_generator import REPORT_TEMPLATE_VERSION, generate_pdf_report
+from instrumentation import span
+
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "report_cache"))
+REPORT_CACHE_MAX_FILES = int(os.getenv("REPORT_CACHE_MAX_FILES", "2000"))
+
+# Rendering is CPU-bound ReportLab work; one background thread keeps it off the request path
+_prerender_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report-prerender")
+
+
+def report_key(assessment_id: int, language: str, data_version: str) -> str:
+    """Cache key of a rendered report; also used as its ETag"""
+    return f"{assessment_id}-{language}-t{REPORT_TEMPLATE_VERSION}-{data_version}"
+
+
+def _report_path(key: str) -> str:
+    return os.path.join(REPORT_CACHE_DIR, f"{key}.pdf")
+
+
+def _prune(max_files: int = REPORT_CACHE_MAX_FILES) -> None:
+    """Drop the least recently written reports beyond max_files"""
+    try:
+        entries = [e for e in os.scandir(REPORT_CACHE_DIR) if e.name.endswith(".pdf")]
+    except FileNotFoundError:
+        return
+    if len(entries) <= max_files:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    for entry in entries[:len(entries) - max_files]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def store_report(key: str, pdf) -> str:
+    """Write a rendered report (bytes or buffer) into the store; returns its path"""
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+    path = _report_path(key)
+    # Write to a temp file and rename, so readers never see a partial PDF
+    fd, tmp_path = tempfile.mkstemp(dir=REPORT_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    _prune()
+    return path
+
+
+def cached_report_path(key: str):
+    """Path of an already rendered report, or None"""
+    path = _report_path(key)
+    return path if os.path.exists(path) else None
+
+
+def report_fields(payload: dict) -> dict:
+    """The assessment fields a report shows"""
+    return {
+        "score": payload["score"],
+        "risk_level": payload["risk_level"],
+        "narrative": payload["narrative"],
+        "recommendations": payload["recommendations"]
+    }
+
+
+def get_report(db: Session, assessment: Assessment, language: str = None) -> tuple:
+    """
+    Path of the rendered report for an assessment, rendering it on a miss.
+
+    Args:
+        assessment: Stored assessment
+        language: Language of the assessment text (default: the assessment's own)
+
+    Returns:
+        (path, key), or None when the assessment has no text in that language
+    """
+    language = language or assessment.language or "en"
+    payload = assessment_payload(assessment, language)
+    if payload is None:
+        return None
+
+    key = report_key(assessment.id, language, get_data_version(db, assessment.company_id))
+    path = cached_report_path(key)
+    if path is None:
+        company = db.query(Company).filter(Company.id == assessment.company_id).first()
+        summary = get_financial_summary(db, assessment.company_id)
+        with span("pdf_render", language=language):
+            pdf_buffer = generate_pdf_report(company.name, report_fields(payload), summary, language)
+        path = store_report(key, pdf_buffer.getbuffer())
+    return path, key
+
+
+def _prerender(assessment_id: int) -> None:
+    db = SessionLocal()
+    try:
+        assessment = db.query(Assessment).filter(Assessment.id == assessment_id).first()
+        if assessment is None:
+            return
+        languages = list(dict.fromkeys([assessment.language or "en", *(assessment.translations or {})]))
+        for language in languages:
+            get_report(db, assessment, language)
+    except Exception as e:
+        print(f"Report pre-render failed for assessment {assessment_id}: {e}")
+    finally:
+        db.close()
+
+
+def schedule_prerender(assessment_id: int) -> None:
+    """Render the reports of a freshly saved assessment in the background"""
+    _prerender_executor.submit(_prerender, assessment_id)
+
+
+def clear_report_cache() -> None:
+    shutil.rmtree(REPORT_CACHE_DIR, ignore_errors=True)
@@ -3,23 +3,26 @@ Database Reset: Drop and recreate all tables
 WARNING: This will delete all existing data!
 """
 
-from database import Base, engine
-from models import Company, FinancialRecord, Assessment
+from migrations import reset_schema
+from assessment_cache import clear_assessment_cache
+from jobs import clear_job_queue
+from report_store import clear_report_cache
 
 print("WARNING: This will delete all existing data!")
-print("Dropping all tables...")
+print("Dropping all tables and re-running migrations...")
 
-# Drop all tables
-Base.metadata.drop_all(bind=engine)
-print("All tables dropped")
-
-print("Creating tables with new schema...")
-
-# Recreate all tables with updated schema
-Base.metadata.create_all(bind=engine)
+# Drop all tables (and the migration history), then migrate from scratch
+reset_schema()
 print("Tables created successfully!")
+# Shared with the API workers: cached assessments and queued jobs of the old data must go too
+clear_assessment_cache()
+dropped = clear_job_queue()
+clear_report_cache()
+print(f"Cleared the assessment and report caches and {dropped} queued analysis jobs")
 print("\nNew schema includes:")
 print("  - companies table with file_hash column")
-print("  - financial_records table")
-print("  - assessments table")
+print("  - financial_records table with row_fingerprint column and (company_id, record_type), (company_id, date, id) and (company_id, row_fingerprint) indexes")
+print("  - assessments table with language, translations and cache_key columns")
+print("  - company_financial_summary table")
+print("  - analysis_jobs table")
 print("\nDatabase is ready to use!")
@@ -0,0 +1,230 @@
+"""
+Ledger retention: moves financial_records dated before the last
+LEDGER_RETENTION_MONTHS whole months into financial_records_archive.
+
+The live table then holds only the recent window that uploads, /records and
+the analysis queries scan, so their cost follows that window rather than the
+company's whole history. The archive keeps every row, and re-uploads of
+archived rows are still recognized as duplicates. The summary rollups are left
+as they are, so totals, data versions and cached assessments keep covering the
+full history. Undated records are never archived.
+
+Rows move per company in batches of LEDGER_ARCHIVE_BATCH, one transaction
+each, so a run can stop at any point and the next one picks up where it left
+off. With month partitioning (migrations.py) expired months are copied and
+dropped whole instead of deleted row by row.
+
+Runs in the API process every LEDGER_RETENTION_INTERVAL_HOURS when
+LEDGER_RETENTION_MONTHS is set, or from cron:
+    python retention.py --months 24 [--dry-run]
+"""
+
+import argparse
+import asyncio
+import os
+import uuid
+from datetime import date, datetime, time
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.orm import Session
+from database import SessionLocal, engine
+from models import Company, FinancialRecord, FinancialRecordArchive
+from migrations import LEDGER_TABLE, add_months, ensure_month_partitions, ledger_partitioning, month_partitions
+from instrumentation import add_count, span, trace_context
+from shared_state import get_shared_state
+
+# 0 keeps every record in the live table
+LEDGER_RETENTION_MONTHS = int(os.getenv("LEDGER_RETENTION_MONTHS", "0"))
+LEDGER_RETENTION_INTERVAL_HOURS = float(os.getenv("LEDGER_RETENTION_INTERVAL_HOURS", "24"))
+LEDGER_ARCHIVE_BATCH = int(os.getenv("LEDGER_ARCHIVE_BATCH", "5000"))
+
+ARCHIVED_COLUMNS = ("id", "company_id", "record_type", "category", "amount", "currency", "date",
+                    "source_document", "row_fingerprint")
+# Arbitrary key for the pg_try_advisory_lock that keeps concurrent runs (one per worker) apart
+RETENTION_LOCK_KEY = 72510232
+# Other databases use a lease in the shared state store instead, expiring in case its holder dies
+RETENTION_LEASE_KEY = "lock:retention"
+RETENTION_LEASE_SECONDS = 3600
+
+_task = None
+
+
+def retention_cutoff(months: int, today: date = None) -> datetime:
+    """Start of the oldest month kept: records dated before it are archived"""
+    this_month = (today or date.today()).replace(day=1)
+    return datetime.combine(add_months(this_month, -months), time.min)
+
+
+def _archive_batch(db: Session, company_id: int, cutoff: datetime, batch_size: int) -> int:
+    ids = db.execute(
+        select(FinancialRecord.id).where(
+            FinancialRecord.company_id == company_id,
+            FinancialRecord.date < cutoff
+        ).order_by(FinancialRecord.date, FinancialRecord.id).limit(batch_size)
+    ).scalars().all()
+    if not ids:
+        return 0
+    # company_id in every statement lets PostgreSQL prune hash partitions
+    db.execute(insert(FinancialRecordArchive).from_select(
+        ARCHIVED_COLUMNS,
+        select(*[getattr(FinancialRecord, c) for c in ARCHIVED_COLUMNS]).where(
+            FinancialRecord.company_id == company_id, FinancialRecord.id.in_(ids)
+        )
+    ))
+    db.execute(
+        delete(FinancialRecord).where(FinancialRecord.company_id == company_id, FinancialRecord.id.in_(ids)),
+        execution_options={"synchronize_session": False}
+    )
+    return len(ids)
+
+
+def _archive_expired_partitions(db: Session, cutoff: datetime) -> list:
+    """Copy month partitions that end before the cutoff into the archive and drop them"""
+    columns = ", ".join(f'"{c}"' for c in ARCHIVED_COLUMNS)
+    archived = []
+    for name, month in month_partitions(db.connection()):
+        if add_months(month, 1) > cutoff.date():
+            break
+        rows = db.execute(text(
+            f"INSERT INTO {FinancialRecordArchive.__tablename__} ({columns}) SELECT {columns} FROM {name}"
+        )).rowcount
+        db.execute(text(f"ALTER TABLE {LEDGER_TABLE} DETACH PARTITION {name}"))
+        db.execute(text(f"DROP TABLE {name}"))
+        db.commit()
+        archived.append((name, rows))
+    return archived
+
+
+class _Lease:
+    """Retention lease in the shared state store, held until close()"""
+
+    def close(self) -> None:
+        get_shared_state().delete_prefix(RETENTION_LEASE_KEY)
+
+
+def _try_lease():
+    owner = uuid.uuid4().hex
+    holder = get_shared_state().update(
+        RETENTION_LEASE_KEY, lambda current: (current or owner,) * 2, RETENTION_LEASE_SECONDS
+    )
+    return (_Lease(), True) if holder == owner else (None, False)
+
+
+def _try_lock():
+    """An object to close() to release the retention lock, or None while another process runs the job"""
+    if engine.dialect.name != "postgresql":
+        return _try_lease()
+    conn = engine.connect()
+    if conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": RETENTION_LOCK_KEY}).scalar():
+        return conn, True
+    conn.close()
+    return None, False
+
+
+def archive_expired_records(months: int = LEDGER_RETENTION_MONTHS, batch_size: int = LEDGER_ARCHIVE_BATCH,
+                            dry_run: bool = False) -> dict:
+    """
+    Move every company's records older than the retention window into the archive.
+
+    Args:
+        months: Whole months kept in the live table besides the current one
+        dry_run: Only count the records that would move
+
+    Returns:
+        Dict with the cutoff, per-company and total counts and the month partitions archived
+    """
+    cutoff = retention_cutoff(months)
+    result = {"cutoff": cutoff.isoformat(), "dry_run": dry_run, "archived_rows": 0, "partitions": [], "companies": {}}
+    lock, acquired = _try_lock()
+    if not acquired:
+        result["skipped"] = "another retention run holds the lock"
+        return result
+
+    db = SessionLocal()
+    try:
+        with trace_context("job:retention", cutoff=result["cutoff"], dry_run=dry_run):
+            month_partitioned = ledger_partitioning(db.connection()) == "month"
+            if month_partitioned and not dry_run:
+                with span("archive_partitions"):
+                    for name, rows in _archive_expired_partitions(db, cutoff):
+                        result["partitions"].append(name)
+                        result["archived_rows"] += rows
+
+            company_ids = db.execute(select(Company.id).order_by(Company.id)).scalars().all()
+            with span("archive_records", companies=len(company_ids)):
+                for company_id in company_ids:
+                    if dry_run:
+                        moved = db.execute(select(func.count(FinancialRecord.id)).where(
+                            FinancialRecord.company_id == company_id, FinancialRecord.date < cutoff
+                        )).scalar()
+                    else:
+                        moved = 0
+                        while True:
+                            batch = _archive_batch(db, company_id, cutoff, batch_size)
+                            db.commit()
+                            moved += batch
+                            if batch < batch_size:
+                                break
+                    if moved:
+                        result["companies"][company_id] = moved
+                        result["archived_rows"] += moved
+
+            if month_partitioned and not dry_run:
+                ensure_month_partitions(db.connection())
+                db.commit()
+            if not dry_run:
+                add_count("rows_archived", result["archived_rows"])
+        return result
+    finally:
+        db.close()
+        if lock is not None:
+            lock.close()  # ends the session (advisory lock) or deletes the lease
+
+
+async def _retention_loop(interval_hours: float) -> None:
+    while True:
+        try:
+            result = await asyncio.to_thread(archive_expired_records)
+            if result["archived_rows"]:
+                print(f"Retention: archived {result['archived_rows']} records dated before {result['cutoff']}")
+        except Exception as e:
+            print(f"Retention run failed: {e}")
+        await asyncio.sleep(interval_hours * 3600)
+
+
+def start_retention_task() -> None:
+    """Run the retention job now and then every LEDGER_RETENTION_INTERVAL_HOURS (no-op unless enabled)"""
+    global _task
+    if LEDGER_RETENTION_MONTHS > 0 and _task is None:
+        _task = asyncio.create_task(_retention_loop(LEDGER_RETENTION_INTERVAL_HOURS))
+
+
+async def stop_retention_task() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=int, default=LEDGER_RETENTION_MONTHS or None, required=not LEDGER_RETENTION_MONTHS,
+                        help="whole months kept in the live table (default: LEDGER_RETENTION_MONTHS)")
+    parser.add_argument("--batch-size", type=int, default=LEDGER_ARCHIVE_BATCH)
+    parser.add_argument("--dry-run", action="store_true", help="only count the records that would be archived")
+    args = parser.parse_args()
+
+    result = archive_expired_records(args.months, args.batch_size, args.dry_run)
+    if "skipped" in result:
+        print(f"Skipped: {result['skipped']}")
+        return
+    verb = "would archive" if args.dry_run else "archived"
+    for company_id, rows in result["companies"].items():
+        print(f"Company {company_id}: {verb} {rows} records")
+    for name in result["partitions"]:
+        print(f"Archived partition {name}")
+    print(f"\n{verb.capitalize()} {result['archived_rows']} records dated before {result['cutoff']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Deterministic rule-based financial health scoring.
+
+Scores are computed with NumPy over the aggregated ledger (monthly revenue and
+expense series plus expense totals per category), for one company or
+thousands at once. The result is available instantly, before the LLM
+narrative, and is the fallback score when OpenRouter cannot be reached.
+
+Components (each 0..1, higher is healthier):
+    coverage       revenue / expense ratio (0.8x -> 0, 1.5x or better -> 1)
+    margin_trend   least-squares slope of the monthly net margin
+    stability      1 - coefficient of variation of monthly revenue
+    diversification  1 - expense concentration (Herfindahl index over categories)
+    cash_flow      share of months with non-negative net cash flow
+"""
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+COMPONENTS = ("coverage", "margin_trend", "stability", "diversification", "cash_flow")
+WEIGHTS = np.array([0.35, 0.15, 0.15, 0.15, 0.20])
+
+LOW_RISK_MIN_SCORE = 70.0
+MEDIUM_RISK_MIN_SCORE = 45.0
+
+# Neutral value for components that cannot be judged from the available data
+NEUTRAL = 0.5
+
+
+def _safe_divide(numerator, denominator, default):
+    return np.divide(numerator, denominator, out=np.full(np.shape(numerator), default, dtype="float64"),
+                     where=denominator != 0)
+
+
+def score_arrays(revenue, expense, month_mask=None, category_expense=None) -> dict:
+    """
+    Vectorized scoring of many companies.
+
+    Args:
+        revenue: (companies, months) monthly revenue
+        expense: (companies, months) monthly expense
+        month_mask: (companies, months) bool, True where the month has data (default: all)
+        category_expense: optional (companies, categories) expense total per category
+
+    Returns:
+        Dict with "score" (float array, 0-100), "risk_level" (str array) and one array per component
+    """
+    revenue = np.atleast_2d(np.asarray(revenue, dtype="float64"))
+    expense = np.atleast_2d(np.asarray(expense, dtype="float64"))
+    mask = np.ones(revenue.shape, dtype=bool) if month_mask is None else np.atleast_2d(np.asarray(month_mask, dtype=bool))
+    companies, months = revenue.shape
+
+    rev = np.where(mask, revenue, 0.0)
+    exp = np.where(mask, expense, 0.0)
+    active = mask.sum(axis=1)
+    active_or_one = np.maximum(active, 1)
+
+    # Coverage: total revenue over total expense
+    total_rev = rev.sum(axis=1)
+    total_exp = exp.sum(axis=1)
+    ratio = _safe_divide(total_rev, total_exp, np.inf)
+    ratio = np.where((total_rev == 0) & (total_exp == 0), 1.0, ratio)
+    coverage = np.clip((ratio - 0.8) / 0.7, 0.0, 1.0)
+
+    # Margin trend: slope of (rev - exp) / rev over months with revenue; +/-5 points a month saturates
+    with_revenue = mask & (rev > 0)
+    margin = np.clip(_safe_divide(rev - exp, rev, 0.0), -1.0, 1.0)
+    t = np.broadcast_to(np.arange(months, dtype="float64"), rev.shape)
+    count = np.maximum(with_revenue.sum(axis=1), 1)
+    t_mean = (with_revenue * t).sum(axis=1) / count
+    m_mean = (with_revenue * margin).sum(axis=1) / count
+    t_dev = np.where(with_revenue, t - t_mean[:, None], 0.0)
+    covariance = (t_dev * (margin - m_mean[:, None])).sum(axis=1)
+    variance = (t_dev ** 2).sum(axis=1)
+    slope = _safe_divide(covariance, variance, 0.0)
+    margin_trend = np.where(with_revenue.sum(axis=1) >= 3, np.clip(0.5 + slope * 10.0, 0.0, 1.0), NEUTRAL)
+
+    # Stability: month-over-month revenue volatility
+    mean_rev = total_rev / active_or_one
+    var_rev = (np.where(mask, rev - mean_rev[:, None], 0.0) ** 2).sum(axis=1) / active_or_one
+    cv = _safe_divide(np.sqrt(var_rev), mean_rev, 1.0)
+    stability = np.where(active >= 2, np.clip(1.0 - cv, 0.0, 1.0), NEUTRAL)
+
+    # Diversification: Herfindahl index of expense categories (0.15 or less -> 1, 0.75 or more -> 0)
+    if category_expense is None:
+        diversification = np.full(companies, NEUTRAL)
+    else:
+        categories = np.clip(np.atleast_2d(np.asarray(category_expense, dtype="float64")), 0.0, None)
+        category_total = categories.sum(axis=1)
+        shares = categories / np.where(category_total > 0, category_total, 1.0)[:, None]
+        hhi = (shares ** 2).sum(axis=1)
+        diversification = np.where(category_total > 0, np.clip(1.0 - (hhi - 0.15) / 0.6, 0.0, 1.0), NEUTRAL)
+
+    # Cash flow: months with a negative net
+    negative_months = (mask & (rev - exp < 0)).sum(axis=1)
+    cash_flow = np.where(active > 0, 1.0 - negative_months / active_or_one, NEUTRAL)
+
+    components = np.stack([coverage, margin_trend, stability, diversification, cash_flow], axis=1)
+    score = np.round(components @ WEIGHTS * 100.0, 1)
+    risk_level = np.where(score >= LOW_RISK_MIN_SCORE, "Low",
+                          np.where(score >= MEDIUM_RISK_MIN_SCORE, "Medium", "High"))
+
+    result = {"score": score, "risk_level": risk_level}
+    for index, name in enumerate(COMPONENTS):
+        result[name] = components[:, index]
+    return result
+
+
+def score_series(monthly: list, category_expense: list, totals: dict = None) -> dict:
+    """
+    Score one company from its aggregated series.
+
+    Args:
+        monthly: [{"month", "revenue", "expense"}, ...] oldest first (see aggregation.get_monthly_breakdown)
+        category_expense: expense total per category
+        totals: headline totals, used when no record is dated
+
+    Returns:
+        Dict with score, risk_level, components and method
+    """
+    if monthly:
+        revenue = [[m["revenue"] for m in monthly]]
+        expense = [[m["expense"] for m in monthly]]
+    else:
+        totals = totals or {}
+        revenue = [[totals.get("total_revenue", 0.0)]]
+        expense = [[totals.get("total_expense", 0.0)]]
+
+    result = score_arrays(revenue, expense, category_expense=[category_expense] if category_expense else None)
+    return {
+        "score": float(result["score"][0]),
+        "risk_level": str(result["risk_level"][0]),
+        "components": {name: round(float(result[name][0]), 3) for name in COMPONENTS},
+        "method": "rules"
+    }
+
+
+def score_company(db: Session, company_id: int) -> dict:
+    """Rule-based score for a company, read from its summary rollups"""
+    from aggregation import get_category_breakdown, get_financial_summary, get_monthly_breakdown
+
+    monthly = get_monthly_breakdown(db, company_id)
+    category_expense = [c["total"] for c in get_category_breakdown(db, company_id) if c["type"] == "Expense"]
+    totals = None if monthly else get_financial_summary(db, company_id)
+    return score_series(monthly, category_expense, totals)
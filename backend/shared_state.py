@@ -0,0 +1,318 @@
+"""
+State shared by every worker process of the API: the assessment cache, the
+OpenRouter rate-limit bucket and the analysis job queue.
+
+The backend is picked by SHARED_STATE_URL:
+    sqlite:///path/state.db   a local SQLite file (WAL), shared by all workers on
+                              one host. This is the default, with one file per
+                              DATABASE_URL in the temp directory.
+    redis://host:6379/0       Redis or anything speaking its protocol, for
+                              workers spread over several hosts (needs the
+                              redis package)
+    memory://                 plain in-process state, for a single process and
+                              for tests
+
+Values are JSON. Keys are plain strings, namespaced by the caller
+("assessment:<hash>", "ratelimit:openrouter"). Every backend offers the same
+small set of operations. update() is an atomic read-modify-write, which is
+enough to build token buckets and counters on top of.
+"""
+
+import hashlib
+import json
+from abc import ABC, abstractmethod
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+
+def _default_url() -> str:
+    # Workers of one deployment share a file; different databases never see each other's state
+    database_url = os.getenv("DATABASE_URL", "")
+    digest = hashlib.sha256(database_url.encode("utf-8")).hexdigest()[:12]
+    return f"sqlite:///{os.path.join(tempfile.gettempdir(), f'sme_shared_state_{digest}.db')}"
+
+
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL") or _default_url()
+# Prepended to every Redis key, so one Redis can serve several deployments
+SHARED_STATE_PREFIX = os.getenv("SHARED_STATE_PREFIX", "sme:")
+
+
+class SharedState(ABC):
+    """Interface of the backends; one missing an operation fails when it is created"""
+
+    name = None
+
+    @abstractmethod
+    def get(self, key: str):
+        """Stored value, or None if missing or expired"""
+
+    @abstractmethod
+    def set(self, key: str, value, ttl: float = None) -> None:
+        """Store a value, expiring after ttl seconds (never without one)"""
+
+    @abstractmethod
+    def delete_prefix(self, prefix: str) -> None:
+        """Drop every key starting with prefix"""
+
+    @abstractmethod
+    def update(self, key: str, fn, ttl: float = None):
+        """
+        Atomically replace a value with fn(current value or None), which returns (new value, result).
+
+        Returns:
+            The result part of fn's return value
+        """
+
+    @abstractmethod
+    def push(self, queue: str, item) -> None:
+        """Append to a FIFO queue"""
+
+    @abstractmethod
+    def pop(self, queue: str):
+        """Oldest item of a queue, or None when it is empty (never blocks)"""
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryState(SharedState):
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._queues = defaultdict(deque)
+
+    def _live(self, key: str):
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.time():
+            del self._values[key]
+            return None
+        return value
+
+    def get(self, key: str):
+        with self._lock:
+            return self._live(key)
+
+    def set(self, key: str, value, ttl: float = None) -> None:
+        with self._lock:
+            self._values[key] = (value, time.time() + ttl if ttl else None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._values if k.startswith(prefix)]:
+                del self._values[key]
+
+    def update(self, key: str, fn, ttl: float = None):
+        with self._lock:
+            value, result = fn(self._live(key))
+            self._values[key] = (value, time.time() + ttl if ttl else None)
+            return result
+
+    def push(self, queue: str, item) -> None:
+        with self._lock:
+            self._queues[queue].append(item)
+
+    def pop(self, queue: str):
+        with self._lock:
+            items = self._queues[queue]
+            return items.popleft() if items else None
+
+
+class SQLiteState(SharedState):
+    """One SQLite file in WAL mode; each thread of each process opens its own connection"""
+
+    name = "sqlite"
+    # Writes between sweeps of expired keys
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        # (pid, connection) of every thread's connection, so close() reaches those of pool threads too
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+        self._writes = 0
+        with self._transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS queue (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         "name TEXT NOT NULL, item TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_queue_name_id ON queue (name, id)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections never cross a fork: a worker inheriting the master's opens its own
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+            with self._connections_lock:
+                self._connections.add((os.getpid(), conn))
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        # Take the write lock up front, so read-modify-write cycles never interleave
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _write(self, conn, key: str, value, ttl: float = None) -> None:
+        conn.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                     (key, json.dumps(value), time.time() + ttl if ttl else None))
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM kv WHERE expires_at < ?", (time.time(),))
+
+    @staticmethod
+    def _read(conn, key: str):
+        row = conn.execute("SELECT value, expires_at FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return json.loads(row[0])
+
+    def get(self, key: str):
+        return self._read(self._connection(), key)
+
+    def set(self, key: str, value, ttl: float = None) -> None:
+        with self._transaction() as conn:
+            self._write(conn, key, value, ttl)
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM kv WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def update(self, key: str, fn, ttl: float = None):
+        with self._transaction() as conn:
+            value, result = fn(self._read(conn, key))
+            self._write(conn, key, value, ttl)
+            return result
+
+    def push(self, queue: str, item) -> None:
+        with self._transaction() as conn:
+            conn.execute("INSERT INTO queue (name, item) VALUES (?, ?)", (queue, json.dumps(item)))
+
+    def pop(self, queue: str):
+        # Reads take no write lock, so idle workers polling an empty queue never block writers
+        conn = self._connection()
+        while True:
+            row = conn.execute("SELECT id, item FROM queue WHERE name = ? ORDER BY id LIMIT 1", (queue,)).fetchone()
+            if row is None:
+                return None
+            # Of several processes that read the same row, exactly one deletes it
+            if conn.execute("DELETE FROM queue WHERE id = ?", (row[0],)).rowcount == 1:
+                return json.loads(row[1])
+
+    def close(self) -> None:
+        """Close the connections every thread of this process opened; later calls open new ones"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, set()
+            self._local = threading.local()
+        for pid, conn in connections:
+            # A forked worker leaves the master's connections alone
+            if pid == os.getpid():
+                conn.close()
+
+
+class RedisState(SharedState):
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = SHARED_STATE_PREFIX, client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError(f"SHARED_STATE_URL={url} needs the redis package (pip install redis)") from e
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value, ttl: float = None) -> None:
+        self.client.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        batch = []
+        for key in self.client.scan_iter(match=f"{self.prefix}{prefix}*", count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                self.client.delete(*batch)
+                batch = []
+        if batch:
+            self.client.delete(*batch)
+
+    def update(self, key: str, fn, ttl: float = None):
+        from redis.exceptions import WatchError
+
+        key = self.prefix + key
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    # Optimistic: retried if another client writes the key in between
+                    pipe.watch(key)
+                    raw = pipe.get(key)
+                    value, result = fn(json.loads(raw) if raw is not None else None)
+                    pipe.multi()
+                    pipe.set(key, json.dumps(value), px=int(ttl * 1000) if ttl else None)
+                    pipe.execute()
+                    return result
+                except WatchError:
+                    continue
+
+    def push(self, queue: str, item) -> None:
+        self.client.rpush(f"{self.prefix}queue:{queue}", json.dumps(item))
+
+    def pop(self, queue: str):
+        raw = self.client.lpop(f"{self.prefix}queue:{queue}")
+        return json.loads(raw) if raw is not None else None
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def create_shared_state(url: str) -> SharedState:
+    if url.startswith("memory://"):
+        return MemoryState()
+    if url.startswith("sqlite:///"):
+        return SQLiteState(url[len("sqlite:///"):])
+    if url.split("://", 1)[0] in ("redis", "rediss", "unix"):
+        return RedisState(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL: {url} (use sqlite:///path, redis://host or memory://)")
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def get_shared_state() -> SharedState:
+    """The process-wide backend for SHARED_STATE_URL, created on first use"""
+    global _state
+    if _state is None:
+        with _state_lock:
+            if _state is None:
+                _state = create_shared_state(SHARED_STATE_URL)
+    return _state
+
+
+def close_shared_state() -> None:
+    global _state
+    if _state is not None:
+        _state.close()
+        _state = None
@@ -0,0 +1,225 @@
+"""
+Incremental maintenance of the company_financial_summary rollup table.
+
+Each ingested batch is grouped once in pandas and its totals are added to the
+stored rollups inside the upload transaction, so reads never touch
+financial_records. rebuild_company_summary / check_company_summary recompute
+the rollups from the raw ledger for backfills and consistency checks.
+"""
+
+import hashlib
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models import CompanyFinancialSummary, FinancialRecord, FinancialRecordArchive
+# Sentinel for "all categories" / "all periods" rollup rows; uploads may not use it as a category
+from processor import ROLLUP_ALL
+# Period used for records without a date
+UNDATED = ''
+
+BUCKET_COLUMNS = ["record_type", "category", "period"]
+
+
+def _expand_rollups(grouped: pd.DataFrame) -> pd.DataFrame:
+    """
+    From (record_type, category, period) totals, derive the three stored grains:
+    per category+month, per category (period='*'), per month (category='*') and per type.
+    """
+    by_category = grouped.groupby(["record_type", "category"], as_index=False)[["total_amount", "record_count"]].sum()
+    by_category["period"] = ROLLUP_ALL
+    by_period = grouped.groupby(["record_type", "period"], as_index=False)[["total_amount", "record_count"]].sum()
+    by_period["category"] = ROLLUP_ALL
+    by_type = grouped.groupby(["record_type"], as_index=False)[["total_amount", "record_count"]].sum()
+    by_type["category"] = ROLLUP_ALL
+    by_type["period"] = ROLLUP_ALL
+    columns = BUCKET_COLUMNS + ["total_amount", "record_count"]
+    return pd.concat(
+        [grouped[columns], by_category[columns], by_period[columns], by_type[columns]],
+        ignore_index=True,
+    )
+
+
+def rollup_batch(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Summary deltas for a normalized batch (see processor.normalize_financial_frame)
+
+    Returns:
+        DataFrame with record_type, category, period, total_amount, record_count
+    """
+    if df.empty:
+        return pd.DataFrame(columns=BUCKET_COLUMNS + ["total_amount", "record_count"])
+
+    # Group on an integer month key and format only the distinct months
+    month_key = (df["date"].dt.year * 100 + df["date"].dt.month).fillna(0).astype("int64")
+    grouped = pd.DataFrame({
+        "record_type": df["type"],
+        "category": df["category"],
+        "month_key": month_key,
+        "amount": df["amount"],
+    }).groupby(["record_type", "category", "month_key"], as_index=False).agg(
+        total_amount=("amount", "sum"), record_count=("amount", "size")
+    )
+    grouped["period"] = [f"{k // 100:04d}-{k % 100:02d}" if k else UNDATED for k in grouped["month_key"]]
+    return _expand_rollups(grouped)
+
+
+def _upsert_deltas(db: Session, company_id: int, deltas: pd.DataFrame) -> None:
+    rows = [
+        {
+            "company_id": company_id,
+            "record_type": row.record_type,
+            "category": row.category,
+            "period": row.period,
+            "total_amount": float(row.total_amount),
+            "record_count": int(row.record_count),
+        }
+        for row in deltas.itertuples(index=False)
+    ]
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(CompanyFinancialSummary)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["company_id", "record_type", "category", "period"],
+            set_={
+                "total_amount": CompanyFinancialSummary.total_amount + stmt.excluded.total_amount,
+                "record_count": CompanyFinancialSummary.record_count + stmt.excluded.record_count,
+                "updated_at": func.now(),
+            },
+        )
+        db.execute(stmt, rows)
+        return
+
+    # Portable fallback: read the touched buckets, then update or insert
+    existing = {
+        (s.record_type, s.category, s.period): s
+        for s in db.query(CompanyFinancialSummary).filter(
+            CompanyFinancialSummary.company_id == company_id,
+            CompanyFinancialSummary.record_type.in_({r["record_type"] for r in rows}),
+        )
+    }
+    for row in rows:
+        bucket = existing.get((row["record_type"], row["category"], row["period"]))
+        if bucket:
+            bucket.total_amount += row["total_amount"]
+            bucket.record_count += row["record_count"]
+        else:
+            db.add(CompanyFinancialSummary(**row))
+    db.flush()
+
+
+def apply_summary_delta(db: Session, company_id: int, df: pd.DataFrame) -> None:
+    """Add a freshly ingested batch to the company's rollups; runs inside the caller's transaction"""
+    _upsert_deltas(db, company_id, rollup_batch(df))
+
+
+def compute_rollups_from_records(db: Session, company_id: int) -> pd.DataFrame:
+    """
+    Recompute the full rollup set for a company from financial_records and
+    financial_records_archive (GROUP BY in SQL); rollups cover archived records too
+    """
+    from aggregation import _month_expr
+
+    rows = []
+    for table in (FinancialRecord, FinancialRecordArchive):
+        month = _month_expr(db, table.date).label("period")
+        rows += db.query(
+            table.record_type,
+            table.category,
+            month,
+            func.sum(table.amount),
+            func.count(table.id),
+        ).filter(
+            table.company_id == company_id
+        ).group_by(table.record_type, table.category, month).all()
+
+    grouped = pd.DataFrame(rows, columns=["record_type", "category", "period", "total_amount", "record_count"])
+    if grouped.empty:
+        return grouped
+    grouped["period"] = grouped["period"].fillna(UNDATED)
+    grouped["total_amount"] = grouped["total_amount"].fillna(0.0).astype("float64")
+    # Records inserted by hand may lack the defaults the ingestion path fills in
+    grouped["record_type"] = grouped["record_type"].fillna("Expense")
+    grouped["category"] = grouped["category"].fillna("Uncategorized")
+    grouped = grouped.groupby(BUCKET_COLUMNS, as_index=False)[["total_amount", "record_count"]].sum()
+    return _expand_rollups(grouped)
+
+
+def rebuild_company_summary(db: Session, company_id: int) -> int:
+    """
+    Replace a company's rollups with ones recomputed from the raw ledger.
+
+    Returns:
+        Number of rollup rows written; the caller commits
+    """
+    db.query(CompanyFinancialSummary).filter(CompanyFinancialSummary.company_id == company_id).delete()
+    rollups = compute_rollups_from_records(db, company_id)
+    _upsert_deltas(db, company_id, rollups)
+    return len(rollups)
+
+
+def check_company_summary(db: Session, company_id: int, tolerance: float = 0.01) -> list:
+    """
+    Compare stored rollups with ones recomputed from financial_records.
+
+    Returns:
+        List of mismatches as dicts (empty when consistent)
+    """
+    expected = {
+        (r.record_type, r.category, r.period): (float(r.total_amount), int(r.record_count))
+        for r in compute_rollups_from_records(db, company_id).itertuples(index=False)
+    }
+    stored = {
+        (s.record_type, s.category, s.period): (s.total_amount, s.record_count)
+        for s in db.query(CompanyFinancialSummary).filter(CompanyFinancialSummary.company_id == company_id)
+    }
+
+    mismatches = []
+    for key in expected.keys() | stored.keys():
+        want = expected.get(key, (0.0, 0))
+        have = stored.get(key, (0.0, 0))
+        if abs(want[0] - have[0]) > tolerance or want[1] != have[1]:
+            mismatches.append({
+                "record_type": key[0], "category": key[1], "period": key[2],
+                "expected_total": want[0], "stored_total": have[0],
+                "expected_count": want[1], "stored_count": have[1],
+            })
+    return mismatches
+
+
+def _fingerprint(company_id: int, rows) -> str:
+    canonical = "|".join(f"{t}:{round(total, 2)}:{count}" for t, total, count in rows)
+    return hashlib.sha256(f"{company_id}|{canonical}".encode("utf-8")).hexdigest()[:16]
+
+
+def get_data_version(db: Session, company_id: int) -> str:
+    """
+    Short fingerprint of a company's ledger, taken from its headline rollups.
+    Changes whenever records are added, so it identifies "the same data" cheaply.
+    """
+    return get_data_versions(db, [company_id])[company_id]
+
+
+def get_data_versions(db: Session, company_ids: list) -> dict:
+    """get_data_version for many companies with one query"""
+    rows = db.query(
+        CompanyFinancialSummary.company_id,
+        CompanyFinancialSummary.record_type,
+        CompanyFinancialSummary.total_amount,
+        CompanyFinancialSummary.record_count,
+    ).filter(
+        CompanyFinancialSummary.company_id.in_(company_ids),
+        CompanyFinancialSummary.category == ROLLUP_ALL,
+        CompanyFinancialSummary.period == ROLLUP_ALL,
+    ).order_by(CompanyFinancialSummary.company_id, CompanyFinancialSummary.record_type).all()
+
+    headline = {company_id: [] for company_id in company_ids}
+    for company_id, record_type, total, count in rows:
+        headline[company_id].append((record_type, total, count))
+    return {company_id: _fingerprint(company_id, headline[company_id]) for company_id in company_ids}
@@ -0,0 +1,71 @@
+"""
+Test setup: a throwaway SQLite database, in-process shared state and a local
+OpenRouter stub (benchmarks/stub_openrouter.py) instead of the real API.
+
+Run from backend/:
+    python -m pytest tests
+"""
+
+import os
+import socket
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_tmp = tempfile.mkdtemp(prefix="sme_tests_")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+STUB_PORT = _free_port()
+
+# Modules read their settings at import, so these are set before any of them loads
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_tmp, 'test.db')}",
+    "SHARED_STATE_URL": "memory://",
+    "REPORT_CACHE_DIR": os.path.join(_tmp, "reports"),
+    "OPENROUTER_URL": f"http://127.0.0.1:{STUB_PORT}/api/v1/chat/completions",
+    "OPENROUTER_API_KEY": "test",
+    "WARMUP": "false",
+    "LEDGER_RETENTION_MONTHS": "0",
+})
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def stub_openrouter():
+    """The stub OpenRouter API the backend is pointed at: (server, state)"""
+    from benchmarks.stub_openrouter import serve
+
+    server, state = serve(port=STUB_PORT, latency=0.0)
+    yield server, state
+    server.shutdown()
+
+
+@pytest.fixture(scope="session")
+def client(stub_openrouter):
+    """TestClient for the API, started once (migrations, job workers) for the whole run"""
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def sample_csv() -> bytes:
+    with open(os.path.join(os.path.dirname(BACKEND_DIR), "sample_financial_data.csv"), "rb") as f:
+        return f.read()
+
+
+def upload(client, data: bytes, filename: str = "ledger.csv", **form) -> dict:
+    response = client.post("/upload", files={"file": (filename, data)}, data=form)
+    assert response.status_code == 200, response.text
+    return response.json()
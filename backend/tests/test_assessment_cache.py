@@ -0,0 +1,38 @@
+from conftest import upload
+
+
+def test_companies_with_identical_ledgers_get_their_own_assessment(client, sample_csv):
+    # Same rows, different bytes: not a duplicate upload, so a second company
+    first = upload(client, sample_csv)["company_id"]
+    second = upload(client, sample_csv.replace(b"\n", b"\r\n"))["company_id"]
+    assert first != second
+
+    assessed = client.post(f"/analyze/{first}").json()
+    response = client.post(f"/analyze/{second}")
+    assert response.status_code == 200
+    other = response.json()
+
+    assert other["cached"] is False
+    assert other["assessment_id"] != assessed["assessment_id"]
+    assert client.get(f"/download-report/{second}").status_code == 200
+
+    # Each company's cache entry still serves its own assessment
+    again = client.post(f"/analyze/{first}").json()
+    assert again["cached"] is True
+    assert again["assessment_id"] == assessed["assessment_id"]
+
+
+def test_cache_hits_skip_the_prompt_context(client, sample_csv, monkeypatch):
+    import analysis
+
+    company_id = upload(client, sample_csv.replace(b"\n", b"\n\n"))["company_id"]
+    assert client.post(f"/analyze/{company_id}").json()["cached"] is False
+
+    def fail(*args, **kwargs):
+        raise AssertionError("prompt context built for a cached assessment")
+
+    monkeypatch.setattr(analysis, "build_prompt_contexts", fail)
+    assert client.post(f"/analyze/{company_id}").json()["cached"] is True
+    assert '"cached": true' in client.post(f"/analyze/{company_id}/stream").text
+    batch = client.post("/analyze/batch", json={"company_ids": [company_id]})
+    assert '"cached": true' in batch.text
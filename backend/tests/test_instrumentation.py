@@ -0,0 +1,64 @@
+import sqlite3
+import time
+
+import pytest
+from sqlalchemy import exc
+
+from database import POOL_METRICS, InstrumentedQueuePool
+from instrumentation import METRICS_KEY_PREFIX, METRICS_WORKERS_KEY, UNITS_TOTAL, collect_metrics
+from shared_state import get_shared_state
+
+
+def _add_worker(key: str, published: float, units: list, pool: dict) -> None:
+    state = get_shared_state()
+    state.set(key, {"published": published, "requests": [], "stages": [], "units": units, "pool": pool})
+    state.update(METRICS_WORKERS_KEY, lambda keys: ((keys or []) + [key],) * 2)
+
+
+def _pool(checkouts: int, checked_out: int) -> dict:
+    return {"sync": {"checkouts": checkouts, "timeouts": 1, "errors": 0, "wait_seconds_total": 0.5,
+                     "wait_buckets": {"0.001": checkouts}, "checked_out": checked_out, "size": 5}}
+
+
+def _value(text: str, series: str) -> float:
+    return float(next(line for line in text.splitlines() if line.startswith(series + " ")).split()[-1])
+
+
+def test_metrics_sum_every_workers_snapshot():
+    state = get_shared_state()
+    state.delete_prefix(METRICS_KEY_PREFIX)
+    UNITS_TOTAL.inc(3, "test_route", "rows")
+    _add_worker(f"{METRICS_KEY_PREFIX}worker:live", time.time(), [[["test_route", "rows"], 10]], _pool(4, 2))
+    # An exited worker: its counts stay in the totals, its gauges do not
+    _add_worker(f"{METRICS_KEY_PREFIX}worker:gone", time.time() - 3600, [[["test_route", "rows"], 5]], _pool(6, 3))
+
+    text = collect_metrics(_pool(0, 1))
+
+    assert _value(text, 'processed_units_total{route="test_route",unit="rows"}') == 18
+    assert _value(text, 'db_pool_checkout_wait_seconds_count{engine="sync"}') == 10
+    assert _value(text, 'db_pool_checkout_timeouts_total{engine="sync"}') == 3
+    assert _value(text, 'db_pool_checked_out{engine="sync"}') == 3
+    assert _value(text, 'db_pool_size{engine="sync"}') == 10
+    # Each series appears once, summed
+    assert text.count('processed_units_total{route="test_route",unit="rows"}') == 1
+    state.delete_prefix(METRICS_KEY_PREFIX)
+
+
+def test_pool_timeouts_and_connect_failures_are_counted_apart():
+    metrics = POOL_METRICS["sync"]
+    before = metrics.snapshot()
+    pool = InstrumentedQueuePool(lambda: sqlite3.connect(":memory:"), pool_size=1, max_overflow=0, timeout=0.01)
+    held = pool.connect()
+    with pytest.raises(exc.TimeoutError):
+        pool.connect()
+    held.close()
+
+    def refuse():
+        raise sqlite3.OperationalError("unable to open database file")
+
+    with pytest.raises(sqlite3.OperationalError):
+        InstrumentedQueuePool(refuse, pool_size=1).connect()
+
+    after = metrics.snapshot()
+    assert after["timeouts"] - before["timeouts"] == 1
+    assert after["errors"] - before["errors"] == 1
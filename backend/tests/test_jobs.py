@@ -0,0 +1,101 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+
+@pytest.fixture
+def db(client):
+    from database import SessionLocal
+    from models import AnalysisJob, Company
+
+    session = SessionLocal()
+    company = Company(name="Jobs Co")
+    session.add(company)
+    session.commit()
+    yield session, company.id
+    session.query(AnalysisJob).filter(AnalysisJob.company_id == company.id).update({"status": "done"})
+    session.commit()
+    session.close()
+
+
+def test_the_active_job_index_rejects_a_duplicate(db):
+    import jobs
+    from models import AnalysisJob
+
+    session, company_id = db
+    job, merged = jobs.create_or_merge_job(session, company_id, "en")
+    assert not merged
+    session.add(AnalysisJob(id="f" * 32, company_id=company_id, language="en", all_languages=False,
+                            force_refresh=False, data_version=job.data_version, status="queued"))
+    with pytest.raises(IntegrityError):
+        session.commit()
+    session.rollback()
+
+
+def test_a_concurrent_enqueue_merges_into_the_winner(db, monkeypatch):
+    import jobs
+
+    session, company_id = db
+    winner, _ = jobs.create_or_merge_job(session, company_id, "hi")
+    lookup = jobs._active_job
+    calls = []
+
+    def missed_the_winner(*args):
+        # The first lookup runs before the other request commits
+        calls.append(args)
+        return None if len(calls) == 1 else lookup(*args)
+
+    monkeypatch.setattr(jobs, "_active_job", missed_the_winner)
+    job, merged = jobs.create_or_merge_job(session, company_id, "hi")
+    assert merged and job.id == winner.id
+
+
+def test_forced_refresh_only_merges_into_forced_jobs(db):
+    import jobs
+
+    session, company_id = db
+    cached, _ = jobs.create_or_merge_job(session, company_id, "ta")
+    forced, merged = jobs.create_or_merge_job(session, company_id, "ta", force_refresh=True)
+    assert not merged and forced.id != cached.id and forced.force_refresh
+    again, merged = jobs.create_or_merge_job(session, company_id, "ta", force_refresh=True)
+    assert merged and again.id == forced.id
+    # A plain request is happy with either
+    plain, merged = jobs.create_or_merge_job(session, company_id, "ta")
+    assert merged and plain.id == cached.id
+
+
+def test_finished_jobs_are_purged_after_the_retention_period(db):
+    from datetime import datetime, timedelta, timezone
+
+    import jobs
+    from models import AnalysisJob
+
+    session, company_id = db
+    job_id = jobs.create_or_merge_job(session, company_id, "en", all_languages=True)[0].id
+    jobs._finish_job(job_id, "done", {"score": 70})
+    assert jobs.purge_finished_jobs(days=1) == 0
+
+    session.query(AnalysisJob).filter(AnalysisJob.id == job_id).update(
+        {"finished_at": datetime.now(timezone.utc) - timedelta(days=2)})
+    session.commit()
+    assert jobs.purge_finished_jobs(days=1) == 1
+    session.expire_all()
+    assert jobs.get_job(session, job_id) is None
+
+
+def test_wakeup_events_are_released_with_the_last_stream():
+    import asyncio
+
+    from jobs import JobWorkerPool
+
+    async def streams():
+        pool = JobWorkerPool()
+        pool.watch("job")
+        pool.watch("job")
+        await pool.wait_for_update("job", timeout=0)
+        pool.release("job")
+        # The other stream still waits on it
+        assert "job" in pool._events
+        pool.release("job")
+        assert pool._events == {} and pool._watchers == {}
+
+    asyncio.run(streams())
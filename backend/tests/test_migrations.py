@@ -0,0 +1,183 @@
+import os
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, inspect, select, text, update
+
+from conftest import upload
+
+# PostgreSQL database the partitioning tests may create tables in
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+def _schema(bind, tables) -> dict:
+    """Columns, indexes and unique constraints of `tables` as the database reports them"""
+    inspector = inspect(bind)
+    return {
+        table.name: {
+            "columns": {c["name"]: (str(c["type"].compile(bind.dialect)), c["nullable"])
+                        for c in inspector.get_columns(table.name)},
+            "indexes": {(i["name"], tuple(i["column_names"]), bool(i["unique"])) for i in inspector.get_indexes(table.name)},
+            "unique": {tuple(u["column_names"]) for u in inspector.get_unique_constraints(table.name)},
+        }
+        for table in tables
+    }
+
+
+def _model_schema(dialect, tables) -> dict:
+    return {
+        table.name: {
+            "columns": {c.name: (str(c.type.compile(dialect)), c.nullable) for c in table.columns},
+            "indexes": {(i.name, tuple(c.name for c in i.columns), bool(i.unique)) for i in table.indexes},
+            "unique": {tuple(c.name for c in u.columns) for u in table.constraints if u.__class__.__name__ == "UniqueConstraint"}
+                      | {(c.name,) for c in table.columns if c.unique},
+        }
+        for table in tables
+    }
+
+
+def test_upgraded_schema_matches_the_models(tmp_path):
+    import migrations
+    from database import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    assert migrations.upgrade(engine) == [version for version, _, _ in sorted(migrations.MIGRATIONS)]
+    assert _schema(engine, Base.metadata.sorted_tables) == _model_schema(engine.dialect, Base.metadata.sorted_tables)
+    assert migrations.upgrade(engine) == []
+
+
+def test_upgrade_of_a_pre_migration_database(tmp_path):
+    import migrations
+    from database import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        # Tables as the original create_all left them
+        conn.execute(text("CREATE TABLE companies (id INTEGER PRIMARY KEY, name VARCHAR, industry VARCHAR, "
+                          "gst_number VARCHAR UNIQUE, file_hash VARCHAR, created_at DATETIME)"))
+        conn.execute(text("CREATE TABLE financial_records (id INTEGER PRIMARY KEY, company_id INTEGER REFERENCES companies (id), "
+                          "record_type VARCHAR, category VARCHAR, amount FLOAT, currency VARCHAR, date DATETIME, "
+                          "source_document VARCHAR)"))
+        conn.execute(text("CREATE INDEX ix_financial_records_company_date ON financial_records (company_id, date)"))
+        conn.execute(text("CREATE TABLE assessments (id INTEGER PRIMARY KEY, company_id INTEGER REFERENCES companies (id), "
+                          "overall_score FLOAT, risk_level VARCHAR, summary_narrative TEXT, recommendations JSON, "
+                          "created_at DATETIME)"))
+        conn.execute(text("INSERT INTO companies (id, name) VALUES (1, 'Old Co')"))
+        conn.execute(text("INSERT INTO financial_records (company_id, record_type, category, amount, date) "
+                          "VALUES (1, 'Revenue', 'Sales', 100.0, '2024-01-05 00:00:00')"))
+    migrations.upgrade(engine)
+
+    upgraded = _schema(engine, Base.metadata.sorted_tables)
+    assert "ix_financial_records_company_date" not in {name for name, _, _ in upgraded["financial_records"]["indexes"]}
+    expected = _model_schema(engine.dialect, Base.metadata.sorted_tables)
+    for table in ("companies", "financial_records", "assessments"):
+        # Legacy primary keys have no ix_<table>_id index; otherwise the columns and indexes caught up
+        assert upgraded[table]["columns"].keys() == expected[table]["columns"].keys()
+        assert upgraded[table]["indexes"] >= {i for i in expected[table]["indexes"] if i[0] != f"ix_{table}_id"}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT row_fingerprint FROM financial_records")).scalar() is not None
+
+
+def test_backfill_fingerprints_rows_stored_without_them(client, sample_csv):
+    import migrations
+    from database import engine
+    from models import FinancialRecord
+
+    # Trailing blank line: new bytes, so a new company rather than a duplicate upload
+    company_id = upload(client, sample_csv + b"\n")["company_id"]
+    ledger = FinancialRecord.__table__
+    rows = select(ledger.c.id, ledger.c.row_fingerprint).where(ledger.c.company_id == company_id).order_by(ledger.c.id)
+    with engine.begin() as conn:
+        ingested = conn.execute(rows).all()
+        assert all(fingerprint is not None for _, fingerprint in ingested)
+        conn.execute(update(ledger).where(ledger.c.company_id == company_id).values(row_fingerprint=None))
+        migrations._row_fingerprint_backfill(conn)
+        assert conn.execute(rows).all() == ingested
+
+    # Re-merging the same upload finds every row already present
+    merged = upload(client, sample_csv, company_id=company_id)
+    assert merged["ingestion"]["rows"] == 0
+    assert merged["ingestion"]["skipped"] == len(ingested)
+
+
+def test_hash_partitioning_ddl():
+    import migrations
+
+    statements = migrations.partitioned_ledger_ddl("company_hash", "financial_records_unpartitioned", partitions=4)
+    assert statements[0] == (
+        "CREATE TABLE financial_records (LIKE financial_records_unpartitioned INCLUDING DEFAULTS, "
+        "PRIMARY KEY (company_id, id)) PARTITION BY HASH (company_id)"
+    )
+    assert statements[1:] == [
+        f"CREATE TABLE financial_records_p{r} PARTITION OF financial_records FOR VALUES WITH (MODULUS 4, REMAINDER {r})"
+        for r in range(4)
+    ]
+
+
+def test_month_partitioning_ddl():
+    import migrations
+
+    assert migrations.partitioned_ledger_ddl("month", "financial_records_unpartitioned") == [
+        'CREATE TABLE financial_records (LIKE financial_records_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE ("date")',
+        "CREATE TABLE financial_records_default PARTITION OF financial_records DEFAULT",
+    ]
+    create, move, attach = migrations.month_partition_ddl(date(2024, 12, 1))
+    assert create == "CREATE TABLE financial_records_y2024m12 (LIKE financial_records INCLUDING DEFAULTS)"
+    assert move == (
+        "WITH moved AS (DELETE FROM financial_records_default "
+        "WHERE \"date\" >= '2024-12-01' AND \"date\" < '2025-01-01' RETURNING *) "
+        "INSERT INTO financial_records_y2024m12 SELECT * FROM moved"
+    )
+    assert attach == ("ALTER TABLE financial_records ATTACH PARTITION financial_records_y2024m12 "
+                      "FOR VALUES FROM ('2024-12-01') TO ('2025-01-01')")
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason="set TEST_POSTGRES_URL to run the partitioning DDL on PostgreSQL")
+@pytest.mark.parametrize("scheme", ["company_hash", "month"])
+def test_partition_ledger_on_postgres(scheme):
+    import migrations
+
+    engine = create_engine(TEST_POSTGRES_URL)
+    migrations.upgrade(engine)
+    with engine.connect() as conn:
+        # Everything below is rolled back: PostgreSQL DDL is transactional
+        with conn.begin() as transaction:
+            company_id = conn.execute(text("INSERT INTO companies (name) VALUES ('Partitioned') RETURNING id")).scalar()
+            conn.execute(text(
+                "INSERT INTO financial_records (company_id, record_type, category, amount, date) VALUES "
+                "(:c, 'Revenue', 'Sales', 100, '2024-01-05'), (:c, 'Expense', 'Rent', 40, '2024-02-01'), "
+                "(:c, 'Expense', 'Misc', 5, NULL)"
+            ), {"c": company_id})
+            before = conn.execute(text("SELECT count(*) FROM financial_records")).scalar()
+
+            assert migrations.partition_ledger(conn, scheme, partitions=4) == before
+            assert migrations.ledger_partitioning(conn) == scheme
+            assert conn.execute(text("SELECT count(*) FROM financial_records WHERE company_id = :c"),
+                                {"c": company_id}).scalar() == 3
+            if scheme == "month":
+                assert {"financial_records_y2024m01", "financial_records_y2024m02"} <= {
+                    name for name, _ in migrations.month_partitions(conn)
+                }
+            # New rows still get ids from the old sequence
+            conn.execute(text("INSERT INTO financial_records (company_id, record_type, amount) VALUES (:c, 'Revenue', 1)"),
+                         {"c": company_id})
+            transaction.rollback()
+
+
+def test_the_backfill_fingerprints_rows_like_ingestion():
+    import numpy as np
+    import pandas as pd
+
+    from ingestion import RowFingerprinter
+    from migrations import _RowFingerprinterV1
+
+    frame = pd.DataFrame({
+        "date": pd.to_datetime(["2024-01-05", "2024-01-05", None, "2024-02-01"]).astype("datetime64[ns]"),
+        "category": ["Rent", "Rent", "Sales", "Rent"],
+        "amount": [100.0, 100.004, 50.0, 100.0],
+        "type": ["Expense", "Expense", "Revenue", "Expense"],
+    })
+    live, frozen = RowFingerprinter(), _RowFingerprinterV1()
+    # Several batches, so occurrence numbers carry over from one to the next
+    for batch in (frame.iloc[:2], frame.iloc[2:], frame):
+        assert np.array_equal(frozen(batch), live(batch))
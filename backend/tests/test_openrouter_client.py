@@ -0,0 +1,177 @@
+"""AdaptiveRateLimiter and the OpenRouter client's retries, against benchmarks/stub_openrouter.py"""
+
+import asyncio
+import time
+
+import pytest
+
+import ai_service
+from ai_service import AdaptiveRateLimiter, OpenRouterClient, OpenRouterStreamError
+from benchmarks.stub_openrouter import STUB_ASSESSMENT, serve
+from conftest import _free_port
+from shared_state import MemoryState
+
+
+def _limiter(**kwargs) -> AdaptiveRateLimiter:
+    # A private store, so tests never share a bucket with each other or the API
+    return AdaptiveRateLimiter(store=MemoryState(), **kwargs)
+
+
+def _rate(limiter: AdaptiveRateLimiter) -> float:
+    return limiter.store.get(limiter.key)["rate"]
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """Start a stub with the given options and point the client at it"""
+    servers = []
+
+    def start(**options):
+        port = _free_port()
+        server, state = serve(port=port, latency=0.0, **options)
+        servers.append(server)
+        monkeypatch.setattr(ai_service, "OPENROUTER_URL", f"http://127.0.0.1:{port}/api/v1/chat/completions")
+        return state
+
+    monkeypatch.setattr(ai_service, "BACKOFF_BASE_SECONDS", 0.01)
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+async def _with_client(fn, limiter: AdaptiveRateLimiter = None):
+    client = OpenRouterClient()
+    client.limiter = limiter or _limiter(rate=100, capacity=10)
+    try:
+        return await fn(client)
+    finally:
+        await client.aclose()
+
+
+def test_limiter_spaces_calls_at_the_configured_rate():
+    limiter = _limiter(rate=20, capacity=1)
+
+    async def take(n):
+        for _ in range(n):
+            await limiter.acquire()
+
+    started = time.monotonic()
+    asyncio.run(take(6))
+    # One token up front, then five refills at 20 per second
+    assert time.monotonic() - started >= 0.2
+
+
+def test_limiter_halves_on_429_and_recovers_additively():
+    limiter = _limiter(rate=10, capacity=2, min_rate=1)
+
+    async def scenario():
+        await limiter.acquire()
+        await limiter.on_rate_limited(None)
+        assert _rate(limiter) == 5
+        await limiter.on_rate_limited(None)
+        await limiter.on_rate_limited(None)
+        await limiter.on_rate_limited(None)
+        assert _rate(limiter) == 1  # never below min_rate
+
+        # Each success adds a tenth of the maximum rate, up to the maximum
+        for expected in (2, 3, 4):
+            await limiter.on_success()
+            assert _rate(limiter) == pytest.approx(expected)
+        for _ in range(20):
+            await limiter.on_success()
+        assert _rate(limiter) == 10
+
+    asyncio.run(scenario())
+
+
+def test_limiter_blocks_for_retry_after():
+    limiter = _limiter(rate=100, capacity=5)
+
+    async def scenario():
+        await limiter.on_rate_limited(0.3)
+        started = time.monotonic()
+        await limiter.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.25
+
+
+def test_limiter_is_shared_through_its_store():
+    store = MemoryState()
+    first = AdaptiveRateLimiter(rate=10, capacity=1, store=store)
+    second = AdaptiveRateLimiter(rate=10, capacity=1, store=store)
+
+    async def scenario():
+        await first.on_rate_limited(0.3)
+        started = time.monotonic()
+        await second.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.25
+
+
+def test_complete_retries_after_429_and_honours_retry_after(stub):
+    state = stub(rate_limit=1, retry_after=1.0)
+    limiter = _limiter(rate=100, capacity=10)
+
+    async def scenario(client):
+        return await asyncio.gather(*(client.complete_with_usage("prompt") for _ in range(2)))
+
+    started = time.monotonic()
+    results = asyncio.run(_with_client(scenario, limiter))
+
+    assert [content for content, _ in results] == [ai_service.json.dumps(STUB_ASSESSMENT)] * 2
+    assert state.limited == 1 and state.served == 2
+    # The second call waited out Retry-After instead of hammering the stub
+    assert time.monotonic() - started >= 1.0
+    # Halved by the 429, then raised by a tenth of the maximum by the success that followed it
+    assert _rate(limiter) == pytest.approx(100 / 2 + 10)
+
+
+def test_complete_retries_server_errors(stub):
+    state = stub(fail_first=2)
+    content, usage = asyncio.run(_with_client(lambda client: client.complete_with_usage("prompt")))
+
+    assert state.failed == 2 and state.served == 1
+    assert ai_service.json.loads(content) == STUB_ASSESSMENT
+    assert usage["total_tokens"] == 370
+
+
+def test_complete_gives_up_after_max_retries(stub, monkeypatch):
+    state = stub(fail_first=10)
+    monkeypatch.setattr(ai_service, "OPENROUTER_MAX_RETRIES", 2)
+    content, usage = asyncio.run(_with_client(lambda client: client.complete_with_usage("prompt")))
+
+    assert state.failed == 3 and state.served == 0
+    assert content == "[Error: Service temporarily unavailable]" and usage is None
+
+
+def test_complete_reports_connection_errors(stub, monkeypatch):
+    monkeypatch.setattr(ai_service, "OPENROUTER_URL", f"http://127.0.0.1:{_free_port()}/api/v1/chat/completions")
+    monkeypatch.setattr(ai_service, "OPENROUTER_MAX_RETRIES", 1)
+    content, _ = asyncio.run(_with_client(lambda client: client.complete_with_usage("prompt")))
+    assert content.startswith("[Exception:")
+
+
+def test_stream_retries_server_errors_before_the_first_byte(stub):
+    state = stub(fail_first=1)
+
+    async def scenario(client):
+        return [item async for item in client.stream_completion("prompt")]
+
+    items = asyncio.run(_with_client(scenario))
+    text = "".join(data for event, data in items if event == "delta")
+    assert ai_service.json.loads(text) == STUB_ASSESSMENT
+    assert items[-1] == ("usage", {"prompt_tokens": 250, "completion_tokens": 120, "total_tokens": 370})
+    assert state.failed == 1
+
+
+def test_stream_raises_once_retries_are_exhausted(stub, monkeypatch):
+    stub(fail_first=10)
+    monkeypatch.setattr(ai_service, "OPENROUTER_MAX_RETRIES", 1)
+
+    async def scenario(client):
+        return [item async for item in client.stream_completion("prompt")]
+
+    with pytest.raises(OpenRouterStreamError, match="Service temporarily unavailable"):
+        asyncio.run(_with_client(scenario))
@@ -0,0 +1,127 @@
+import io
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from processor import StreamingFinancialDocument, normalize_financial_frame
+
+
+def _parse(data: bytes, filename: str, chunk_size: int = 1000) -> pd.DataFrame:
+    document = StreamingFinancialDocument(io.BytesIO(data), filename, chunk_size=chunk_size)
+    frame = pd.concat(list(document), ignore_index=True)
+    assert document.file_hash
+    return frame
+
+
+def test_csv_falls_back_to_cp1252_after_the_first_block():
+    # Only the last row is not ASCII, far past the first read block
+    rows = "2024-01-05,Rent,100,Expense\n" * 60000
+    data = ("date,category,amount,type\n" + rows + "2024-02-01,Café supplies,50,Expense\n").encode("cp1252")
+    assert len(data) > 1024 * 1024
+
+    frame = _parse(data, "ledger.csv", chunk_size=20000)
+
+    assert len(frame) == 60001
+    assert frame["category"].iloc[-1] == "Café supplies"
+
+
+def test_csv_keeps_utf8_text():
+    data = "date,category,amount,type\n2024-01-05,வாடகை,100,Expense\n".encode("utf-8")
+    assert _parse(data, "ledger.csv")["category"].tolist() == ["வாடகை"]
+
+
+@pytest.mark.parametrize("filename", ["empty.csv", "empty.xlsx"])
+def test_empty_files_raise_the_same_error(filename):
+    if filename.endswith(".xlsx"):
+        buffer = io.BytesIO()
+        Workbook().save(buffer)
+        data = buffer.getvalue()
+    else:
+        data = b""
+    with pytest.raises(pd.errors.EmptyDataError):
+        list(StreamingFinancialDocument(io.BytesIO(data), filename))
+
+
+def test_untyped_amounts_default_to_expense():
+    frame = normalize_financial_frame(pd.DataFrame({"category": ["Rent", "Refund"], "amount": [100, -20]}))
+    assert frame["type"].tolist() == ["Expense", "Expense"]
+    assert frame["amount"].tolist() == [100.0, -20.0]
+
+
+def test_signed_amounts_are_opt_in():
+    raw = pd.DataFrame({"category": ["Sales", "Rent"], "amount": [100, -20]})
+    frame = normalize_financial_frame(raw, signed_amounts=True)
+    assert frame["type"].tolist() == ["Revenue", "Expense"]
+    assert frame["amount"].tolist() == [100.0, 20.0]
+
+
+def test_type_column_wins_over_sign():
+    raw = pd.DataFrame({"amount": [-100], "type": ["income"]})
+    assert normalize_financial_frame(raw, signed_amounts=True)["type"].tolist() == ["Revenue"]
+
+
+def test_hash_pre_pass_matches_the_streamed_hash(sample_csv):
+    streamed = StreamingFinancialDocument(io.BytesIO(sample_csv), "ledger.csv")
+    list(streamed)
+    hashed = StreamingFinancialDocument(io.BytesIO(sample_csv), "ledger.csv")
+    assert hashed.hash_file() == streamed.file_hash
+    # The pre-pass rewinds: the document still parses in full
+    assert sum(len(batch) for batch in hashed) == streamed.rows
+    assert hashed.file_hash == streamed.file_hash
+
+
+def test_duplicate_uploads_are_rejected_before_ingesting(client, sample_csv, monkeypatch):
+    import ingestion
+    from conftest import upload
+
+    data = sample_csv + b"\n\n\n\n"
+    first = upload(client, data)
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("duplicate upload was ingested")
+
+    monkeypatch.setattr(ingestion, "ingest_batches_async", fail)
+    again = upload(client, data)
+    assert again["duplicate"] is True
+    assert again["company_id"] == first["company_id"]
+
+
+def test_the_rollup_sentinel_is_not_a_category():
+    raw = pd.DataFrame({"category": ["Rent", " * "], "amount": [100, 20]})
+    with pytest.raises(ValueError, match="reserved"):
+        normalize_financial_frame(raw)
+
+
+def test_uploads_with_a_star_category_are_rejected(client):
+    data = b"date,category,amount,type\n2024-01-05,*,100,Revenue\n"
+    response = client.post("/upload", files={"file": ("star.csv", data, "text/csv")})
+    assert response.status_code == 400
+    assert "reserved" in response.json()["detail"]
+
+
+def test_coerced_cells_are_counted():
+    raw = pd.DataFrame({
+        "date": ["2024-01-05", "not a date", None, "2024-02-01"],
+        "amount": ["1,200", "twelve", "", "(30)"],
+        "type": ["income", "bogus", None, "Expense"],
+    })
+    frame = normalize_financial_frame(raw)
+    # Blank cells are missing values, not unparseable ones
+    assert frame.attrs["coerced"] == {"invalid_dates": 1, "invalid_amounts": 1, "unknown_types": 1}
+    debit_credit = normalize_financial_frame(pd.DataFrame({"debit": ["x", None], "credit": [None, "y"]}))
+    assert debit_credit.attrs["coerced"]["invalid_amounts"] == 2
+
+
+def test_documents_with_too_many_coerced_cells_are_rejected():
+    rows = "2024-01-05,Rent,100,Expense\n" * 8 + "soon,Rent,100,Expense\n" * 2
+    with pytest.raises(ValueError, match="2 invalid dates"):
+        _parse(("date,category,amount,type\n" + rows).encode(), "ledger.csv")
+
+
+def test_uploads_report_coerced_cells(client):
+    from conftest import upload
+
+    rows = "2024-03-05,Rent,100,Expense\n" * 19 + "2024-03-06,Rent,lots,Expense\n"
+    result = upload(client, ("date,category,amount,type\n" + rows).encode())
+    assert result["ingestion"]["coerced"] == {"invalid_dates": 0, "invalid_amounts": 1, "unknown_types": 0}
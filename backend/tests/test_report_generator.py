@@ -0,0 +1,65 @@
+import re
+
+import pytest
+from reportlab.pdfbase.ttfonts import ShapedStr
+from reportlab.platypus import Paragraph
+
+from report_fonts import register_fonts
+from report_generator import _latin_markup, _report_styles, generate_pdf_report
+
+# KA + VIRAMA + SSA: a single conjunct glyph once shaped
+CONJUNCT = "क्ष"
+
+
+@pytest.mark.parametrize("language, shaping", [("en", 0), ("hi", 1), ("ta", 1)])
+def test_complex_scripts_turn_shaping_on(language, shaping):
+    body_style, title_style, heading_style, *_, table_shaping = _report_styles(language)
+    assert body_style.shaping == title_style.shaping == heading_style.shaping == table_shaping == shaping
+
+
+@pytest.mark.parametrize("language", ["en", "hi", "ta"])
+def test_reports_render_in_every_language(language):
+    assessment = {"score": 70, "risk_level": "Low", "narrative": f"{CONJUNCT}मता அக்கா", "recommendations": ["கிளை"]}
+    pdf = generate_pdf_report("Demo SME", assessment, {"total_revenue": 1000.0}, language).getvalue()
+    assert pdf.startswith(b"%PDF")
+
+
+def _embedded_fonts(pdf: bytes) -> set:
+    """BaseFont names of a PDF, without ReportLab's subset tag"""
+    return {name.split(b"+")[-1].decode() for name in re.findall(rb"/BaseFont /(\S+)", pdf)}
+
+
+@pytest.mark.parametrize("language, text, script_font", [
+    ("hi", "क्षमता अच्छी है", "NotoSansDevanagari-Regular"),
+    ("ta", "வருவாய் அதிகரித்துள்ளது", "NotoSerifTamil-Regular"),
+])
+def test_reports_embed_the_script_font(language, text, script_font):
+    assessment = {"score": 70, "risk_level": "Low", "narrative": text, "recommendations": [text]}
+    pdf = generate_pdf_report("Demo SME", assessment, {"total_revenue": 1000.0}, language).getvalue()
+    fonts = _embedded_fonts(pdf)
+    assert script_font in fonts
+    # Only the Latin runs (company name, risk level) use the Latin face
+    assert "NotoSans-Regular" in fonts
+
+
+def test_latin_runs_switch_to_the_latin_face():
+    *_, latin, _ = _report_styles("hi")
+    assert _latin_markup("<b>Acme</b> ने ₹1,200 Rent &amp; GST दिया", latin) == (
+        '<b><font name="NotoSans">Acme</font></b> ने ₹1,200 <font name="NotoSans">Rent</font> &amp; '
+        '<font name="NotoSans">GST</font> दिया'
+    )
+    assert _latin_markup("Acme", _report_styles("en")[5]) == "Acme"
+
+
+def test_devanagari_conjunct_is_shaped():
+    pytest.importorskip("uharfbuzz")
+    if "devanagari" not in register_fonts():
+        pytest.skip("NotoSansDevanagari-Regular.ttf is not installed")
+
+    paragraph = Paragraph(CONJUNCT, _report_styles("hi")[0])
+    paragraph.wrap(400, 100)
+    text = paragraph.blPara.lines[0].words[0].text
+
+    assert isinstance(text, ShapedStr)
+    # One entry per output glyph: the three code points become one conjunct
+    assert len(text.__shapeData__) < len(CONJUNCT)
@@ -0,0 +1,27 @@
+from conftest import upload
+
+
+def test_report_is_only_served_in_languages_the_assessment_has(client, sample_csv):
+    company_id = upload(client, sample_csv + b"\n\n\n")["company_id"]
+    assert client.post(f"/analyze/{company_id}").status_code == 200
+
+    assert client.get(f"/download-report/{company_id}").status_code == 200
+    assert client.get(f"/download-report/{company_id}", params={"language": "en"}).status_code == 200
+    # English-only assessment: no Hindi labels around English text
+    response = client.get(f"/download-report/{company_id}", params={"language": "hi"})
+    assert response.status_code == 404
+    assert "language 'hi'" in response.json()["detail"]
+
+    client.post(f"/analyze/{company_id}", params={"language": "hi"})
+    assert client.get(f"/download-report/{company_id}", params={"language": "hi"}).status_code == 200
+
+
+def test_duplicate_uploads_say_which_language_the_assessment_is_in(client, sample_csv):
+    data = sample_csv + b"\n\n\n\n\n\n"
+    company_id = upload(client, data)["company_id"]
+    assert client.post(f"/analyze/{company_id}", params={"language": "ta"}).status_code == 200
+
+    again = upload(client, data)
+    assert again["duplicate"] is True
+    # The dashboard offers the report download only in this language
+    assert again["assessment"]["language"] == "ta"
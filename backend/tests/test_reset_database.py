@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+from shared_state import SQLiteState
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_reset_script_clears_the_shared_state(tmp_path):
+    state_path = str(tmp_path / "state.db")
+    store = SQLiteState(state_path)
+    store.set("assessment:stale", {"assessment_id": 1})
+    store.set("ratelimit:openrouter", {"rate": 2.0})
+    store.push("analysis_jobs", "deadbeef")
+    report_dir = tmp_path / "reports"
+    report_dir.mkdir()
+    (report_dir / "1-en-t3-abc.pdf").write_bytes(b"%PDF")
+
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'app.db'}",
+        "SHARED_STATE_URL": f"sqlite:///{state_path}",
+        "REPORT_CACHE_DIR": str(report_dir),
+    }
+    result = subprocess.run([sys.executable, "reset_database.py"], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert "1 queued analysis jobs" in result.stdout
+
+    assert store.get("assessment:stale") is None
+    assert store.pop("analysis_jobs") is None
+    assert not report_dir.exists()
+    # Not tied to the data: the rate limiter keeps what it learned
+    assert store.get("ratelimit:openrouter") == {"rate": 2.0}
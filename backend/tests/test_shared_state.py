@@ -0,0 +1,176 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from shared_state import MemoryState, SQLiteState
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def state(request, tmp_path):
+    store = MemoryState() if request.param == "memory" else SQLiteState(str(tmp_path / "state.db"))
+    yield store
+    store.close()
+
+
+def _increment(value):
+    # Yield mid read-modify-write, so unserialized updates would lose increments
+    time.sleep(0)
+    count = (value or 0) + 1
+    return count, count
+
+
+def _run_threads(target, threads: int) -> None:
+    workers = [threading.Thread(target=target) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def test_update_is_atomic_across_threads(state):
+    results = []
+
+    def work():
+        for _ in range(100):
+            results.append(state.update("counter", _increment))
+
+    _run_threads(work, 8)
+    assert state.get("counter") == 800
+    # Every update saw a distinct value
+    assert sorted(results) == list(range(1, 801))
+
+
+def _increment_in_process(path: str, times: int) -> None:
+    store = SQLiteState(path)
+    for _ in range(times):
+        store.update("counter", _increment)
+    store.close()
+
+
+def _drain_in_process(path: str, popped) -> None:
+    store = SQLiteState(path)
+    items = []
+    while (item := store.pop("jobs")) is not None:
+        items.append(item)
+    popped.put(items)
+    store.close()
+
+
+def _run_processes(target, args: tuple, processes: int) -> None:
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=target, args=args) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+
+def test_sqlite_update_is_atomic_across_processes(tmp_path):
+    path = str(tmp_path / "state.db")
+    SQLiteState(path).close()
+    _run_processes(_increment_in_process, (path, 100), 4)
+    assert SQLiteState(path).get("counter") == 400
+
+
+def test_sqlite_queue_items_are_popped_once_across_processes(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = SQLiteState(path)
+    for item in range(400):
+        store.push("jobs", item)
+    popped = multiprocessing.get_context("spawn").Queue()
+    _run_processes(_drain_in_process, (path, popped), 4)
+
+    drained = [popped.get(timeout=10) for _ in range(4)]
+    assert sorted(item for items in drained for item in items) == list(range(400))
+    # Each consumer still sees the queue in order
+    assert all(items == sorted(items) for items in drained)
+    assert store.pop("jobs") is None
+
+
+def test_expired_values_are_gone(state):
+    state.set("short", {"v": 1}, ttl=0.05)
+    state.set("long", {"v": 2}, ttl=60)
+    state.set("forever", {"v": 3})
+    assert state.get("short") == {"v": 1}
+    time.sleep(0.1)
+    assert state.get("short") is None
+    assert state.get("long") == {"v": 2}
+    assert state.get("forever") == {"v": 3}
+
+    # update() starts over from None once its key has expired, and can set a new TTL
+    state.update("bucket", lambda value: (5, None), ttl=0.05)
+    time.sleep(0.1)
+    assert state.update("bucket", lambda value: (value, value)) is None
+
+
+def test_queue_is_fifo_per_name(state):
+    for item in [1, "two", {"three": 3}]:
+        state.push("jobs", item)
+    state.push("other", "x")
+    assert [state.pop("jobs") for _ in range(4)] == [1, "two", {"three": 3}, None]
+    assert state.pop("other") == "x"
+    assert state.pop("missing") is None
+
+
+def test_competing_consumers_pop_each_item_once(state):
+    for item in range(1000):
+        state.push("jobs", item)
+    popped = []
+
+    def consume():
+        while (item := state.pop("jobs")) is not None:
+            popped.append(item)
+
+    _run_threads(consume, 8)
+    assert sorted(popped) == list(range(1000))
+
+
+def test_delete_prefix_removes_only_matching_keys(state):
+    for key in ["assessment:a", "assessment:b", "assessments", "ratelimit:assessment:a", "job_%:1", "jobXY:1"]:
+        state.set(key, key)
+    state.push("assessment:", "queued")
+
+    state.delete_prefix("assessment:")
+    assert state.get("assessment:a") is None and state.get("assessment:b") is None
+    assert state.get("assessments") == "assessments"
+    assert state.get("ratelimit:assessment:a") == "ratelimit:assessment:a"
+    assert state.pop("assessment:") == "queued"
+
+    # Prefixes are literal, not patterns
+    state.delete_prefix("job_%:")
+    assert state.get("job_%:1") is None
+    assert state.get("jobXY:1") == "jobXY:1"
+
+
+def test_incomplete_backends_fail_when_created():
+    from shared_state import SharedState
+
+    class WithoutQueue(SharedState):
+        get = set = delete_prefix = update = MemoryState.get
+
+    with pytest.raises(TypeError, match="pop"):
+        WithoutQueue()
+
+
+def test_sqlite_close_closes_every_threads_connection(tmp_path):
+    import asyncio
+    import sqlite3
+
+    store = SQLiteState(str(tmp_path / "state.db"))
+
+    async def use_from_pool_threads():
+        await asyncio.gather(*[asyncio.to_thread(store.set, f"key{i}", i) for i in range(8)])
+
+    asyncio.run(use_from_pool_threads())
+    connections = [conn for _, conn in store._connections]
+    assert len(connections) > 1
+
+    store.close()
+    for conn in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+    # Still usable afterwards, on fresh connections
+    assert store.get("key3") == 3
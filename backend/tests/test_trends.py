@@ -0,0 +1,50 @@
+from conftest import upload
+
+
+def _ledger(dates) -> bytes:
+    rows = "".join(f"{day},Sales,100,Revenue\n{day},Rent,40,Expense\n" for day in dates)
+    return ("date,category,amount,type\n" + rows).encode()
+
+
+def test_weekly_series_starts_at_the_first_week_with_data(client):
+    # 2023-10-04 is a Wednesday; the ledger spans 2023-10-04 .. 2023-11-29
+    dates = [f"2023-10-{d:02d}" for d in (4, 11, 25)] + ["2023-11-29"]
+    company_id = upload(client, _ledger(dates))["company_id"]
+
+    weekly = client.get(f"/trends/{company_id}", params={"weeks": 52}).json()["weekly"]
+
+    assert weekly["periods"][0] == "2023-10-02"
+    assert weekly["periods"][-1] == "2023-11-27"
+    assert len(weekly["periods"]) == 9
+    # Weeks without records inside the span are still zero-filled
+    assert weekly["revenue"] == [100, 100, 0, 100, 0, 0, 0, 0, 100]
+
+
+def test_weekly_series_is_capped_at_the_requested_weeks(client):
+    dates = [f"2022-{m:02d}-15" for m in range(1, 13)]
+    company_id = upload(client, _ledger(dates))["company_id"]
+
+    weekly = client.get(f"/trends/{company_id}", params={"weeks": 4}).json()["weekly"]
+
+    assert weekly["periods"] == ["2022-11-21", "2022-11-28", "2022-12-05", "2022-12-12"]
+    assert weekly["revenue"] == [0, 0, 0, 100]
+
+
+def test_weekly_series_counts_archived_records(client):
+    from database import SessionLocal
+    from retention import archive_expired_records
+    from trends import weekly_series
+
+    dates = ["2021-03-03", "2021-03-10", "2021-03-24"]
+    company_id = upload(client, _ledger(dates))["company_id"]
+    db = SessionLocal()
+    try:
+        before = weekly_series(db, company_id, 52)
+        assert archive_expired_records(months=12)["companies"][company_id] == 6
+        after = weekly_series(db, company_id, 52)
+    finally:
+        db.close()
+
+    assert after[0] == before[0] == ["2021-03-01", "2021-03-08", "2021-03-15", "2021-03-22"]
+    assert after[1].tolist() == before[1].tolist() == [100, 100, 0, 100]
+    assert after[2].tolist() == [40, 40, 0, 40]
@@ -21,6 +21,18 @@ TRANSLATIONS = {
         "error_upload": "Upload failed",
         "error_analysis": "Analysis failed",
         "success_upload": "Successfully processed",
+        "report_title": "Financial Health Assessment Report",
+        "report_company": "Company",
+        "report_generated": "Generated",
+        "report_summary": "Financial Summary",
+        "report_metric": "Metric",
+        "report_amount": "Amount (INR)",
+        "report_total_revenue": "Total Revenue",
+        "report_total_expense": "Total Expenses",
+        "report_net_income": "Net Income",
+        "report_score_section": "Health Score & Risk Assessment",
+        "report_assessment": "Detailed Assessment",
+        "report_no_recommendations": "No specific recommendations available.",
     },
     "hi": {  # Hindi
         "app_title": "लघु एवं मध्यम उद्यम वित्तीय स्वास्थ्य मंच",
@@ -39,6 +51,18 @@ TRANSLATIONS = {
         "error_upload": "अपलोड विफल",
         "error_analysis": "विश्लेषण विफल",
         "success_upload": "सफलतापूर्वक संसाधित",
+        "report_title": "वित्तीय स्वास्थ्य मूल्यांकन रिपोर्ट",
+        "report_company": "कंपनी",
+        "report_generated": "तैयार किया गया",
+        "report_summary": "वित्तीय सारांश",
+        "report_metric": "मापदंड",
+        "report_amount": "राशि (INR)",
+        "report_total_revenue": "कुल राजस्व",
+        "report_total_expense": "कुल व्यय",
+        "report_net_income": "शुद्ध आय",
+        "report_score_section": "स्वास्थ्य स्कोर और जोखिम मूल्यांकन",
+        "report_assessment": "विस्तृत मूल्यांकन",
+        "report_no_recommendations": "कोई विशेष सिफारिश उपलब्ध नहीं है।",
     },
     "ta": {  # Tamil
         "app_title": "சிறு மற்றும் நடுத்தர நிறுவன நிதி சுகாதார தளம்",
@@ -57,6 +81,18 @@ TRANSLATIONS = {
         "error_upload": "பதிவேற்றம் தோல்வியடைந்தது",
         "error_analysis": "பகுப்பாய்வு தோல்வியடைந்தது",
         "success_upload": "வெற்றிகரமாக செயலாக்கப்பட்டது",
+        "report_title": "நிதி சுகாதார மதிப்பீட்டு அறிக்கை",
+        "report_company": "நிறுவனம்",
+        "report_generated": "உருவாக்கப்பட்டது",
+        "report_summary": "நிதி சுருக்கம்",
+        "report_metric": "அளவீடு",
+        "report_amount": "தொகை (INR)",
+        "report_total_revenue": "மொத்த வருவாய்",
+        "report_total_expense": "மொத்த செலவுகள்",
+        "report_net_income": "நிகர வருமானம்",
+        "report_score_section": "சுகாதார மதிப்பெண் மற்றும் ஆபத்து மதிப்பீடு",
+        "report_assessment": "விரிவான மதிப்பீடு",
+        "report_no_recommendations": "குறிப்பிட்ட பரிந்துரைகள் எதுவும் இல்லை.",
     }
 }
 
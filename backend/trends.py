@@ -0,0 +1,264 @@
+"""
+Revenue, expense and net trends over FinancialRecord.date.
+
+Monthly series come from the summary rollups and weekly series from a
+date-truncated GROUP BY over financial_records and its archive (each
+served by its (company_id, date) index). Gaps are filled, rolling averages computed and a
+cash-flow forecast fitted with NumPy. Results are cached per company data
+version, so repeated reads after an upload cost one fingerprint query.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models import FinancialRecord, FinancialRecordArchive
+from aggregation import get_monthly_breakdown
+from summary import get_data_version
+
+DEFAULT_WEEKS = 52
+DEFAULT_HORIZON = 3
+DEFAULT_WINDOW = 3
+# The live ledger and the rows retention.py moved out of it
+LEDGER_TABLES = (FinancialRecord, FinancialRecordArchive)
+
+# Smoothing parameters tried when fitting the forecast (all pairs are evaluated at once)
+_SMOOTHING_GRID = np.linspace(0.1, 0.9, 9)
+
+
+class TTLCache:
+    """Thread-safe in-process LRU cache whose entries expire after a fixed TTL."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_trend_cache = TTLCache(
+    max_entries=int(os.getenv("TREND_CACHE_MAX_ENTRIES", "512")),
+    ttl_seconds=float(os.getenv("TREND_CACHE_TTL_SECONDS", str(24 * 3600)))
+)
+
+
+def _week_expr(db: Session, column=FinancialRecord.date):
+    """Monday of the ISO week of a date column (FinancialRecord.date by default) for the active dialect"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return func.date(func.date_trunc('week', column))
+    if dialect in ("mysql", "mariadb"):
+        return func.subdate(func.date(column), func.weekday(column))
+    # SQLite: step back six days, then forward to the next Monday (the same day if it is one)
+    return func.date(column, '-6 days', 'weekday 1')
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing moving average; the first window-1 points average what is available"""
+    if len(values) == 0:
+        return values
+    window = max(1, min(window, len(values)))
+    cumulative = np.cumsum(np.concatenate([[0.0], values]))
+    sums = cumulative[window:] - cumulative[:-window]
+    head = cumulative[1:window] / np.arange(1, window)
+    return np.concatenate([head, sums / window])
+
+
+def holt_forecast(values: np.ndarray, horizon: int) -> dict:
+    """
+    Holt's linear exponential smoothing. Every (alpha, beta) pair of the grid is run
+    in one vectorized pass and the pair with the lowest one-step-ahead error wins.
+
+    Returns:
+        Dict with point forecasts, an approximate 95% band, the chosen parameters and in-sample RMSE
+    """
+    n = len(values)
+    if n == 0 or horizon <= 0:
+        return {"values": [], "lower": [], "upper": [], "alpha": None, "beta": None, "rmse": None}
+    if n < 3:
+        # Too short to fit a trend: carry the mean forward
+        mean = float(values.mean())
+        flat = [mean] * horizon
+        return {"values": flat, "lower": flat, "upper": flat, "alpha": None, "beta": None, "rmse": None}
+
+    alpha, beta = (grid.ravel() for grid in np.meshgrid(_SMOOTHING_GRID, _SMOOTHING_GRID))
+    level = np.full(alpha.shape, values[0])
+    trend = np.full(alpha.shape, values[1] - values[0])
+    squared_error = np.zeros(alpha.shape)
+    for value in values[1:]:
+        predicted = level + trend
+        squared_error += (value - predicted) ** 2
+        new_level = alpha * value + (1 - alpha) * predicted
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        level = new_level
+
+    best = int(np.argmin(squared_error))
+    rmse = float(np.sqrt(squared_error[best] / (n - 1)))
+    steps = np.arange(1, horizon + 1)
+    point = level[best] + steps * trend[best]
+    spread = 1.96 * rmse * np.sqrt(steps)
+    return {
+        "values": point.round(2).tolist(),
+        "lower": (point - spread).round(2).tolist(),
+        "upper": (point + spread).round(2).tolist(),
+        "alpha": round(float(alpha[best]), 2),
+        "beta": round(float(beta[best]), 2),
+        "rmse": round(rmse, 2)
+    }
+
+
+def _series_block(labels: list, revenue: np.ndarray, expense: np.ndarray, window: int) -> dict:
+    net = revenue - expense
+    return {
+        "periods": labels,
+        "revenue": revenue.round(2).tolist(),
+        "expense": expense.round(2).tolist(),
+        "net": net.round(2).tolist(),
+        "rolling": {
+            "window": window,
+            "revenue": rolling_mean(revenue, window).round(2).tolist(),
+            "expense": rolling_mean(expense, window).round(2).tolist(),
+            "net": rolling_mean(net, window).round(2).tolist()
+        }
+    }
+
+
+def _month_index(period: str) -> int:
+    year, month = period.split("-")
+    return int(year) * 12 + int(month) - 1
+
+
+def monthly_series(db: Session, company_id: int):
+    """(labels, revenue, expense) per calendar month with empty months filled in"""
+    months = get_monthly_breakdown(db, company_id)
+    if not months:
+        return [], np.zeros(0), np.zeros(0)
+    offsets = np.array([_month_index(m["month"]) for m in months])
+    first = offsets.min()
+    size = offsets.max() - first + 1
+    revenue = np.zeros(size)
+    expense = np.zeros(size)
+    revenue[offsets - first] = [m["revenue"] for m in months]
+    expense[offsets - first] = [m["expense"] for m in months]
+    labels = [f"{(first + i) // 12:04d}-{(first + i) % 12 + 1:02d}" for i in range(size)]
+    return labels, revenue, expense
+
+
+def weekly_series(db: Session, company_id: int, weeks: int = DEFAULT_WEEKS):
+    """
+    (labels, revenue, expense) per ISO week (Monday start), from the first week with data
+    but at most the last `weeks` weeks. Quiet weeks inside that span are zero-filled.
+    Records the retention job archived count too, like they do in the monthly rollups.
+    """
+    bounds = [db.query(func.min(table.date), func.max(table.date)).filter(table.company_id == company_id).one()
+              for table in LEDGER_TABLES]
+    dates = [_as_date(value) for bound in bounds for value in bound if value is not None]
+    if not dates or weeks <= 0:
+        return [], np.zeros(0), np.zeros(0)
+    first, last = min(dates), max(dates)
+    last_monday = last - timedelta(days=last.weekday())
+    first_data_monday = first - timedelta(days=first.weekday())
+    # Weeks before the ledger starts are not quiet weeks; padding them would drag averages toward zero
+    first_monday = max(first_data_monday, last_monday - timedelta(weeks=weeks - 1))
+    size = (last_monday - first_monday).days // 7 + 1
+
+    revenue = np.zeros(size)
+    expense = np.zeros(size)
+    for table in LEDGER_TABLES:
+        week = _week_expr(db, table.date).label("week")
+        rows = db.query(week, table.record_type, func.sum(table.amount)).filter(
+            table.company_id == company_id,
+            table.date >= datetime.combine(first_monday, datetime.min.time()),
+            table.record_type.in_(['Revenue', 'Expense']),
+        ).group_by(week, table.record_type).all()
+        for week_start, record_type, total in rows:
+            index = (_as_date(week_start) - first_monday).days // 7
+            if 0 <= index < size:
+                (revenue if record_type == 'Revenue' else expense)[index] += total or 0.0
+    labels = [(first_monday + timedelta(weeks=i)).isoformat() for i in range(size)]
+    return labels, revenue, expense
+
+
+def _next_months(last_label: str, horizon: int) -> list:
+    start = _month_index(last_label) + 1
+    return [f"{(start + i) // 12:04d}-{(start + i) % 12 + 1:02d}" for i in range(horizon)]
+
+
+def compute_trends(db: Session, company_id: int, weeks: int = DEFAULT_WEEKS, horizon: int = DEFAULT_HORIZON,
+                   window: int = DEFAULT_WINDOW) -> dict:
+    """
+    Monthly and weekly series, rolling averages and a monthly net cash-flow forecast.
+
+    Args:
+        weeks: Maximum number of trailing weeks in the weekly series
+        horizon: Months to forecast
+        window: Rolling-average window (months for the monthly series, weeks for the weekly one)
+    """
+    month_labels, month_revenue, month_expense = monthly_series(db, company_id)
+    week_labels, week_revenue, week_expense = weekly_series(db, company_id, weeks)
+    forecast = holt_forecast(month_revenue - month_expense, horizon)
+    forecast["periods"] = _next_months(month_labels[-1], len(forecast["values"])) if month_labels else []
+    return {
+        "company_id": company_id,
+        "monthly": _series_block(month_labels, month_revenue, month_expense, window),
+        "weekly": _series_block(week_labels, week_revenue, week_expense, window),
+        "forecast": {"method": "holt", "series": "net", **forecast}
+    }
+
+
+def get_trends(db: Session, company_id: int, weeks: int = DEFAULT_WEEKS, horizon: int = DEFAULT_HORIZON,
+               window: int = DEFAULT_WINDOW) -> dict:
+    """compute_trends, cached per company data version"""
+    data_version = get_data_version(db, company_id)
+    key = (company_id, data_version, weeks, horizon, window)
+    trends = _trend_cache.get(key)
+    if trends is None:
+        trends = {**compute_trends(db, company_id, weeks, horizon, window), "data_version": data_version}
+        _trend_cache.set(key, trends)
+    return trends
+
+
+def clear_trend_cache() -> None:
+    _trend_cache.clear()
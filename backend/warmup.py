@@ -0,0 +1,107 @@
+"""
+Deferred startup work.
+
+main.py imports only what routing and the database need, so a new process
+starts accepting connections within a few hundred ms. The modules behind the
+upload, analysis, trends, records and report routes pull in pandas, numpy,
+openpyxl and reportlab, which take seconds together. warm_up() imports them
+in a worker thread right after startup, registers the report fonts and opens
+the first database connections, so the first real request pays for none of
+it. /ready answers 503 until it is done.
+
+Handlers still import what they use themselves, which is a dict lookup once
+warm. A request that arrives before warmup finishes simply does the import.
+
+WARMUP=false skips it; every module then loads on first use.
+"""
+
+import asyncio
+import importlib
+import os
+import time
+
+WARMUP = os.getenv("WARMUP", "true").lower() in ("1", "true", "yes")
+
+# Third-party libraries first (they dominate), then the route modules that use them
+WARMUP_MODULES = (
+    "pandas", "numpy", "openpyxl", "reportlab.platypus", "httpx",
+    "processor", "ingestion", "summary", "aggregation", "scoring", "trends", "records",
+    "ai_service", "analysis", "report_generator", "report_store", "report_export",
+)
+
+# pending -> running -> done / failed, or skipped when WARMUP is off
+status = {"state": "pending", "seconds": None, "modules_ms": {}, "errors": {}}
+_task = None
+
+
+def _step(name: str, fn) -> None:
+    started = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        status["errors"][name] = f"{type(e).__name__}: {e}"
+    status["modules_ms"][name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def _register_fonts() -> None:
+    from report_fonts import register_fonts
+    register_fonts()
+
+
+def _connect_sync_pool() -> None:
+    from database import engine
+    with engine.connect():
+        pass
+
+
+def warm_up() -> None:
+    """Import the deferred modules, register report fonts and open a pooled connection (blocking)"""
+    from database import get_async_engine
+
+    for name in WARMUP_MODULES:
+        _step(name, lambda: importlib.import_module(name))
+    _step("report_fonts", _register_fonts)
+    _step("db_sync_pool", _connect_sync_pool)
+    # Creating the engine imports the async driver; its first connection opens on the event loop
+    _step("async_driver", get_async_engine)
+
+
+async def _run() -> None:
+    from database import get_async_engine
+
+    started = time.perf_counter()
+    status["state"] = "running"
+    await asyncio.to_thread(warm_up)
+    connect_started = time.perf_counter()
+    try:
+        async with get_async_engine().connect():
+            pass
+    except Exception as e:
+        status["errors"]["db_async_pool"] = f"{type(e).__name__}: {e}"
+    status["modules_ms"]["db_async_pool"] = round((time.perf_counter() - connect_started) * 1000, 1)
+    status["seconds"] = round(time.perf_counter() - started, 3)
+    status["state"] = "failed" if status["errors"] else "done"
+    if status["errors"]:
+        print(f"Warmup finished with errors in {status['seconds']}s: {status['errors']}")
+
+
+def start_warmup() -> None:
+    """Run warm_up in the background (called from the app's lifespan)"""
+    global _task
+    if not WARMUP:
+        status["state"] = "skipped"
+        return
+    if _task is None:
+        _task = asyncio.create_task(_run())
+
+
+async def stop_warmup() -> None:
+    """Wait for a warmup still in progress, so shutdown never races its connections"""
+    global _task
+    if _task is not None:
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+
+
+def is_warm() -> bool:
+    return status["state"] in ("done", "skipped")
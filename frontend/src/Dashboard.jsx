@@ -60,11 +60,37 @@ const TRANSLATIONS = {
     }
 };
 
+// Server-Sent Events over a fetch body (EventSource can neither POST nor expose the status code)
+async function* readEvents(response) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) return;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = "message";
+            let data = "";
+            for (const line of block.split("\n")) {
+                if (line.startsWith("event:")) event = line.slice(6).trim();
+                else if (line.startsWith("data:")) data += line.slice(5).trim();
+            }
+            if (data) yield { event, data: JSON.parse(data) };
+        }
+    }
+}
+
 const Dashboard = ({ uploadResult, language, setLanguage }) => {
     const [data, setData] = useState(null);
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState(null);
     const [companyId, setCompanyId] = useState(1);
+    // Language of the assessment on screen; the report download is only offered in it
+    const [dataLanguage, setDataLanguage] = useState(null);
     // language state moved to App.jsx
 
     const t = TRANSLATIONS[language] || TRANSLATIONS.en;
@@ -77,6 +103,8 @@ const Dashboard = ({ uploadResult, language, setLanguage }) => {
                 company: "Demo SME",
                 assessment: uploadResult.assessment
             });
+            setDataLanguage(uploadResult.assessment.language);
+            setCompanyId(uploadResult.company_id);
         } else if (uploadResult?.company_id) {
             // New upload - update company ID
             setCompanyId(uploadResult.company_id);
@@ -86,9 +114,12 @@ const Dashboard = ({ uploadResult, language, setLanguage }) => {
     const fetchAnalysis = async () => {
         setLoading(true);
         setError(null);
+        setDataLanguage(null);
         try {
             const apiBase = import.meta.env.VITE_API_URL || "http://localhost:8000";
-            const response = await fetch(`${apiBase}/analyze/${companyId}?language=${language}`, {
+            // Streamed: score and risk arrive first, then the narrative as the model writes it.
+            // Generate all languages in one pass; later language switches are served from the cache
+            const response = await fetch(`${apiBase}/analyze/${companyId}/stream?language=${language}&all_languages=true`, {
                 method: 'POST'
             });
 
@@ -99,9 +130,29 @@ const Dashboard = ({ uploadResult, language, setLanguage }) => {
                 throw new Error("Analysis failed");
             }
 
-            const result = await response.json();
-            console.log('📊 Full API Response:', result);
-            setData(result);
+            const assessment = { score: null, risk_level: null, narrative: "", recommendations: [] };
+            let company = null;
+            for await (const { event, data: payload } of readEvents(response)) {
+                if (event === 'result') {
+                    console.log('📊 Full API Response:', payload);
+                    setData(payload);
+                    setDataLanguage(language);
+                    continue;
+                }
+                if (event === 'error') throw new Error(payload.detail || "Analysis failed");
+                if (event === 'meta') {
+                    company = payload.company;
+                    setLoading(false);
+                } else if (event === 'narrative') {
+                    assessment.narrative += payload;
+                } else if (event === 'recommendation') {
+                    assessment.recommendations = [...assessment.recommendations, payload];
+                } else {
+                    assessment[event] = payload;
+                }
+                // Keep the previous summary on screen until the final result replaces it
+                setData(prev => ({ ...prev, company, assessment: { ...assessment } }));
+            }
         } catch (err) {
             console.error('❌ Error:', err);
             setError(err.message);
@@ -110,9 +161,18 @@ const Dashboard = ({ uploadResult, language, setLanguage }) => {
         }
     };
 
+    // Switching language after an analysis is loaded is only a cache read on the backend,
+    // or generates the assessment (e.g. of a duplicate upload) in a language it lacks
+    useEffect(() => {
+        if (data && dataLanguage !== language) {
+            fetchAnalysis();
+        }
+        // eslint-disable-next-line react-hooks/exhaustive-deps
+    }, [language]);
+
     const downloadReport = () => {
         const apiBase = import.meta.env.VITE_API_URL || "http://localhost:8000";
-        window.open(`${apiBase}/download-report/${companyId}`, '_blank');
+        window.open(`${apiBase}/download-report/${companyId}?language=${language}`, '_blank');
     };
 
     if (loading) return <div className="loading">{t.loading}</div>;
@@ -188,7 +248,7 @@ const Dashboard = ({ uploadResult, language, setLanguage }) => {
 
             <div className="action-buttons">
                 <button onClick={fetchAnalysis}>{t.refreshAnalysis}</button>
-                {language === 'en' && (
+                {dataLanguage === language && (
                     <button onClick={downloadReport} className="download-btn">📥 {t.downloadReport}</button>
                 )}
             </div>